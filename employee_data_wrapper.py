@@ -2,6 +2,8 @@ import streamlit as st
 import sys
 import os
 
+from sap_common.session_memory import SessionMemoryManager
+
 def render_employee_data_management():
     """Render the Employee Data Management System with full feature preservation"""
     try:
@@ -46,7 +48,7 @@ def render_employee_data_management():
             
             # Initialize session state with admin_mode (exact from main_app.py)
             if 'state' not in st.session_state:
-                st.session_state.state = {'admin_mode': False}
+                st.session_state.state = SessionMemoryManager({'admin_mode': False})
             
             # Ensure admin_mode key exists
             if 'admin_mode' not in st.session_state.state:
@@ -4,6 +4,8 @@ import os
 import pandas as pd
 from datetime import datetime
 
+from sap_common.session_memory import SessionMemoryManager
+
 def render_foundation_data_management():
     """Render the Foundation Data Management System with full feature preservation"""
     try:
@@ -147,12 +149,12 @@ def render_foundation_data_management():
 
             # Initialize session state (exact from main_app.py)
             if 'state' not in st.session_state:
-                st.session_state.state = {
+                st.session_state.state = SessionMemoryManager({
                     'hrp1000': None, 'hrp1001': None, 'hierarchy': None,
                     'level_names': get_default_level_names(), 'transformations': [],
                     'validation_results': None, 'statistics': None, 'pending_transforms': [],
                     'admin_mode': False, 'generated_output_files': {}, 'output_generation_metadata': {}
-                }
+                })
 
             # Main title
             st.title("Org Hierarchy Visual Explorer v2.4")
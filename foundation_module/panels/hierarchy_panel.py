@@ -4,55 +4,83 @@ from io import BytesIO
 from foundation_module.utils.file_utils import load_data
 from foundation_module.utils.hierarchy_utils import build_hierarchy, optimize_table_display
 
+# Level export template: API field row, description row, then one row per unit
+LEVEL_EXPORT_HEADERS = [
+    '[OPERATOR]', 'effectiveStartDate', 'externalCode', 
+    'name.en_US', 'name.defaultValue', 'name.en_DEBUG', 'name.en_GB',
+    'description.en_US', 'description.defaultValue', 
+    'description.en_DEBUG', 'description.en_GB',
+    'effectiveStatus', 'headOfUnit'
+]
+LEVEL_EXPORT_DESCRIPTIONS = [
+    'Supported operators: Delimit, Clear and Delete',
+    'Start Date',
+    'Code',
+    'US English',
+    'Default Value', 
+    'English (DEBUG)',
+    'English (United Kingdom)',
+    'US English',
+    'Default Value',
+    'English (DEBUG)',
+    'English (United Kingdom)',
+    'Status(Valid Values : A/I)',
+    'Head of Unit'
+]
+# Columns filled with the unit's name; every other column except externalCode is a constant
+LEVEL_EXPORT_NAME_COLUMNS = [
+    'name.en_US', 'name.defaultValue', 'name.en_DEBUG',
+    'description.en_US', 'description.defaultValue', 'description.en_DEBUG'
+]
+LEVEL_EXPORT_CONSTANTS = {
+    '[OPERATOR]': '',
+    'effectiveStartDate': '1900-01-01 00:00:00',
+    'name.en_GB': '',
+    'description.en_GB': '',
+    'effectiveStatus': 'A',
+    'headOfUnit': ''
+}
+
 def generate_level_export(level_data, level_name):
-    headers = [
-        '[OPERATOR]', 'effectiveStartDate', 'externalCode', 
-        'name.en_US', 'name.defaultValue', 'name.en_DEBUG', 'name.en_GB',
-        'description.en_US', 'description.defaultValue', 
-        'description.en_DEBUG', 'description.en_GB',
-        'effectiveStatus', 'headOfUnit'
-    ]
-    descriptions = [
-        'Supported operators: Delimit, Clear and Delete',
-        'Start Date',
-        'Code',
-        'US English',
-        'Default Value', 
-        'English (DEBUG)',
-        'English (United Kingdom)',
-        'US English',
-        'Default Value',
-        'English (DEBUG)',
-        'English (United Kingdom)',
-        'Status(Valid Values : A/I)',
-        'Head of Unit'
-    ]
-    df = pd.DataFrame(columns=headers)
-    df.loc[0] = descriptions
-    df.loc[1] = [''] * len(headers)
-
-    for idx, row in level_data.iterrows():
-        df.loc[idx + 2] = [
-            '', '1900-01-01 00:00:00', str(row['Object ID']),
-            row['Name'], row['Name'], row['Name'], '',
-            row['Name'], row['Name'], row['Name'], '', 'A', ''
-        ]
-    return df
+    """Level export of a level's units, built column by column (rows keep their labels + 2)"""
+    codes = [str(object_id) for object_id in level_data['Object ID'].to_numpy(dtype=object)]
+    names = level_data['Name'].to_numpy(dtype=object).tolist()
+
+    columns = {}
+    for header, description in zip(LEVEL_EXPORT_HEADERS, LEVEL_EXPORT_DESCRIPTIONS):
+        if header == 'externalCode':
+            values = codes
+        elif header in LEVEL_EXPORT_NAME_COLUMNS:
+            values = names
+        else:
+            values = [LEVEL_EXPORT_CONSTANTS[header]] * len(level_data)
+        # Description row and empty row on top of the unit rows
+        columns[header] = [description, ''] + values
+
+    index = [0, 1] + (level_data.index + 2).tolist()
+    return pd.DataFrame(columns, index=index, columns=LEVEL_EXPORT_HEADERS)
 
 def generate_association_file(current_df, parent_df, hrp1001, current_name, parent_name):
-    associations = []
-    parent_map = hrp1001.set_index('Target object ID')['Source ID'].astype(str).to_dict()
-    valid_parent_ids = set(parent_df['Object ID'].astype(str))
-    
-    for _, row in current_df.iterrows():
-        child_id = str(row['Object ID'])
-        parent_id = parent_map.get(child_id)
-        if parent_id and parent_id in valid_parent_ids:
-            associations.append({
-                f'{current_name}Code': child_id,
-                f'{parent_name}Code': parent_id
-            })
-    return pd.DataFrame(associations)
+    """Child -> parent code pairs of a level, joined on each unit's HRP1001 parent (the last row per target wins)"""
+    links = pd.DataFrame({
+        'child_id': hrp1001['Target object ID'].to_numpy(dtype=object),
+        'parent_id': hrp1001['Source ID'].astype(str).to_numpy(dtype=object)
+    }).drop_duplicates('child_id', keep='last')
+    children = pd.DataFrame({
+        'child_id': [str(object_id) for object_id in current_df['Object ID'].to_numpy(dtype=object)]
+    }, dtype=object)
+
+    joined = children.merge(links, on='child_id', how='left')
+    parent_ids = joined['parent_id'].to_numpy(dtype=object)
+    valid_parent_ids = pd.Index(parent_df['Object ID'].astype(str).to_numpy(dtype=object)).unique()
+    keep = pd.notna(parent_ids) & (parent_ids != '') & (valid_parent_ids.get_indexer(parent_ids) >= 0)
+    if not keep.any():
+        return pd.DataFrame()
+
+    return pd.DataFrame({
+        f'{current_name}Code': joined['child_id'][keep].tolist(),
+        f'{parent_name}Code': parent_ids[keep].tolist()
+    })
 
 def show_hierarchy_panel(state):
     st.header("Hierarchy Builder")
@@ -1,15 +1,32 @@
 import os
-import json
 import pandas as pd
 from datetime import datetime
 import streamlit as st
 
+from foundation_module.utils.frame_delta import (
+    diff_frames, revert_frame_delta, describe_frame_delta, get_delta_counts
+)
+from foundation_module.utils.history_store import TransformationHistoryStore, HISTORY_PAGE_SIZE
+from foundation_module.utils.transformation_utils import get_frame_fingerprint
+
+# Transformations are logged as cell-level deltas (see utils/frame_delta).
+# Each entry is inserted into the indexed history store (utils/history_store),
+# so writing it costs the size of the change, and the rollback stack holds
+# one delta per transformation instead of a full copy of HRP1000.
+
+
 class TransformationLogger:
     def __init__(self):
         self.log_dir = "transformation_logs"
         os.makedirs(self.log_dir, exist_ok=True)
         self.session_log = []
         self.rollback_stack = []
+        self.history = None
+        try:
+            self.history = TransformationHistoryStore(self.log_dir)
+            self.history.migrate_legacy_logs()
+        except Exception as e:
+            st.error(f"Could not open transformation history: {str(e)}")
 
     def add_entry(self, operation, details, before_snapshot, after_snapshot):
         timestamp = datetime.now().isoformat()
@@ -17,52 +34,60 @@ class TransformationLogger:
             "timestamp": timestamp,
             "operation": operation,
             "details": details,
-            "before": before_snapshot.to_dict(orient='records') if isinstance(before_snapshot, pd.DataFrame) else None,
-            "after": after_snapshot.to_dict(orient='records') if isinstance(after_snapshot, pd.DataFrame) else None
+            "changes": None
         }
-        self.session_log.append(log_entry)
-        self.rollback_stack.append({
-            'operation': operation,
-            'snapshot': before_snapshot.copy()
-        })
 
-        today = datetime.now().strftime("%Y-%m-%d")
-        log_file = os.path.join(self.log_dir, f"transforms_{today}.json")
+        if isinstance(before_snapshot, pd.DataFrame) and isinstance(after_snapshot, pd.DataFrame):
+            delta = diff_frames(before_snapshot, after_snapshot)
+            log_entry["details"] = dict(details or {}, **get_delta_counts(delta))
+            log_entry["changes"] = describe_frame_delta(delta, after_snapshot)
+            # The after values are only needed for the log
+            delta.pop('changed_after', None)
+            self.rollback_stack.append({
+                'operation': operation,
+                'delta': delta
+            })
+        self.session_log.append(log_entry)
 
         try:
-            existing_logs = []
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    existing_logs = json.load(f)
-
-            existing_logs.append(log_entry)
-
-            with open(log_file, 'w') as f:
-                json.dump(existing_logs, f, indent=2)
+            if self.history is not None:
+                self.history.add(log_entry)
         except Exception as e:
             st.error(f"Could not save log: {str(e)}")
 
     def get_rollback_options(self):
         return [entry['operation'] for entry in self.rollback_stack]
 
-    def rollback_to(self, operation_name):
-        for i, entry in enumerate(reversed(self.rollback_stack)):
-            if entry['operation'] == operation_name:
-                return self.rollback_stack.pop(len(self.rollback_stack)-1-i)['snapshot']
-        return None
+    def rollback_to(self, operation_name, current_df):
+        """The data as it was before the latest run of an operation, or None if it cannot be rebuilt.
+
+        The deltas of that operation and every later one are reverted on
+        current_df, which must be the data the last logged transformation left.
+        """
+        for i in range(len(self.rollback_stack) - 1, -1, -1):
+            if self.rollback_stack[i]['operation'] == operation_name:
+                break
+        else:
+            return None
+
+        if get_frame_fingerprint(current_df) != self.rollback_stack[-1]['delta']['fingerprint']:
+            return None
+
+        df = current_df
+        for entry in reversed(self.rollback_stack[i:]):
+            df = revert_frame_delta(df, entry['delta'])
+        del self.rollback_stack[i:]
+        return df
 
     def get_session_log(self):
         return self.session_log
 
-    def get_full_history(self):
-        all_logs = []
-        if os.path.exists(self.log_dir):
-            for filename in os.listdir(self.log_dir):
-                if filename.startswith("transforms_") and filename.endswith(".json"):
-                    try:
-                        with open(os.path.join(self.log_dir, filename), 'r') as f:
-                            all_logs.extend(json.load(f))
-                    except:
-                        continue
-        return sorted(all_logs, key=lambda x: x['timestamp'], reverse=True)
+    def get_history_page(self, cursor=None, page_size=HISTORY_PAGE_SIZE, **filters):
+        """One page of the full history, newest first, and the cursor of the next page"""
+        if self.history is None:
+            return [], None
+        return self.history.get_page(cursor=cursor, page_size=page_size, **filters)
 
+    def get_full_history(self, limit=HISTORY_PAGE_SIZE):
+        """The most recent entries of the full history"""
+        return self.get_history_page(page_size=limit)[0]
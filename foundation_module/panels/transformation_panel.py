@@ -1,9 +1,8 @@
 import streamlit as st
 import pandas as pd
-import json
 import os
 import sys
-from datetime import datetime
+from datetime import timedelta
 
 # Fix sys.path for local dev (not needed in Streamlit Cloud if modules are structured)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -11,70 +10,15 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # ✅ FIXED IMPORTS
 from foundation_module.utils.file_utils import create_download_button
 from foundation_module.panels.transformation_logger import TransformationLogger
+from foundation_module.utils.transformation_utils import (
+    PatternTransformationExecutor, PREVIEW_SAMPLE_ROWS, get_keyword_pattern, get_text_columns
+)
 
+TRANSFORM_TYPES = ["Clean Text", "Standardize Dates", "Remove Test Data", "Find and Replace", "Custom Transformation"]
 
-class TransformationLogger:
-    def __init__(self):
-        self.log_dir = "transformation_logs"
-        os.makedirs(self.log_dir, exist_ok=True)
-        self.session_log = []
-        self.rollback_stack = []
-    
-    def add_entry(self, operation, details, before_snapshot, after_snapshot):
-        timestamp = datetime.now().isoformat()
-        log_entry = {
-            "timestamp": timestamp,
-            "operation": operation,
-            "details": details,
-            "before": before_snapshot.to_dict(orient='records') if isinstance(before_snapshot, pd.DataFrame) else None,
-            "after": after_snapshot.to_dict(orient='records') if isinstance(after_snapshot, pd.DataFrame) else None
-        }
-        
-        self.session_log.append(log_entry)
-        self.rollback_stack.append({
-            'operation': operation,
-            'snapshot': before_snapshot.copy()
-        })
-        
-        today = datetime.now().strftime("%Y-%m-%d")
-        log_file = os.path.join(self.log_dir, f"transforms_{today}.json")
-        
-        try:
-            existing_logs = []
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    existing_logs = json.load(f)
-            
-            existing_logs.append(log_entry)
-            
-            with open(log_file, 'w') as f:
-                json.dump(existing_logs, f, indent=2)
-        except Exception as e:
-            st.error(f"Could not save log: {str(e)}")
+# Transformations run by the compiled-pattern executor
+PATTERN_TRANSFORMS = ["Remove Test Data", "Find and Replace"]
 
-    def get_rollback_options(self):
-        return [entry['operation'] for entry in self.rollback_stack]
-    
-    def rollback_to(self, operation_name):
-        for i, entry in enumerate(reversed(self.rollback_stack)):
-            if entry['operation'] == operation_name:
-                return self.rollback_stack.pop(len(self.rollback_stack)-1-i)['snapshot']
-        return None
-
-    def get_session_log(self):
-        return self.session_log
-    
-    def get_full_history(self):
-        all_logs = []
-        if os.path.exists(self.log_dir):
-            for filename in os.listdir(self.log_dir):
-                if filename.startswith("transforms_") and filename.endswith(".json"):
-                    try:
-                        with open(os.path.join(self.log_dir, filename), 'r') as f:
-                            all_logs.extend(json.load(f))
-                    except:
-                        continue
-        return sorted(all_logs, key=lambda x: x['timestamp'], reverse=True)
 
 def show_transformation_panel(state):
     st.header("Data Transformation Center")
@@ -84,6 +28,8 @@ def show_transformation_panel(state):
         state['transformation_log'] = TransformationLogger()
     if 'pending_transforms' not in state:
         state['pending_transforms'] = []
+    if 'pattern_executor' not in state:
+        state['pattern_executor'] = PatternTransformationExecutor()
     
     # Check if data is loaded
     if state.get('hrp1000') is None:
@@ -103,7 +49,7 @@ def show_transformation_panel(state):
     # Transformation selection
     transform_type = st.selectbox(
         "Select Transformation Type",
-        ["Clean Text", "Standardize Dates", "Remove Test Data", "Custom Transformation"],
+        TRANSFORM_TYPES,
         index=0
     )
     
@@ -128,7 +74,45 @@ def show_transformation_panel(state):
             "Keywords indicating test data (comma separated)",
             value="test, temp, dummy"
         )
+        search_cols = st.multiselect(
+            "Columns to search",
+            options=state['hrp1000'].columns,
+            default=get_text_columns(state['hrp1000'])
+        )
         operation = f"Remove rows containing: {test_keywords}"
+        pattern_spec = {
+            'type': transform_type,
+            'pattern': get_keyword_pattern([k.strip() for k in test_keywords.split(",")]),
+            'columns': list(search_cols),
+            'regex': True,
+            'case': False
+        }
+        
+    elif transform_type == "Find and Replace":
+        find_col1, find_col2 = st.columns(2)
+        with find_col1:
+            find_pattern = st.text_input("Find", value="")
+        with find_col2:
+            replace_with = st.text_input("Replace with", value="")
+        replace_cols = st.multiselect(
+            "Columns to search",
+            options=state['hrp1000'].columns,
+            default=["Name"] if "Name" in state['hrp1000'].columns else []
+        )
+        opt_col1, opt_col2 = st.columns(2)
+        with opt_col1:
+            use_regex = st.checkbox("Regular expression", value=False)
+        with opt_col2:
+            match_case = st.checkbox("Match case", value=False)
+        operation = f"Replace '{find_pattern}' with '{replace_with}' in columns: {', '.join(replace_cols)}"
+        pattern_spec = {
+            'type': transform_type,
+            'pattern': find_pattern,
+            'replacement': replace_with,
+            'columns': list(replace_cols),
+            'regex': use_regex,
+            'case': match_case
+        }
         
     elif transform_type == "Custom Transformation":
         operation = "Custom transformation"
@@ -147,7 +131,13 @@ df1000['New_Column'] = df1000['Client'].astype(str) + '_' + df1000['Object ID'].
     # Preview and apply
     if st.button("Preview Transformation"):
         try:
-            preview_df = state['hrp1000'].copy()
+            if transform_type in PATTERN_TRANSFORMS:
+                # Previewed on a sample; the full frame is only scanned when applied
+                preview_df, affected = state['pattern_executor'].preview(state['hrp1000'], pattern_spec)
+                sample_size = min(PREVIEW_SAMPLE_ROWS, len(state['hrp1000']))
+                st.info(f"{affected} of the first {sample_size} rows affected")
+            else:
+                preview_df = state['hrp1000'].copy()
             
             if transform_type == "Clean Text":
                 for col in cols_to_clean:
@@ -157,13 +147,6 @@ df1000['New_Column'] = df1000['Client'].astype(str) + '_' + df1000['Object ID'].
                 for col in date_cols:
                     preview_df[col] = pd.to_datetime(..., format='%d.%m.%Y', errors='coerce')
                     
-            elif transform_type == "Remove Test Data":
-                keywords = [k.strip().lower() for k in test_keywords.split(",")]
-                mask = preview_df.astype(str).apply(
-                    lambda x: x.str.lower().str.contains('|'.join(keywords))
-                ).any(axis=1)
-                preview_df = preview_df[~mask]
-                
             elif transform_type == "Custom Transformation":
                 local_vars = {'df1000': preview_df, 'df1001': state.get('hrp1001'), 'pd': pd}
                 exec(custom_code, globals(), local_vars)
@@ -177,7 +160,8 @@ df1000['New_Column'] = df1000['Client'].astype(str) + '_' + df1000['Object ID'].
                 'type': transform_type,
                 'operation': operation,
                 'preview': preview_df,
-                'code': custom_code if transform_type == "Custom Transformation" else None
+                'code': custom_code if transform_type == "Custom Transformation" else None,
+                'spec': pattern_spec if transform_type in PATTERN_TRANSFORMS else None
             })
             st.success("Transformation preview generated!")
             
@@ -217,12 +201,8 @@ df1000['New_Column'] = df1000['Client'].astype(str) + '_' + df1000['Object ID'].
                         for col in cols:
                             state['hrp1000'][col] = pd.to_datetime(state['hrp1000'][col], format='%d/%m/%Y', errors='coerce')
                             
-                    elif transform['type'] == "Remove Test Data":
-                        keywords = transform['operation'].split(": ")[1].split(", ")
-                        mask = state['hrp1000'].astype(str).apply(
-                            lambda x: x.str.lower().str.contains('|'.join(keywords))
-                        ).any(axis=1)
-                        state['hrp1000'] = state['hrp1000'][~mask]
+                    elif transform['type'] in PATTERN_TRANSFORMS:
+                        state['hrp1000'], _ = state['pattern_executor'].run(state['hrp1000'], transform['spec'])
                         
                     elif transform['type'] == "Custom Transformation":
                         local_vars = {'df1000': state['hrp1000'], 'df1001': state.get('hrp1001'), 'pd': pd}
@@ -236,7 +216,7 @@ df1000['New_Column'] = df1000['Client'].astype(str) + '_' + df1000['Object ID'].
                             'rows_affected': len(state['hrp1000'])
                         },
                         before_snapshot=before,
-                        after_snapshot=state['hrp1000'].copy()
+                        after_snapshot=state['hrp1000']
                     )
                     
                 except Exception as e:
@@ -261,14 +241,47 @@ df1000['New_Column'] = df1000['Client'].astype(str) + '_' + df1000['Object ID'].
                     st.json(entry, expanded=False)
     
     with history_tab2:
-        full_history = state['transformation_log'].get_full_history()
+        st.subheader("Complete Transformation History")
+        filter_col1, filter_col2, filter_col3 = st.columns(3)
+        with filter_col1:
+            operation_filter = st.text_input("Operation", value="", key="history_operation")
+        with filter_col2:
+            type_filter = st.selectbox("Type", ["All"] + TRANSFORM_TYPES, key="history_type")
+        with filter_col3:
+            date_filter = st.date_input("On date", value=None, key="history_date")
+        history_filters = {
+            'operation': operation_filter.strip() or None,
+            'transform_type': None if type_filter == "All" else type_filter,
+            'since': date_filter.isoformat() if date_filter else None,
+            'until': (date_filter + timedelta(days=1)).isoformat() if date_filter else None
+        }
+        
+        # Cursors of the pages shown so far; a filter change starts from the newest entries
+        if state.get('history_filters') != history_filters:
+            state['history_filters'] = history_filters
+            state['history_cursors'] = [None]
+        
+        full_history, next_cursor = state['transformation_log'].get_history_page(
+            cursor=state['history_cursors'][-1], **history_filters
+        )
         if not full_history:
             st.info("No historical transformations found")
         else:
-            st.subheader("Complete Transformation History")
-            for entry in full_history[:50]:  # Limit to 50 most recent
+            for entry in full_history:
                 with st.expander(f"{entry['timestamp']} - {entry['operation']}"):
                     st.json(entry, expanded=False)
+        
+        page_col1, page_col2, page_col3 = st.columns([1, 2, 1])
+        with page_col1:
+            if st.button("⬅️ Newer", disabled=len(state['history_cursors']) == 1, key="history_newer"):
+                state['history_cursors'].pop()
+                st.rerun()
+        with page_col2:
+            st.caption(f"Page {len(state['history_cursors'])}")
+        with page_col3:
+            if st.button("Older ➡️", disabled=next_cursor is None, key="history_older"):
+                state['history_cursors'].append(next_cursor)
+                st.rerun()
     
     with rollback_tab:
         st.subheader("Rollback Transformations")
@@ -283,7 +296,7 @@ df1000['New_Column'] = df1000['Client'].astype(str) + '_' + df1000['Object ID'].
             )
             
             if st.button("⏮️ Rollback Selected Transformation"):
-                rolled_back_df = state['transformation_log'].rollback_to(selected_rollback)
+                rolled_back_df = state['transformation_log'].rollback_to(selected_rollback, state['hrp1000'])
                 if rolled_back_df is not None:
                     state['hrp1000'] = rolled_back_df
                     st.success(f"Successfully rolled back: {selected_rollback}")
@@ -1,7 +1,8 @@
 # utils/__init__.py
 from .nlp_utils import explain_validation_error, generate_llm_explanation
 from .file_utils import load_data, create_download_button
-from .hierarchy_utils import build_hierarchy, optimize_table_display
+from sap_common.streaming_reader import read_upload, read_upload_cached, clear_upload_cache
+from .hierarchy_utils import build_hierarchy, get_hierarchy_graph, optimize_table_display
 from .validation_utils import validate_data
 from .statistics_utils import calculate_statistics
 
@@ -10,7 +11,11 @@ __all__ = [
     'generate_llm_explanation',
     'load_data',
     'create_download_button',
+    'read_upload',
+    'read_upload_cached',
+    'clear_upload_cache',
     'build_hierarchy',
+    'get_hierarchy_graph',
     'optimize_table_display',
     'validate_data',
     'calculate_statistics'
@@ -0,0 +1,182 @@
+import math
+import numpy as np
+import pandas as pd
+
+from foundation_module.utils.transformation_utils import get_frame_fingerprint
+
+# Cell-level deltas between a frame before and after a transformation.
+# Rows are matched on their index labels (the row keys). A delta keeps only
+# what differs: rows added or removed, columns added or removed, columns whose
+# dtype changed and the cells whose value changed, each with its value from
+# before. Reverting a delta on the frame after the transformation gives the
+# frame before it, so a stack of deltas replaces a stack of full copies.
+# Frames without unique row keys or column names fall back to a snapshot.
+
+
+def has_unique_keys(df):
+    """Check whether a frame's rows and columns can be matched by label"""
+    return df.index.is_unique and df.columns.is_unique
+
+
+def get_changed_cells(before_values, after_values):
+    """Positions where two aligned columns differ (missing on both sides counts as equal)"""
+    before_values = before_values.reset_index(drop=True)
+    after_values = after_values.reset_index(drop=True)
+    try:
+        equal = before_values.eq(after_values).fillna(False).to_numpy(dtype=bool, copy=True)
+    except (TypeError, ValueError):
+        equal = np.array([b is a or b == a for b, a in zip(before_values, after_values)], dtype=bool)
+    equal |= before_values.isna().to_numpy(dtype=bool) & after_values.isna().to_numpy(dtype=bool)
+    return np.flatnonzero(~equal)
+
+
+def diff_frames(before, after):
+    """Delta turning after back into before, or a snapshot delta when rows/columns have no unique keys.
+
+    The delta holds 'removed_rows' (the before rows, with their positions),
+    'added_rows' (keys), 'order' (the before order of the kept rows, only if
+    it changed), 'added_columns', 'replaced_columns' (before values of removed
+    columns and columns whose dtype changed) and 'cells' (before values of
+    changed cells, by column), plus 'changed_after' with the matching after
+    values for the log. 'fingerprint' identifies the after frame.
+    """
+    if not has_unique_keys(before) or not has_unique_keys(after):
+        return {'snapshot': before.copy(), 'fingerprint': get_frame_fingerprint(after)}
+
+    after_positions = before.index.get_indexer(after.index)
+    added = after_positions < 0
+    kept_before = np.zeros(len(before), dtype=bool)
+    kept_before[after_positions[~added]] = True
+
+    kept_keys = after.index[~added]
+    before_positions = after_positions[~added]
+    order = None
+    if len(before_positions) and (np.diff(before_positions) < 0).any():
+        order = before.index[kept_before]
+
+    after_kept = after.iloc[np.flatnonzero(~added)]
+    added_columns = [col for col in after.columns if col not in before.columns]
+    replaced_columns = {}
+    cells = {}
+    changed_after = {}
+    for col in before.columns:
+        before_values = before[col].iloc[before_positions]
+        if col not in after.columns:
+            replaced_columns[col] = before_values.set_axis(kept_keys)
+            continue
+        after_values = after_kept[col]
+        changed = get_changed_cells(before_values, after_values)
+        if before[col].dtype != after[col].dtype:
+            replaced_columns[col] = before_values.set_axis(kept_keys)
+        elif len(changed):
+            cells[col] = before_values.iloc[changed].set_axis(kept_keys[changed])
+        if len(changed):
+            changed_after[col] = after_values.iloc[changed]
+
+    return {
+        'columns': list(before.columns),
+        'dtypes': before.dtypes,
+        'removed_rows': before.iloc[np.flatnonzero(~kept_before)],
+        'removed_positions': np.flatnonzero(~kept_before),
+        'added_rows': after.index[added],
+        'order': order,
+        'added_columns': added_columns,
+        'replaced_columns': replaced_columns,
+        'cells': cells,
+        'changed_after': changed_after,
+        'fingerprint': get_frame_fingerprint(after)
+    }
+
+
+def revert_frame_delta(df, delta):
+    """The frame before a transformation, from the frame after it and its delta"""
+    if 'snapshot' in delta:
+        return delta['snapshot'].copy()
+
+    result = df.drop(index=delta['added_rows'], columns=delta['added_columns'])
+    if delta['order'] is not None:
+        result = result.loc[delta['order']]
+    result = result.copy()
+
+    for col, values in delta['replaced_columns'].items():
+        result[col] = values
+    for col, values in delta['cells'].items():
+        column = result[col].copy()
+        column.iloc[column.index.get_indexer(values.index)] = values.to_numpy()
+        result[col] = column
+    result = result[delta['columns']]
+
+    removed = delta['removed_rows']
+    if len(removed):
+        rows = len(result) + len(removed)
+        take = np.empty(rows, dtype=np.intp)
+        is_removed = np.zeros(rows, dtype=bool)
+        is_removed[delta['removed_positions']] = True
+        take[is_removed] = len(result) + np.arange(len(removed))
+        take[~is_removed] = np.arange(len(result))
+        result = pd.concat([result, removed]).iloc[take]
+
+    mismatched = {
+        col: dtype for col, dtype in delta['dtypes'].items()
+        if result[col].dtype != dtype
+    }
+    return result.astype(mismatched) if mismatched else result
+
+
+def to_json_values(values):
+    """Plain Python values of a Series or Index for the JSON log (missing values as None)"""
+    def convert(value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return None
+        if pd.api.types.is_scalar(value) and pd.isna(value):
+            return None
+        if isinstance(value, np.generic):
+            return value.item()
+        return value if isinstance(value, (str, int, float, bool)) else str(value)
+    return [convert(value) for value in pd.Series(values, dtype=object)]
+
+
+def to_json_records(df):
+    """Rows of a frame as JSON records keyed by column, with the row key under 'key'"""
+    columns = {str(col): to_json_values(df[col]) for col in df.columns}
+    keys = to_json_values(df.index)
+    return [
+        dict({'key': key}, **{col: values[i] for col, values in columns.items()})
+        for i, key in enumerate(keys)
+    ]
+
+
+def describe_frame_delta(delta, after):
+    """JSON-ready summary of a delta: changed cells with both values, added/removed rows and columns"""
+    if 'snapshot' in delta:
+        return {'snapshot': True, 'rows_before': len(delta['snapshot']), 'rows_after': len(after)}
+
+    cells = {}
+    for col, after_values in delta['changed_after'].items():
+        before_values = delta['cells'].get(col)
+        if before_values is None:
+            before_values = delta['replaced_columns'][col].loc[after_values.index]
+        cells[str(col)] = {
+            'keys': to_json_values(after_values.index),
+            'before': to_json_values(before_values),
+            'after': to_json_values(after_values)
+        }
+
+    return {
+        'rows_added': to_json_records(after.loc[delta['added_rows']]),
+        'rows_removed': to_json_records(delta['removed_rows']),
+        'columns_added': [str(col) for col in delta['added_columns']],
+        'columns_removed': [str(col) for col in delta['replaced_columns'] if col not in after.columns],
+        'cells': cells
+    }
+
+
+def get_delta_counts(delta):
+    """Rows added/removed and cells changed by a delta"""
+    if 'snapshot' in delta:
+        return {'rows_added': None, 'rows_removed': None, 'cells_changed': None}
+    return {
+        'rows_added': len(delta['added_rows']),
+        'rows_removed': len(delta['removed_rows']),
+        'cells_changed': sum(len(values) for values in delta['changed_after'].values())
+    }
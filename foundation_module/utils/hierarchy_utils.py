@@ -1,73 +1,137 @@
+import numpy as np
 import pandas as pd
-import networkx as nx
 from io import BytesIO
 
+# Hierarchy builder for the legacy foundation panels.
+# Object IDs are coded as integers once; HRP1001 edges between known units are
+# coded in bulk and every unit's level comes from a single breadth-first
+# search started from all roots at once, one frontier per level. The tables
+# are assembled column-wise from the codes. The NetworkX graph is only built
+# when asked for (get_hierarchy_graph).
+
+
+def get_node_codes(hrp1000):
+    """Distinct Object IDs in order of first appearance, plus the last HRP1000 row position of each"""
+    object_ids = hrp1000['Object ID'].to_numpy(dtype=object)
+    # A missing Object ID is a unit of its own, as it was as a graph node
+    row_codes, nodes = pd.factorize(object_ids, use_na_sentinel=False)
+    # A repeated ID takes its name from its last row, like dict(zip(...)) would
+    last_rows = np.full(len(nodes), -1, dtype=np.intp)
+    np.maximum.at(last_rows, row_codes, np.arange(len(object_ids), dtype=np.intp))
+    return pd.Index(nodes, dtype=object), last_rows
+
+
+def get_edge_codes(nodes, hrp1001):
+    """Distinct Source ID -> Target object ID edges between known units, as codes in first-seen order"""
+    sources = nodes.get_indexer(hrp1001['Source ID'].to_numpy(dtype=object))
+    targets = nodes.get_indexer(hrp1001['Target object ID'].to_numpy(dtype=object))
+    known = (sources >= 0) & (targets >= 0)
+    edges = pd.DataFrame({'source': sources[known], 'target': targets[known]}).drop_duplicates()
+    return edges['source'].to_numpy(), edges['target'].to_numpy()
+
+
+def assign_levels(node_count, sources, targets):
+    """Breadth-first search from every root (unit without incoming edges) at once.
+
+    Returns (visited, levels, trees): the reached codes in discovery order,
+    each code's 0-based level (-1 if unreachable) and the position of the
+    root whose search reached it first.
+    """
+    levels = np.full(node_count, -1, dtype=np.int64)
+    trees = np.full(node_count, -1, dtype=np.intp)
+
+    roots = np.flatnonzero(np.bincount(targets, minlength=node_count) == 0)
+    levels[roots] = 0
+    trees[roots] = np.arange(len(roots))
+
+    # Successors grouped by source, each group in edge order
+    by_source = np.argsort(sources, kind='stable')
+    successors = targets[by_source]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=node_count))])
+
+    visited = [roots]
+    frontier = roots
+    depth = 0
+    while len(frontier):
+        counts = offsets[frontier + 1] - offsets[frontier]
+        starts = np.repeat(offsets[frontier] - np.cumsum(counts) + counts, counts)
+        found = successors[starts + np.arange(counts.sum())]
+        discovered_by = np.repeat(frontier, counts)
+
+        new = levels[found] < 0
+        found, discovered_by = found[new], discovered_by[new]
+        _, first = np.unique(found, return_index=True)
+        first.sort()
+
+        depth += 1
+        frontier = found[first]
+        levels[frontier] = depth
+        trees[frontier] = trees[discovered_by[first]]
+        visited.append(frontier)
+
+    return np.concatenate(visited), levels, trees
+
+
 def build_hierarchy(hrp1000, hrp1001):
-    """Build organizational hierarchy from HRP1000 and HRP1001 data"""
-    # Create a mapping of Object ID to Name
-    id_to_name = dict(zip(hrp1000['Object ID'], hrp1000['Name']))
-    
-    # Create a directed graph
-    G = nx.DiGraph()
-    
-    # Add nodes
-    for obj_id in hrp1000['Object ID']:
-        G.add_node(obj_id)
-    
-    # Add edges from HRP1001
-    for _, row in hrp1001.iterrows():
-        if row['Source ID'] in G.nodes and row['Target object ID'] in G.nodes:
-            G.add_edge(row['Source ID'], row['Target object ID'])
-    
-    # Find roots (nodes with no incoming edges)
-    roots = [node for node in G.nodes if G.in_degree(node) == 0]
-    
-    # Build hierarchy levels
-    hierarchy = []
-    max_level = 0
-    
-    for root in roots:
-        levels = nx.single_source_shortest_path_length(G, root)
-        for node, level in levels.items():
-            hierarchy.append({
-                'Object ID': node,
-                'Name': id_to_name.get(node, 'Unknown'),
-                'Level': level + 1,  # Make level 1-based
-                'Parent': next(iter(G.predecessors(node)), None) if G.in_degree(node) > 0 else None
-            })
-            if level + 1 > max_level:
-                max_level = level + 1
-    
-    # Create hierarchy table
-    hierarchy_table = pd.DataFrame(hierarchy)
-    
-    # Add parent names
-    hierarchy_table['Parent Name'] = hierarchy_table['Parent'].map(id_to_name)
-    
-    # Create level associations
-    level_associations = []
-    
-    for level in range(1, max_level + 1):
-        level_df = hierarchy_table[hierarchy_table['Level'] == level]
-        parent_level = level - 1 if level > 1 else None
-        
-        for _, row in level_df.iterrows():
-            level_associations.append({
-                'Level': level,
-                'Object ID': row['Object ID'],
-                'Name': row['Name'],
-                'Parent ID': row['Parent'],
-                'Parent Name': row['Parent Name']
-            })
-    
-    level_associations = pd.DataFrame(level_associations)
-    
+    """Build organizational hierarchy from HRP1000 and HRP1001 data.
+
+    Rows are listed root by root, each root's units in breadth-first order.
+    A unit reachable from several roots is listed once, at its shortest
+    distance from a root and under the root that reaches it first.
+    """
+    nodes, last_rows = get_node_codes(hrp1000)
+    sources, targets = get_edge_codes(nodes, hrp1001)
+    visited, levels, trees = assign_levels(len(nodes), sources, targets)
+
+    # Listed tree by tree; levels already ascend in discovery order
+    codes = visited[np.argsort(trees[visited], kind='stable')]
+
+    # Each unit's parent is the source of its first incoming edge
+    first_parent = np.full(len(nodes), -1, dtype=np.intp)
+    first_edge = np.unique(targets, return_index=True)
+    first_parent[first_edge[0]] = sources[first_edge[1]]
+
+    node_ids = nodes.to_numpy(dtype=object)
+    node_names = hrp1000['Name'].to_numpy(dtype=object)[last_rows]
+    parent_codes = first_parent[codes]
+    has_parent = parent_codes >= 0
+
+    hierarchy_table = pd.DataFrame({
+        'Object ID': node_ids[codes].tolist(),
+        'Name': node_names[codes].tolist(),
+        'Level': (levels[codes] + 1).tolist(),  # Make level 1-based
+        'Parent': np.where(has_parent, node_ids[parent_codes], None).tolist()
+    }, columns=['Object ID', 'Name', 'Level', 'Parent'])
+    # Text like Name, also when no unit has a parent
+    hierarchy_table['Parent Name'] = pd.Series(
+        np.where(has_parent, node_names[parent_codes], np.nan).tolist(), index=hierarchy_table.index
+    ).astype(hierarchy_table['Name'].dtype)
+
+    # Level associations: the same rows grouped by level
+    by_level = np.argsort(hierarchy_table['Level'].to_numpy(), kind='stable')
+    level_associations = hierarchy_table.iloc[by_level].rename(columns={'Parent': 'Parent ID'})
+    level_associations = level_associations[['Level', 'Object ID', 'Name', 'Parent ID', 'Parent Name']].reset_index(drop=True)
+
     return {
         'hierarchy_table': hierarchy_table,
         'level_associations': level_associations,
-        'max_level': max_level
+        'max_level': int(levels.max()) + 1 if len(visited) else 0,
+        'nodes': nodes,
+        'edges': pd.DataFrame({'Source ID': node_ids[sources], 'Target object ID': node_ids[targets]}, dtype=object)
     }
 
+
+def get_hierarchy_graph(hierarchy):
+    """NetworkX view of a built hierarchy (Source ID -> Target object ID), built on first use"""
+    if 'graph' not in hierarchy:
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(hierarchy['nodes'])
+        graph.add_edges_from(hierarchy['edges'].itertuples(index=False, name=None))
+        hierarchy['graph'] = graph
+    return hierarchy['graph']
+
 def optimize_table_display(df):
     """Optimize DataFrame for Streamlit display"""
     # Make a copy to avoid modifying original
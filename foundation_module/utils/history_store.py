@@ -0,0 +1,150 @@
+import os
+import json
+import sqlite3
+from contextlib import closing
+
+# Indexed store for the transformation history.
+# Entries live in one SQLite table with indexes on timestamp and on
+# operation / type (each followed by timestamp), and are read a page at a
+# time, newest first. Pages continue from a cursor (timestamp and id of the
+# last entry shown) instead of an OFFSET, so every page costs an index seek
+# plus the page itself, however long the history is. The transforms_<date>
+# .json/.jsonl logs of earlier versions are imported once; each file is
+# recorded so it is never read again.
+
+HISTORY_DB_NAME = "transform_history.db"
+HISTORY_PAGE_SIZE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transforms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    operation TEXT,
+    type TEXT,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transforms_timestamp ON transforms (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_transforms_operation ON transforms (operation, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_transforms_type ON transforms (type, timestamp, id);
+CREATE TABLE IF NOT EXISTS migrated_files (
+    filename TEXT PRIMARY KEY
+);
+"""
+
+
+def get_entry_row(entry):
+    """Column values of a log entry for the transforms table"""
+    details = entry.get('details')
+    return (
+        str(entry.get('timestamp', '')),
+        entry.get('operation'),
+        details.get('type') if isinstance(details, dict) else None,
+        json.dumps(entry, default=str)
+    )
+
+
+def read_legacy_log(path):
+    """Entries of a transforms_<date>.json or .jsonl log (lines that do not parse are skipped)"""
+    with open(path, 'r') as f:
+        if path.endswith(".json"):
+            entries = json.load(f)
+            return entries if isinstance(entries, list) else []
+        entries = []
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+
+class TransformationHistoryStore:
+    """SQLite transformation history with cursor-paginated, filtered queries"""
+
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, HISTORY_DB_NAME)
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        # A connection per call: Streamlit reruns may come from different threads
+        return closing(sqlite3.connect(self.path))
+
+    def add(self, entry):
+        """Store one log entry"""
+        with self.connect() as conn, conn:
+            conn.execute(
+                "INSERT INTO transforms (timestamp, operation, type, entry) VALUES (?, ?, ?, ?)",
+                get_entry_row(entry)
+            )
+
+    def migrate_legacy_logs(self):
+        """Import the transforms_<date>.json/.jsonl logs not imported yet; returns the entries added"""
+        if not os.path.exists(self.log_dir):
+            return 0
+        filenames = sorted(
+            filename for filename in os.listdir(self.log_dir)
+            if filename.startswith("transforms_") and filename.endswith((".json", ".jsonl"))
+        )
+        if not filenames:
+            return 0
+
+        added = 0
+        with self.connect() as conn:
+            migrated = {row[0] for row in conn.execute("SELECT filename FROM migrated_files")}
+            for filename in filenames:
+                if filename in migrated:
+                    continue
+                try:
+                    entries = read_legacy_log(os.path.join(self.log_dir, filename))
+                except (OSError, ValueError):
+                    # Left for the next start, e.g. a file still being written
+                    continue
+                rows = [get_entry_row(entry) for entry in entries if isinstance(entry, dict)]
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO transforms (timestamp, operation, type, entry) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                    conn.execute("INSERT INTO migrated_files (filename) VALUES (?)", (filename,))
+                added += len(rows)
+        return added
+
+    def get_page(self, cursor=None, page_size=HISTORY_PAGE_SIZE, operation=None, transform_type=None,
+                 since=None, until=None):
+        """One page of entries, newest first, and the cursor of the next page (None on the last page).
+
+        cursor is the value returned with the previous page; operation and
+        transform_type match exactly, since/until bound the ISO timestamp
+        (until is exclusive).
+        """
+        conditions = []
+        params = []
+        if operation:
+            conditions.append("operation = ?")
+            params.append(operation)
+        if transform_type:
+            conditions.append("type = ?")
+            params.append(transform_type)
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        if cursor is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(cursor)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (
+            f"SELECT id, timestamp, entry FROM transforms {where} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?"
+        )
+        with self.connect() as conn:
+            rows = conn.execute(query, params + [page_size + 1]).fetchall()
+
+        entries = [json.loads(row[2]) for row in rows[:page_size]]
+        next_cursor = (rows[page_size - 1][1], rows[page_size - 1][0]) if len(rows) > page_size else None
+        return entries, next_cursor
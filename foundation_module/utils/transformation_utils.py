@@ -0,0 +1,199 @@
+import re
+import weakref
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+from sap_common.fingerprint import hash_frame
+
+# Pattern transformations for the transformation panel.
+# A find (Remove Test Data) or find-and-replace is described by a spec; its
+# pattern is compiled once and run only over the targeted text columns. Each
+# column is factorized first, so the vectorized str.contains / str.replace
+# only sees its distinct values and the codes map the result back to rows.
+# Previews run on a sample of rows. The executor keeps the last full-frame
+# result (the matching rows and the rewritten columns, not a copy of the
+# frame), keyed on the spec and the identity of the targeted columns' data,
+# so Streamlit reruns and repeated applies do not rescan the data until the
+# pattern changes or a targeted column is replaced.
+
+PREVIEW_SAMPLE_ROWS = 1000
+
+# Array type of NumPy-backed columns (named PandasArray before pandas 2.1)
+NumpyExtensionArray = getattr(pd.arrays, 'NumpyExtensionArray', None) or pd.arrays.PandasArray
+
+
+@lru_cache(maxsize=128)
+def compile_pattern(pattern, regex=True, case=False):
+    """Compile a find pattern once; literal patterns are escaped, matching ignores case unless asked"""
+    return re.compile(pattern if regex else re.escape(pattern), 0 if case else re.IGNORECASE)
+
+
+def get_keyword_pattern(keywords):
+    """Alternation of the non-empty keywords, as the Remove Test Data transformation matches them"""
+    return '|'.join(keyword for keyword in keywords if keyword)
+
+
+def get_text_columns(df):
+    """Columns holding text: object, string or categorical dtype"""
+    return [
+        col for col in df.columns
+        if df[col].dtype == object
+        or isinstance(df[col].dtype, (pd.StringDtype, pd.CategoricalDtype))
+    ]
+
+
+def get_target_columns(df, columns=None):
+    """The spec's columns that exist in the frame, or every text column when none are given"""
+    if not columns:
+        return get_text_columns(df)
+    return [col for col in columns if col in df.columns]
+
+
+def match_column(values, compiled):
+    """Rows of a column whose text contains the pattern (missing values never match)"""
+    codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return np.zeros(len(values), dtype=bool)
+    texts = pd.Series(np.asarray(uniques, dtype=object), dtype=object).map(str)
+    unique_matches = texts.str.contains(compiled, regex=True, na=False).to_numpy(dtype=bool)
+    return (codes >= 0) & unique_matches[codes]
+
+
+def replace_column(values, compiled, replacement, literal=False):
+    """Column with the pattern replaced in every text value; values without a match keep their type.
+
+    A literal replacement is inserted as it is; otherwise group references
+    such as \\1 in it are expanded.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    is_text = uniques.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    if not is_text.any():
+        return values
+
+    replaced = uniques.copy()
+    if literal:
+        text = replacement
+        replacement = lambda match: text
+    replaced[is_text] = uniques[is_text].str.replace(compiled, replacement, regex=True)
+    data = np.empty(len(values), dtype=object)
+    data[codes >= 0] = replaced.to_numpy(dtype=object)[codes[codes >= 0]]
+    data[codes < 0] = values.to_numpy(dtype=object)[codes < 0]
+
+    result = pd.Series(data, index=values.index, name=values.name)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return result.astype('category')
+    return result.astype(values.dtype) if isinstance(values.dtype, pd.StringDtype) else result
+
+
+def find_rows(df, spec):
+    """Boolean mask of the rows where any targeted column matches the spec's pattern"""
+    mask = np.zeros(len(df), dtype=bool)
+    if not spec.get('pattern'):
+        return mask
+    compiled = compile_pattern(spec['pattern'], spec.get('regex', True), spec.get('case', False))
+    for col in get_target_columns(df, spec.get('columns')):
+        mask |= match_column(df[col], compiled)
+    return mask
+
+
+def get_replaced_columns(df, spec, mask):
+    """The targeted columns with the spec's replacement applied (none if no row matches)"""
+    if not mask.any():
+        return {}
+    regex = spec.get('regex', True)
+    compiled = compile_pattern(spec['pattern'], regex, spec.get('case', False))
+    return {
+        col: replace_column(df[col], compiled, spec.get('replacement', ''), literal=not regex)
+        for col in get_target_columns(df, spec.get('columns'))
+    }
+
+
+def build_pattern_result(df, spec, mask, replaced):
+    """Result frame of a spec from its matching rows and rewritten columns"""
+    if spec['type'] == 'Remove Test Data':
+        return df[~mask]
+
+    result = df.copy()
+    for col, values in replaced.items():
+        result[col] = values.set_axis(df.index)
+    return result
+
+
+def apply_pattern_transformation(df, spec):
+    """Run a spec over a frame and return (result, affected rows).
+
+    'Remove Test Data' drops the matching rows; 'Find and Replace' rewrites
+    the matches in the targeted columns. The input frame is not modified.
+    """
+    mask = find_rows(df, spec)
+    replaced = get_replaced_columns(df, spec, mask) if spec['type'] != 'Remove Test Data' else {}
+    return build_pattern_result(df, spec, mask, replaced), int(mask.sum())
+
+
+def get_column_data(values):
+    """The object holding a column's data, which stays the same until the column is replaced"""
+    data = values.array
+    if isinstance(data, NumpyExtensionArray):
+        data = data.to_numpy()
+        return data if data.base is None else data.base
+    return data
+
+
+def get_frame_fingerprint(df):
+    """Content fingerprint of a frame (values, index, columns and dtypes).
+
+    Not memoized per frame object: the transformation panel edits frames in place.
+    """
+    return hash_frame(df, index=True)
+
+
+def get_spec_key(spec):
+    """Hashable key of a transformation spec"""
+    return repr(sorted((key, tuple(value) if isinstance(value, list) else value) for key, value in spec.items()))
+
+
+class PatternTransformationExecutor:
+    """Runs pattern transformations, memoizing the most recent full-frame result"""
+
+    def __init__(self):
+        self.last_result = None
+
+    def preview(self, df, spec, sample_rows=PREVIEW_SAMPLE_ROWS):
+        """Result of a spec on the first sample_rows rows only"""
+        return apply_pattern_transformation(df.head(sample_rows), spec)
+
+    def get_cached(self, key, column_data):
+        """Matching rows and rewritten columns of the last run, if it had the same key and column data"""
+        last = self.last_result
+        if last is None or last['key'] != key:
+            return None
+        if any(ref() is not data for ref, data in zip(last['column_data'], column_data)):
+            return None
+        return last['mask'], last['replaced']
+
+    def run(self, df, spec):
+        """Result of a spec on the whole frame; repeated runs on unchanged columns reuse it.
+
+        Only replacing a targeted column is noticed, not editing its values
+        in place.
+        """
+        columns = get_target_columns(df, spec.get('columns'))
+        column_data = [get_column_data(df[col]) for col in columns]
+        key = (get_spec_key(spec), tuple(columns), len(df))
+
+        cached = self.get_cached(key, column_data)
+        if cached is None:
+            mask = find_rows(df, spec)
+            replaced = get_replaced_columns(df, spec, mask) if spec['type'] != 'Remove Test Data' else {}
+            # Weak references, so the cache does not keep replaced columns alive
+            self.last_result = {
+                'key': key,
+                'column_data': [weakref.ref(data) for data in column_data],
+                'mask': mask,
+                'replaced': replaced
+            }
+        else:
+            mask, replaced = cached
+        return build_pattern_result(df, spec, mask, replaced), int(mask.sum())
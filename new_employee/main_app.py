@@ -1,6 +1,9 @@
 import streamlit as st
+import os
 import sys
 sys.path.append('panels')
+# Repository root, for the shared sap_common package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import panel functions - FIXED imports
 from employee_main_panel import show_employee_panel
@@ -8,6 +11,7 @@ from employee_statistics_panel import show_employee_statistics_panel
 from employee_validation_panel import show_employee_validation_panel
 from employee_dashboard_panel import show_employee_dashboard_panel
 from employee_admin_panel import show_employee_admin_panel
+from sap_common.session_memory import SessionMemoryManager
 
 # Configure Streamlit for better performance
 st.set_page_config(
@@ -17,9 +21,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state
+# Initialize session state (source/merged/generated frames are kept within the session memory budget)
 if 'state' not in st.session_state:
-    st.session_state.state = {}
+    st.session_state.state = SessionMemoryManager()
 
 state = st.session_state.state
 
@@ -8,6 +8,7 @@ import json
 import psutil
 import os
 from collections import defaultdict
+from sap_common.session_memory import get_frame_summary, get_session_memory_report, get_session_memory_totals
 
 def get_system_performance():
     """Get simple system performance metrics"""
@@ -43,38 +44,26 @@ def analyze_data_size_and_performance(state):
         # Analyze source files
         source_files = ['PA0001', 'PA0002', 'PA0006', 'PA0105']
         
+        # Sizes come from the session memory manager, so spilled frames are not reloaded
         for file_key in source_files:
-            source_data = state.get(f'source_{file_key.lower()}')
-            if source_data is not None and not source_data.empty:
-                try:
-                    size_mb = source_data.memory_usage(deep=True).sum() / 1024 / 1024
-                    analysis['file_sizes'][file_key] = {
-                        'size_mb': round(size_mb, 1),
-                        'rows': len(source_data),
-                        'columns': len(source_data.columns)
-                    }
-                    analysis['total_data_size_mb'] += size_mb
-                except:
-                    analysis['file_sizes'][file_key] = {
-                        'size_mb': 0,
-                        'rows': 0,
-                        'columns': 0
-                    }
+            summary = get_frame_summary(state, f'source_{file_key.lower()}')
+            if summary is not None and summary['rows'] > 0:
+                analysis['file_sizes'][file_key] = {
+                    'size_mb': round(summary['size_mb'], 1),
+                    'rows': summary['rows'],
+                    'columns': summary['columns']
+                }
+                analysis['total_data_size_mb'] += summary['size_mb']
         
         # Analyze output files
-        output_files = state.get('generated_employee_files', {})
-        if output_files and 'employee_data' in output_files:
-            try:
-                output_data = output_files['employee_data']
-                output_size_mb = output_data.memory_usage(deep=True).sum() / 1024 / 1024
-                analysis['file_sizes']['Employee Output'] = {
-                    'size_mb': round(output_size_mb, 1),
-                    'rows': len(output_data),
-                    'columns': len(output_data.columns)
-                }
-                analysis['total_data_size_mb'] += output_size_mb
-            except:
-                pass
+        output_summary = get_frame_summary(state, 'generated_employee_files')
+        if output_summary is not None:
+            analysis['file_sizes']['Employee Output'] = {
+                'size_mb': round(output_summary['size_mb'], 1),
+                'rows': output_summary['rows'],
+                'columns': output_summary['columns']
+            }
+            analysis['total_data_size_mb'] += output_summary['size_mb']
         
         analysis['total_data_size_mb'] = round(analysis['total_data_size_mb'], 1)
         
@@ -176,6 +165,31 @@ def check_data_health(state):
     
     return health_status
 
+def show_session_memory(state):
+    """Per-key memory of the data frames held in this session"""
+    st.subheader("🧠 Session Memory")
+    
+    report = get_session_memory_report(state)
+    if report.empty:
+        st.info("No data frames stored in this session yet")
+        return
+    
+    totals = get_session_memory_totals(state)
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("In Memory", f"{totals['memory_mb']:.1f} MB", help="Data frames currently held in memory by this session")
+    
+    with col2:
+        st.metric("Spilled to Disk", f"{totals['spilled_mb']:.1f} MB", help="Least recently used frames moved to disk; they reload when next used")
+    
+    with col3:
+        budget = f"{totals['budget_mb']:.0f} MB" if totals['budget_mb'] else "Not set"
+        st.metric("Session Budget", budget)
+    
+    st.dataframe(report, use_container_width=True)
+    st.caption(f"{totals['spill_count']} spills and {totals['reload_count']} reloads this session")
+
 def show_employee_dashboard_panel(state):
     """Simple, actionable dashboard for employee data processing"""
     
@@ -329,6 +343,9 @@ def show_employee_dashboard_panel(state):
         st.warning("No employee data files loaded yet")
         st.info("**What to do:** Go to Employee panel → Upload your PA files → Return here to monitor performance")
     
+    # Per-key session memory
+    show_session_memory(state)
+    
     # Quick Actions
     st.subheader("⚡ Quick Actions")
     
@@ -7,61 +7,94 @@ import io
 from openpyxl import Workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 import traceback
-
-# Performance optimization with caching
-@st.cache_data(ttl=600)  # Cache for 10 minutes
-def merge_pa_files_cached(pa0002_hash, pa0001_hash, pa0006_hash, pa0105_hash):
-    """Cache merged PA files to avoid re-processing"""
-    return None  # Placeholder for cache key
+from employee_output_engine import (
+    EMPLOYEE_TARGET_COLUMNS, build_employee_column_plan, build_employee_output, get_cached_columns, get_cached_rows, build_column_cache
+)
+from sap_common.streaming_reader import read_uploaded_file, compact_output_frame
+from sap_common.delta_engine import hash_rows, get_delta_counts, build_delta_frame
+from sap_common.fingerprint import get_frame_fingerprint, get_unique_rows
 
 def is_dataframe_available(df):
     """Check if DataFrame is available and not empty"""
     return df is not None and isinstance(df, pd.DataFrame) and not df.empty
 
 
+# PA files joined onto PA0002, in merge order
+PA_MERGE_ORDER = ['PA0001', 'PA0006', 'PA0105']
+
 def get_or_create_merged_data(state):
-    """Get merged data from cache or create it - OPTIMIZED"""
-    
-    # Check if we already have merged data in session state
-    if 'merged_employee_data' in state:
-        cached_data = state['merged_employee_data']
-        if is_dataframe_available(cached_data):
-            return cached_data
+    """Get merged data from cache or create it - memoized on per-file fingerprints"""
     
     # Get source files
     pa0002 = state.get('source_pa0002')
-    pa0001 = state.get('source_pa0001') 
-    pa0006 = state.get('source_pa0006')
-    pa0105 = state.get('source_pa0105')
+    pa_files = {file_key: state.get(f'source_{file_key.lower()}') for file_key in PA_MERGE_ORDER}
     
     if not is_dataframe_available(pa0002):
         return None
     
-    with st.spinner("🔄 Merging PA files (one-time setup)..."):
-        # Start with PA0002 as base
-        merged_data = pa0002.copy()
-        
-        # Merge other files efficiently - FIXED CODE
-        merge_stats = {'PA0002': len(merged_data)}
+    # A file only takes part in the merge if it is loaded and has the key column
+    fingerprints = [('PA0002', get_frame_fingerprint(pa0002))]
+    for file_key in PA_MERGE_ORDER:
+        file_df = pa_files[file_key]
+        mergeable = is_dataframe_available(file_df) and 'Pers.No.' in file_df.columns
+        fingerprints.append((file_key, get_frame_fingerprint(file_df) if mergeable else None))
+    
+    # Reuse the merged data while none of the source files changed
+    if 'merged_employee_data' in state and state.get('merged_employee_fingerprints') == fingerprints:
+        cached_data = state['merged_employee_data']
+        if is_dataframe_available(cached_data):
+            return cached_data
+    
+    # Only the join chain up to its last join is kept (under a managed key):
+    # replacing only the last file (e.g. PA0105) redoes just that join
+    merge_prefix = state.get('merged_employee_prefix')
+    # Each joined file's first record per employee is kept per file fingerprint (also under a managed key):
+    # replacing one file (e.g. PA0006) deduplicates just that file again
+    unique_rows = dict(state.get('merged_employee_unique') or {})
+    joins = [
+        (step, file_key) for step, (file_key, fingerprint) in enumerate(fingerprints[1:], start=1)
+        if fingerprint is not None
+    ]
+    
+    with st.spinner("🔄 Merging PA files..."):
+        merge_stats = {'PA0002': len(pa0002)}
+        merged_data = pa0002
+        start = 0
+        if len(joins) > 1 and isinstance(merge_prefix, dict) and merge_prefix.get('key') == fingerprints[:joins[-2][0] + 1]:
+            merged_data = merge_prefix['data']
+            merge_stats.update(merge_prefix['stats'])
+            start = len(joins) - 1
+        
+        for position in range(start, len(joins)):
+            step, file_key = joins[position]
+            file_df = pa_files[file_key]
+            
+            # Only keep first record per employee to prevent duplicates
+            file_df_unique = get_unique_rows(unique_rows, file_key, file_df, fingerprints[step][1], 'Pers.No.')
+            merge_stats[file_key] = len(file_df_unique)
+            st.write(f"✅ Merged {file_key}: {len(file_df):,} records → {len(file_df_unique):,} unique employees")
+            merged_data = merged_data.merge(
+                file_df_unique, 
+                on='Pers.No.', 
+                how='left', 
+                suffixes=('', f'_{file_key}')
+            )
+            if position == len(joins) - 2:
+                state['merged_employee_prefix'] = {
+                    'key': fingerprints[:step + 1], 'data': merged_data, 'stats': dict(merge_stats)
+                }
         
-        # FIXED CODE - Only keep first record per employee to prevent duplicates:
-        for file_key, file_df in [('PA0001', pa0001), ('PA0006', pa0006), ('PA0105', pa0105)]:
-            if is_dataframe_available(file_df) and 'Pers.No.' in file_df.columns:
-                # 🔧 FIX: Only keep first record per employee to prevent duplicates
-                file_df_unique = file_df.drop_duplicates(subset=['Pers.No.'], keep='first')
-                st.write(f"✅ Merged {file_key}: {len(file_df):,} records → {len(file_df_unique):,} unique employees")
-                
-                merged_data = merged_data.merge(
-                    file_df_unique, 
-                    on='Pers.No.', 
-                    how='left', 
-                    suffixes=('', f'_{file_key}')
-                )
-                
-                merge_stats[file_key] = len(file_df_unique)  # Use unique count
+        if len(joins) < 2 and 'merged_employee_prefix' in state:
+            del state['merged_employee_prefix']
+        state['merged_employee_unique'] = {
+            file_key: unique_rows[file_key] for _, file_key in joins if file_key in unique_rows
+        }
+        if not joins:
+            merged_data = pa0002.copy()
         
         # Cache the merged data in session state
         state['merged_employee_data'] = merged_data
+        state['merged_employee_fingerprints'] = fingerprints
         state['merge_stats'] = merge_stats
         
         st.success(f"🎉 Merged data cached: {len(merged_data):,} employees ready for processing")
@@ -234,7 +267,7 @@ def apply_employee_transformation(value, transformation, mapping_config=None, so
     else:
         return value
 
-def create_employee_output_dataframe_optimized(merged_data, mappings, max_rows=None):
+def create_employee_output_dataframe_optimized(merged_data, mappings, max_rows=None, reuse=None):
     """Create employee output DataFrame - OPTIMIZED with row limiting"""
     
     if not is_dataframe_available(mappings) or not is_dataframe_available(merged_data):
@@ -247,66 +280,10 @@ def create_employee_output_dataframe_optimized(merged_data, mappings, max_rows=N
     else:
         process_data = merged_data
     
-    # Create output data structure
-    output_data = []
-    
-    # Standard employee fields
-    target_columns = [
-        'STATUS', 'USERID', 'USERNAME', 'FIRSTNAME', 'LASTNAME', 
-        'EMAIL', 'DEPARTMENT', 'HIREDATE', 'BIZ_PHONE', 'MANAGER'
-    ]
-    
-    # Process each employee record
-    for _, source_row in process_data.iterrows():
-        employee_record = {}
-        
-        # Apply mappings for each target column
-        for target_col in target_columns:
-            mapping = mappings[mappings['target_column'] == target_col]
-            
-            if not mapping.empty:
-                mapping_row = mapping.iloc[0]
-                source_column = mapping_row.get('source_column')
-                transformation = mapping_row.get('transformation', 'None')
-                default_value = mapping_row.get('default_value')
-                
-                # Get value from source
-                value = None
-                if source_column and source_column in source_row.index:
-                    value = source_row[source_column]
-                elif default_value:
-                    value = default_value
-                
-                # Apply transformation
-                if transformation and transformation != 'None':
-                    mapping_dict = mapping_row.to_dict()
-                    value = apply_employee_transformation(value, transformation, mapping_dict, source_row, process_data)
-                
-                # Handle default values
-                if (pd.isna(value) or value is None or value == '') and default_value:
-                    value = default_value
-                
-                # Clean data
-                if pd.isna(value) or value is None:
-                    value = ""
-                else:
-                    value = str(value)
-                
-                employee_record[target_col] = value
-            else:
-                employee_record[target_col] = ""
-        
-        output_data.append(employee_record)
-    
-    # Create DataFrame
-    output_df = pd.DataFrame(output_data)
-    
-    # Ensure all target columns exist
-    for col in target_columns:
-        if col not in output_df.columns:
-            output_df[col] = ""
+    # Resolve each target column's mapping once, then build whole columns at a time
+    plan = build_employee_column_plan(mappings, EMPLOYEE_TARGET_COLUMNS)
     
-    return output_df[target_columns]
+    return build_employee_output(process_data, plan, EMPLOYEE_TARGET_COLUMNS, reuse=reuse)
 
 def generate_fast_preview(state, preview_rows=10):
     """Generate fast preview by processing only first N employees"""
@@ -351,16 +328,40 @@ def process_employee_files_full(state):
         # Load mapping configuration
         mapping_config = load_employee_mapping_configuration(state)
         
+        # Target columns whose mapping and merged data are unchanged are reused from the last generation;
+        # for a new extract only its inserted and changed rows are mapped again
+        column_cache = state.get('generated_employee_column_cache')
+        fingerprint = get_frame_fingerprint(merged_data)
+        row_hashes = hash_rows(merged_data, 'PA')
+        plan = build_employee_column_plan(mapping_config, EMPLOYEE_TARGET_COLUMNS) if is_dataframe_available(mapping_config) else {}
+        reuse = get_cached_columns(column_cache, fingerprint, plan, EMPLOYEE_TARGET_COLUMNS)
+        row_reuse, delta = get_cached_rows(column_cache, fingerprint, merged_data, row_hashes, plan, EMPLOYEE_TARGET_COLUMNS)
+        reuse.update(row_reuse)
+        
         # Process ALL employees for final output
-        output_df = create_employee_output_dataframe_optimized(merged_data, mapping_config)
+        output_df = create_employee_output_dataframe_optimized(merged_data, mapping_config, reuse=reuse)
         
         if not is_dataframe_available(output_df):
             return None, "Failed to create employee output"
         
+        # Kept in session state, so store it compacted (categoricals / Arrow-backed strings)
+        output_df = compact_output_frame(output_df)
+        state['generated_employee_column_cache'] = build_column_cache(fingerprint, plan, output_df, EMPLOYEE_TARGET_COLUMNS, row_hashes)
+        
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"emp_{timestamp}.csv"
         
+        # Delta mode: only the inserted and changed records since the last generation
+        if state.get('delta_mode') and delta is not None:
+            state['generated_employee_delta'] = {
+                'data': compact_output_frame(build_delta_frame(output_df, column_cache['data'], delta)),
+                'counts': get_delta_counts(delta),
+                'filename': f"emp_delta_{timestamp}.csv"
+            }
+        elif 'generated_employee_delta' in state:
+            del state['generated_employee_delta']
+        
         return output_df, filename
         
     except Exception as e:
@@ -369,7 +370,7 @@ def process_employee_files_full(state):
 
 def clear_cached_data(state):
     """Clear cached data to free memory"""
-    keys_to_clear = ['merged_employee_data', 'merge_stats']
+    keys_to_clear = ['merged_employee_data', 'merge_stats', 'merged_employee_fingerprints', 'merged_employee_prefix', 'merged_employee_unique']
     cleared_count = 0
     
     for key in keys_to_clear:
@@ -412,6 +413,29 @@ def show_enhanced_preview(df, max_rows=10):
         completion_df = pd.DataFrame(completion_data)
         st.dataframe(completion_df, use_container_width=True)
 
+def show_employee_delta_download(state, key):
+    """Download button for the delta-only file built in delta mode"""
+    delta_file = state.get('generated_employee_delta')
+    if not delta_file:
+        return
+    
+    counts = delta_file['counts']
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        st.info(f"**{delta_file['filename']}** - {counts['inserted']:,} inserted and {counts['changed']:,} changed employees since the last generation")
+        if counts['deleted']:
+            st.caption(f"{counts['deleted']:,} employees of the last generation are no longer in the extract and are marked DELETE in the [OPERATOR] column")
+    
+    with col2:
+        st.download_button(
+            label="📥 Download Delta CSV",
+            data=delta_file['data'].to_csv(index=False),
+            file_name=delta_file['filename'],
+            mime="text/csv",
+            key=key
+        )
+
 def show_employee_panel(state):
     """OPTIMIZED employee panel with fast preview, caching, and complete upload functionality"""
     
@@ -522,10 +546,7 @@ def show_employee_panel(state):
                                     continue
                                 
                                 # Read file
-                                if file.name.endswith('.csv'):
-                                    df = pd.read_csv(file)
-                                else:
-                                    df = pd.read_excel(file)
+                                df = read_uploaded_file(file)
                                 
                                 # Basic validation
                                 if file_key in ['PA0002', 'PA0001'] and 'Pers.No.' not in df.columns:
@@ -553,8 +574,9 @@ def show_employee_panel(state):
                 for file_key in ['PA0001', 'PA0002', 'PA0006', 'PA0105']:
                     if f'source_{file_key.lower()}' in state:
                         del state[f'source_{file_key.lower()}']
-                if 'generated_employee_files' in state:
-                    del state['generated_employee_files']
+                for key in ['generated_employee_files', 'generated_employee_delta']:
+                    if key in state:
+                        del state[key]
                 # Clear cached data too
                 clear_cached_data(state)
                 st.success("All data cleared!")
@@ -647,14 +669,25 @@ def show_employee_panel(state):
                 type="primary"
             )
         
+        show_employee_delta_download(state, key="download_employee_file_delta")
+        
         if st.button("🔄 Generate New File", help="Create fresh employee file"):
             if 'generated_employee_files' in state:
                 del state['generated_employee_files']
+            if 'generated_employee_delta' in state:
+                del state['generated_employee_delta']
             st.rerun()
     
     else:
         st.info("**Generate your complete emp.csv file with all employees**")
         
+        state['delta_mode'] = st.checkbox(
+            "Delta mode",
+            value=state.get('delta_mode', False),
+            key="employee_delta_mode",
+            help="When a new extract of the PA files is uploaded, also build a file with only the inserted and changed employees"
+        )
+        
         if st.button("🚀 Generate Full Employee File", type="primary", key="generate_full"):
             start_time = datetime.now()
             
@@ -689,6 +722,8 @@ def show_employee_panel(state):
                         key="download_new_employee",
                         type="primary"
                     )
+                
+                show_employee_delta_download(state, key="download_new_employee_delta")
             else:
                 st.error(f"Generation failed: {filename}")
     
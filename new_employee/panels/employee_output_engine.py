@@ -0,0 +1,162 @@
+import pandas as pd
+
+from sap_common import column_engine
+from sap_common.column_engine import (
+    get_row_dtype, get_column_values, has_column, to_text
+)
+
+# Column-at-a-time builder for the employee output file.
+# The mapping for each target column is resolved once into a plan and applied
+# to whole columns of the merged PA data; results match the old per-row
+# create_employee_output_dataframe_optimized cell for cell. Columns whose
+# mapping and merged data are unchanged can be reused from a cached output;
+# for a new extract, only its inserted and changed rows are evaluated again.
+
+EMPLOYEE_TARGET_COLUMNS = [
+    'STATUS', 'USERID', 'USERNAME', 'FIRSTNAME', 'LASTNAME',
+    'EMAIL', 'DEPARTMENT', 'HIREDATE', 'BIZ_PHONE', 'MANAGER'
+]
+
+EMPLOYEE_STATUS_MAP = {'1': 'Active', '2': 'Inactive', '3': 'Pending', '0': 'Terminated'}
+
+
+def build_employee_column_plan(mappings, target_columns=None):
+    """Resolve the first mapping for every target column once"""
+    return column_engine.build_column_plan(mappings, target_columns or EMPLOYEE_TARGET_COLUMNS)
+
+
+def parse_dates_by_value(text, date_format):
+    """Parse each distinct string once with pd.to_datetime and reformat it"""
+    formatted = {}
+    for value in pd.unique(text.to_numpy(dtype=object)):
+        date_obj = pd.to_datetime(value, errors='coerce')
+        formatted[value] = date_obj.strftime(date_format) if not pd.isna(date_obj) else value
+    return text.map(formatted).astype(object)
+
+
+def reformat_german_and_us_dates(text):
+    """dd.mm.yyyy -> yyyy-mm-dd, mm/dd/yyyy via pd.to_datetime; everything else untouched"""
+    return column_engine.reformat_german_and_us_dates(text, parse_dates_by_value)
+
+
+def concatenate_columns(values, step, data, row_dtype, separator=' '):
+    """Join the primary and secondary column, skipping empty sides"""
+    null_mask = values.isna()
+    primary = to_text(values).where(~null_mask, '')
+
+    mapping = step['mapping']
+    if not mapping or 'secondary_column' not in mapping:
+        return primary
+
+    secondary_column = mapping['secondary_column']
+    if not has_column(data, secondary_column):
+        return primary
+
+    secondary_values = get_column_values(data, secondary_column, row_dtype)
+    secondary = to_text(secondary_values).where(~secondary_values.isna(), '')
+
+    has_primary = primary != ''
+    has_secondary = secondary != ''
+
+    result = primary.where(has_primary, secondary)
+    both = has_primary & has_secondary
+    if both.any():
+        result[both] = primary[both] + separator + secondary[both]
+    return result.astype(object)
+
+
+def transform_employee_column(values, step, data, row_dtype):
+    """Apply one mapping's transformation to a whole column"""
+    transformation = step['transformation']
+
+    if transformation == 'Concatenate':
+        return concatenate_columns(values, step, data, row_dtype)
+
+    null_mask = values.isna()
+    present = values[~null_mask]
+    if present.empty:
+        return values
+
+    if transformation == 'Title Case':
+        transformed = to_text(present).str.title()
+    elif transformation == 'UPPERCASE':
+        transformed = to_text(present).str.upper()
+    elif transformation == 'lowercase':
+        transformed = to_text(present).str.lower()
+    elif transformation == 'Trim Whitespace':
+        transformed = to_text(present).str.strip()
+    elif transformation == 'Date Format (YYYY-MM-DD)':
+        transformed = reformat_german_and_us_dates(to_text(present))
+    elif transformation == 'Status Mapping':
+        fallback = step['mapping'].get('default_value', 'Active')
+        transformed = to_text(present).map(lambda code: EMPLOYEE_STATUS_MAP.get(code, fallback))
+    else:
+        return values
+
+    result = values.copy()
+    result[~null_mask] = transformed.astype(object)
+    return result
+
+
+def evaluate_employee_column(data, step, row_dtype):
+    """Evaluate one target column into a list of output strings"""
+    if step is None:
+        return [""] * len(data)
+
+    source_column = step['source_column']
+    transformation = step['transformation']
+    default_value = step['default_value']
+    has_default = bool(default_value)
+
+    if has_column(data, source_column):
+        values = get_column_values(data, source_column, row_dtype)
+    elif has_default:
+        values = pd.Series([default_value] * len(data), index=data.index, dtype=object)
+    else:
+        values = pd.Series([None] * len(data), index=data.index, dtype=object)
+
+    if transformation and transformation != 'None':
+        values = transform_employee_column(values, step, data, row_dtype)
+
+    # Handle default values for null/empty results
+    null_mask = values.isna()
+    if has_default:
+        empty_mask = null_mask | (values == '')
+        if empty_mask.any():
+            values = values.copy()
+            values[empty_mask] = default_value
+            null_mask = values.isna()
+
+    return values.where(~null_mask, '').map(str).tolist()
+
+
+def build_employee_output(data, plan, target_columns=None, reuse=None):
+    """Build the employee output frame from a column plan (columns in reuse are taken as given)"""
+    target_columns = target_columns or EMPLOYEE_TARGET_COLUMNS
+    row_dtype = get_row_dtype(data)
+
+    output = {}
+    for target_col in target_columns:
+        if reuse and target_col in reuse:
+            output[target_col] = reuse[target_col]
+        else:
+            output[target_col] = evaluate_employee_column(data, plan.get(target_col), row_dtype)
+
+    return pd.DataFrame(output, columns=target_columns)
+
+
+def get_cached_columns(column_cache, fingerprint, plan, target_columns=None):
+    """Target columns of the cached output whose mapping and source data are unchanged"""
+    return column_engine.get_cached_columns(column_cache, fingerprint, plan, target_columns or EMPLOYEE_TARGET_COLUMNS)
+
+
+def get_cached_rows(column_cache, fingerprint, data, row_hashes, plan, target_columns=None):
+    """Row delta of a new extract against the cached output, plus the columns rebuilt from it (see column_engine)"""
+    return column_engine.get_cached_rows(
+        column_cache, fingerprint, data, row_hashes, plan, target_columns or EMPLOYEE_TARGET_COLUMNS, build_employee_output
+    )
+
+
+def build_column_cache(fingerprint, plan, output_df, target_columns=None, row_hashes=None):
+    """Column cache of a generated output: source fingerprint and row hashes, step key per target column and the data"""
+    return column_engine.build_column_cache(fingerprint, plan, output_df, target_columns or EMPLOYEE_TARGET_COLUMNS, row_hashes)
@@ -451,8 +451,86 @@ def analyze_single_employee_detailed(emp_id, state):
 
 # ===== BULK ANALYSIS FUNCTIONS =====
 
+# Infotype coverage flags of the bulk analysis: (result column, file, issue text)
+BULK_COVERAGE_CHECKS = [
+    ('in_pa0001', 'PA0001', "Missing Work Info (PA0001)"),
+    ('in_pa0006', 'PA0006', "Missing Address (PA0006)"),
+    ('in_pa0105', 'PA0105', "Missing Contact (PA0105)"),
+    ('in_output', None, "Missing from Output File")
+]
+
+# Problem employees kept as records for the detailed display and reports
+SAMPLE_PROBLEM_LIMIT = 100
+
+def normalize_id_column(values):
+    """Employee IDs as strings without thousands separators (NaN stays missing)"""
+    return values.astype(str).str.replace(',', '').str.strip()
+
+def get_file_id_values(df, id_col=None):
+    """Normalized employee IDs of a file (empty if the file or column is missing)"""
+    if df is None:
+        return pd.Series([], dtype=str)
+    id_col = id_col or find_employee_id_column(df)
+    if not id_col:
+        return pd.Series([], dtype=str)
+    return normalize_id_column(df[id_col])
+
+def get_presence_flags(employee_ids, file_ids):
+    """Presence mask of every employee in each file, plus each file's distinct ID count.
+    
+    All IDs are factorized in one pass, so each file costs one scatter into a
+    flag array over the distinct codes instead of a hash lookup per employee.
+    """
+    sources = [employee_ids] + list(file_ids.values())
+    codes, uniques = pd.factorize(pd.concat(sources, ignore_index=True), use_na_sentinel=False)
+    codes_by_source = np.split(codes, np.cumsum([len(source) for source in sources])[:-1])
+    employee_codes = codes_by_source[0]
+    
+    presence = {}
+    distinct_counts = {}
+    for file_name, file_codes in zip(file_ids, codes_by_source[1:]):
+        present = np.zeros(len(uniques), dtype=bool)
+        present[file_codes] = True
+        presence[file_name] = present[employee_codes]
+        distinct_counts[file_name] = int(np.count_nonzero(present))
+    
+    return presence, distinct_counts
+
+def describe_employee_issues(employee_results):
+    """Issue list ('; '-joined) and files found (', '-joined) for every employee row"""
+    issues = pd.Series('', index=employee_results.index, dtype=object)
+    files_found = pd.Series('PA0002', index=employee_results.index, dtype=object)
+    
+    for flag_col, file_name, issue_text in BULK_COVERAGE_CHECKS:
+        present = employee_results[flag_col].to_numpy()
+        issues = issues.where(present, issues + issue_text + '; ')
+        if file_name:
+            files_found = files_found.where(~present, files_found + ', ' + file_name)
+    
+    return issues.str[:-2], files_found
+
+def build_problem_records(problem_rows):
+    """Problem employee records in the shape the display and reports use"""
+    issues, files_found = describe_employee_issues(problem_rows)
+    return [
+        {
+            'id': emp_id,
+            'name': emp_name,
+            'issues': issue_text.split('; ') if issue_text else [],
+            'files_found': files_text.split(', '),
+            'in_output': bool(in_output)
+        }
+        for emp_id, emp_name, issue_text, files_text, in_output in zip(
+            problem_rows['id'], problem_rows['name'], issues, files_found, problem_rows['in_output']
+        )
+    ]
+
 def run_bulk_employee_analysis(state):
-    """Run comprehensive bulk analysis of ALL employees - FIXED ID formatting"""
+    """Run comprehensive bulk analysis of ALL employees - FIXED ID formatting
+    
+    Coverage is computed as presence masks over the normalized PA0002 IDs; the
+    per-employee result is one frame with a boolean column per infotype.
+    """
     
     # Get source data
     pa0002_df = state.get('source_pa0002')
@@ -478,64 +556,24 @@ def run_bulk_employee_analysis(state):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    # Initialize analysis results
-    bulk_results = {
-        'total_employees': total_employees,
-        'successful_employees': [],
-        'problematic_employees': [],
-        'statistics': {
-            'success_count': 0,
-            'error_count': 0,
-            'missing_pa0001': 0,
-            'missing_pa0006': 0,
-            'missing_pa0105': 0,
-            'missing_output': 0
-        },
-        'file_coverage': {},
-        'sample_problems': []
-    }
+    # FIXED: Get clean employee IDs (commas and spaces removed, missing IDs read as 'nan')
+    pa0002_ids = normalize_id_column(pa0002_df[pa0002_id_col])
+    clean_ids = pa0002_ids.fillna('nan').str.replace(' ', '').str.strip()
     
-    # FIXED: Get clean employee ID sets for fast lookups
-    pa0002_clean_ids = set(pa0002_df[pa0002_id_col].astype(str).str.replace(',', '').str.strip())
-    
-    # Check other files with clean IDs
-    pa0001_ids = set()
-    pa0001_id_col = None
-    if pa0001_df is not None:
-        pa0001_id_col = find_employee_id_column(pa0001_df)
-        if pa0001_id_col:
-            pa0001_ids = set(pa0001_df[pa0001_id_col].astype(str).str.replace(',', '').str.strip())
-    
-    pa0006_ids = set()
-    pa0006_id_col = None
-    if pa0006_df is not None:
-        pa0006_id_col = find_employee_id_column(pa0006_df)
-        if pa0006_id_col:
-            pa0006_ids = set(pa0006_df[pa0006_id_col].astype(str).str.replace(',', '').str.strip())
-    
-    pa0105_ids = set()
-    pa0105_id_col = None
-    if pa0105_df is not None:
-        pa0105_id_col = find_employee_id_column(pa0105_df)
-        if pa0105_id_col:
-            pa0105_ids = set(pa0105_df[pa0105_id_col].astype(str).str.replace(',', '').str.strip())
-    
-    # Check output file with clean IDs
-    output_ids = set()
-    output_id_col = None
+    # Clean IDs of every file
+    file_ids = {
+        'PA0001': get_file_id_values(pa0001_df),
+        'PA0006': get_file_id_values(pa0006_df),
+        'PA0105': get_file_id_values(pa0105_df),
+        'Output': pd.Series([], dtype=str)
+    }
     if output_files and 'employee_data' in output_files:
         output_data = output_files['employee_data']
         for col_name in ['USERID', 'USER_ID', 'EMP_ID', 'EMPLOYEE_ID', 'ID']:
             if col_name in output_data.columns:
-                output_id_col = col_name
-                output_ids = set(output_data[col_name].astype(str).str.replace(',', '').str.strip())
+                file_ids['Output'] = get_file_id_values(output_data, col_name)
                 break
     
-    # Process employees in chunks for better performance
-    chunk_size = 1000
-    # FIXED: Get clean employee IDs list
-    all_employee_ids = pa0002_df[pa0002_id_col].astype(str).str.replace(',', '').str.strip().tolist()
-    
     # Get employee names for better reporting
     first_name_col = None
     last_name_col = None
@@ -550,80 +588,46 @@ def run_bulk_employee_analysis(state):
     
     if first_name_col and last_name_col:
         employee_names = (pa0002_df[first_name_col].fillna('Unknown') + ' ' + 
-                         pa0002_df[last_name_col].fillna('Unknown')).tolist()
+                         pa0002_df[last_name_col].fillna('Unknown')).astype(str).to_numpy()
     else:
-        employee_names = ['Unknown'] * len(all_employee_ids)
+        employee_names = 'Unknown'
     
-    # Process in chunks
-    for i in range(0, len(all_employee_ids), chunk_size):
-        chunk_ids = all_employee_ids[i:i+chunk_size]
-        chunk_names = employee_names[i:i+chunk_size]
-        
-        for emp_id, emp_name in zip(chunk_ids, chunk_names):
-            # Clean the ID for consistency
-            clean_emp_id = clean_employee_id(emp_id)
-            
-            # Check presence in each file using clean IDs
-            in_pa0001 = clean_emp_id in pa0001_ids
-            in_pa0006 = clean_emp_id in pa0006_ids
-            in_pa0105 = clean_emp_id in pa0105_ids
-            in_output = clean_emp_id in output_ids
-            
-            # Determine employee status
-            issues = []
-            if not in_pa0001:
-                issues.append("Missing Work Info (PA0001)")
-                bulk_results['statistics']['missing_pa0001'] += 1
-            if not in_pa0006:
-                issues.append("Missing Address (PA0006)")
-                bulk_results['statistics']['missing_pa0006'] += 1
-            if not in_pa0105:
-                issues.append("Missing Contact (PA0105)")
-                bulk_results['statistics']['missing_pa0105'] += 1
-            if not in_output:
-                issues.append("Missing from Output File")
-                bulk_results['statistics']['missing_output'] += 1
-            
-            # Categorize employee
-            if in_pa0001 and in_output:  # Minimum requirements met
-                bulk_results['statistics']['success_count'] += 1
-                bulk_results['successful_employees'].append({
-                    'id': clean_emp_id,  # Store clean ID
-                    'name': emp_name,
-                    'files_found': sum([True, in_pa0001, in_pa0006, in_pa0105]),
-                    'in_output': in_output
-                })
-            else:
-                bulk_results['statistics']['error_count'] += 1
-                problem_record = {
-                    'id': clean_emp_id,  # Store clean ID
-                    'name': emp_name,
-                    'issues': issues,
-                    'files_found': [f for f, found in [
-                        ('PA0002', True), ('PA0001', in_pa0001), 
-                        ('PA0006', in_pa0006), ('PA0105', in_pa0105)
-                    ] if found],
-                    'in_output': in_output
-                }
-                bulk_results['problematic_employees'].append(problem_record)
-                
-                # Keep first 100 problems for detailed display
-                if len(bulk_results['sample_problems']) < 100:
-                    bulk_results['sample_problems'].append(problem_record)
-        
-        # Update progress
-        processed = min(i + chunk_size, len(all_employee_ids))
-        progress = processed / len(all_employee_ids)
-        progress_bar.progress(progress)
-        status_text.text(f"Processed {processed:,} of {len(all_employee_ids):,} employees...")
-    
-    # Calculate final statistics
-    bulk_results['file_coverage'] = {
-        'PA0002': 100.0,  # Base file
-        'PA0001': round((len(pa0001_ids) / len(pa0002_clean_ids) * 100), 1) if pa0002_clean_ids else 0,
-        'PA0006': round((len(pa0006_ids) / len(pa0002_clean_ids) * 100), 1) if pa0002_clean_ids else 0,
-        'PA0105': round((len(pa0105_ids) / len(pa0002_clean_ids) * 100), 1) if pa0002_clean_ids else 0,
-        'Output': round((len(output_ids) / len(pa0002_clean_ids) * 100), 1) if pa0002_clean_ids else 0
+    # Presence of every employee in each file
+    status_text.text(f"Checking file coverage for {total_employees:,} employees...")
+    presence, distinct_counts = get_presence_flags(clean_ids, file_ids)
+    progress_bar.progress(1.0)
+    
+    employee_results = pd.DataFrame({'id': clean_ids.to_numpy(), 'name': employee_names}).astype(str)
+    for flag_col, file_name, _ in BULK_COVERAGE_CHECKS:
+        employee_results[flag_col] = presence[file_name or 'Output']
+    
+    # Minimum requirements: work info and present in the output file
+    employee_results['successful'] = employee_results['in_pa0001'] & employee_results['in_output']
+    success_count = int(employee_results['successful'].sum())
+    
+    problem_rows = employee_results[~employee_results['successful']]
+    
+    pa0002_unique_count = pa0002_ids.nunique(dropna=False)
+    bulk_results = {
+        'total_employees': total_employees,
+        'employee_results': employee_results,
+        'statistics': {
+            'success_count': success_count,
+            'error_count': total_employees - success_count,
+            'missing_pa0001': int((~employee_results['in_pa0001']).sum()),
+            'missing_pa0006': int((~employee_results['in_pa0006']).sum()),
+            'missing_pa0105': int((~employee_results['in_pa0105']).sum()),
+            'missing_output': int((~employee_results['in_output']).sum())
+        },
+        'file_coverage': {
+            'PA0002': 100.0,  # Base file
+            **{
+                file_name: round((distinct_count / pa0002_unique_count * 100), 1) if pa0002_unique_count else 0
+                for file_name, distinct_count in distinct_counts.items()
+            }
+        },
+        # Keep first 100 problems for detailed display
+        'sample_problems': build_problem_records(problem_rows.head(SAMPLE_PROBLEM_LIMIT))
     }
     
     # Store results in session state for later use
@@ -775,19 +779,18 @@ def display_bulk_analysis_results(results):
     
     with col1:
         if st.button("📋 Export Problem List", type="secondary"):
-            if results['problematic_employees']:
+            employee_results = results['employee_results']
+            problem_rows = employee_results[~employee_results['successful']]
+            if not problem_rows.empty:
                 # Create CSV of problematic employees
-                problems_export = []
-                for problem in results['problematic_employees']:
-                    problems_export.append({
-                        'Employee_ID': problem['id'],
-                        'Employee_Name': problem['name'],
-                        'Issues': '; '.join(problem['issues']),
-                        'Files_Found': ', '.join(problem['files_found']),
-                        'In_Output': 'Yes' if problem['in_output'] else 'No'
-                    })
-                
-                problems_df = pd.DataFrame(problems_export)
+                issues, files_found = describe_employee_issues(problem_rows)
+                problems_df = pd.DataFrame({
+                    'Employee_ID': problem_rows['id'],
+                    'Employee_Name': problem_rows['name'],
+                    'Issues': issues,
+                    'Files_Found': files_found,
+                    'In_Output': np.where(problem_rows['in_output'], 'Yes', 'No')
+                })
                 csv = problems_df.to_csv(index=False)
                 
                 st.download_button(
@@ -13,7 +13,14 @@ st.set_page_config(
     }
 )
 
+import os
+import sys
 import pandas as pd
+
+# Repository root, for the shared sap_common package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sap_common.session_memory import SessionMemoryManager
 from panels.hierarchy_panel_fixed import show_hierarchy_panel
 
 # Import enhanced validation panel with fallback
@@ -192,8 +199,9 @@ def get_default_level_names():
     }
 
 # Initialize session state with admin config and improved level names
+# (source/generated frames are kept within the session memory budget)
 if 'state' not in st.session_state:
-    st.session_state.state = {
+    st.session_state.state = SessionMemoryManager({
         'hrp1000': None,
         'hrp1001': None,
         'hierarchy': None,
@@ -205,7 +213,7 @@ if 'state' not in st.session_state:
         'admin_mode': False,
         'generated_output_files': {},  # For enhanced statistics
         'output_generation_metadata': {}  # Metadata for statistics
-    }
+    })
 
 # Sidebar navigation with admin toggle
 with st.sidebar:
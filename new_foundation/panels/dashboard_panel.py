@@ -12,6 +12,7 @@ import psutil
 import os
 from collections import defaultdict, deque
 import time
+from sap_common.session_memory import get_session_memory_report, get_session_memory_totals
 
 class SystemMonitor:
     """Real-time system monitoring for developers"""
@@ -47,8 +48,8 @@ class SystemMonitor:
         else:
             return 'MEDIUM'
     
-    def capture_performance_snapshot(self):
-        """Capture current system performance metrics"""
+    def capture_performance_snapshot(self, state=None):
+        """Capture current system performance metrics (plus the session's data frame memory if state is given)"""
         try:
             memory_info = psutil.virtual_memory()
             cpu_percent = psutil.cpu_percent(interval=0.1)
@@ -62,6 +63,11 @@ class SystemMonitor:
                 'session_state_size': len(st.session_state.keys()) if hasattr(st, 'session_state') else 0
             }
             
+            if state is not None:
+                totals = get_session_memory_totals(state)
+                snapshot['session_data_mb'] = round(totals['memory_mb'], 2)
+                snapshot['session_spilled_mb'] = round(totals['spilled_mb'], 2)
+            
             self.performance_log.append(snapshot)
             return snapshot
         except Exception as e:
@@ -449,7 +455,7 @@ def show_health_monitor_panel(state):
     
     try:
         # Capture current performance
-        current_perf = monitor.capture_performance_snapshot()
+        current_perf = monitor.capture_performance_snapshot(state)
         
         # Validate data integrity
         integrity_report = validate_data_integrity(df1, df2)
@@ -875,6 +881,18 @@ def show_health_monitor_panel(state):
                 if 'session_state_size' in latest_perf:
                     st.metric("Session Keys", latest_perf['session_state_size'])
         
+        # Per-key memory of the session's data frames
+        st.subheader("Session Memory by Key")
+        memory_report = get_session_memory_report(state)
+        if memory_report.empty:
+            st.info("No data frames stored in this session yet")
+        else:
+            memory_totals = get_session_memory_totals(state)
+            budget = f"{memory_totals['budget_mb']:.0f} MB" if memory_totals['budget_mb'] else "not set"
+            st.dataframe(memory_report, use_container_width=True)
+            st.caption(f"In memory: {memory_totals['memory_mb']:.1f} MB | Spilled to disk: {memory_totals['spilled_mb']:.1f} MB | "
+                       f"Session budget: {budget} | {memory_totals['spill_count']} spills, {memory_totals['reload_count']} reloads")
+        
         # Performance alerts
         if len(monitor.performance_log) > 5:
             recent_perf = list(monitor.performance_log)[-5:]
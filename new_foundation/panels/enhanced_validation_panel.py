@@ -7,6 +7,8 @@ from typing import Dict, List, Tuple, Any
 from collections import defaultdict
 import json
 from io import BytesIO
+from utils.hierarchy_builder import build_hierarchy_structure
+from utils.integrity_engine import check_referential_integrity
 
 def is_dataframe_available(df):
     """Helper function to check if DataFrame is available and not empty"""
@@ -378,77 +380,69 @@ class EnhancedMigrationValidator:
         if 'Object ID' not in hrp1000_df.columns or 'Source ID' not in hrp1001_df.columns or 'Target object ID' not in hrp1001_df.columns:
             return
         
-        # Get all valid unit IDs
-        valid_unit_ids = set(hrp1000_df['Object ID'].astype(str))
+        # Anti-join both ID columns against HRP1000 in one pass
+        integrity = check_referential_integrity(hrp1000_df, hrp1001_df)
         
         # Check Target IDs exist in HRP1000 (enhanced with specific details)
-        orphaned_targets = []
-        for idx, target_id in hrp1001_df['Target object ID'].items():
-            if pd.notna(target_id) and str(target_id) not in valid_unit_ids:
-                # Get additional context for this orphaned target
-                source_id = hrp1001_df.iloc[idx].get('Source ID', 'N/A')
-                relationship = hrp1001_df.iloc[idx].get('Relationship', 'N/A')
-                orphaned_targets.append({
-                    'excel_row': idx + 2,  # Excel row number
-                    'target_id': str(target_id),
-                    'source_id': str(source_id),
-                    'relationship': str(relationship),
-                    'issue': f"Target ID '{target_id}' does not exist in HRP1000"
-                })
-        
-        if orphaned_targets:
-            # Group by target ID for better analysis
-            target_groups = defaultdict(list)
-            for orphan in orphaned_targets:
-                target_groups[orphan['target_id']].append(orphan)
+        target_report = integrity['Target object ID']
+        if target_report['orphan_count']:
+            orphaned_targets = [
+                {
+                    'excel_row': orphan['excel_row'],  # Excel row number
+                    'target_id': orphan['target_id'],
+                    'source_id': orphan['source_id'],
+                    'relationship': orphan['relationship'],
+                    'issue': f"Target ID '{orphan['target_id']}' does not exist in HRP1000"
+                }
+                for orphan in target_report['orphan_rows'].head(15).to_dict('records')
+            ]
             
             self._add_error(
                 'ORPHANED_TARGET_ID',
                 'CRITICAL',
                 f"Orphaned Target IDs",
-                f"Found {len(orphaned_targets)} Target IDs that don't exist in HRP1000",
+                f"Found {target_report['orphan_count']} Target IDs that don't exist in HRP1000",
                 "Option 1: Create missing organizational units in HRP1000, OR Option 2: Remove invalid relationships from HRP1001",
                 'HRP1001',
                 'Target object ID',
                 {
-                    'orphaned_targets': orphaned_targets[:15],  # Show first 15
-                    'unique_missing_targets': list(target_groups.keys())[:10],
-                    'total_orphaned_relationships': len(orphaned_targets),
+                    'orphaned_targets': orphaned_targets,  # Show first 15
+                    'unique_missing_targets': target_report['counts'].index[:10].tolist(),
+                    'total_orphaned_relationships': target_report['orphan_count'],
                     'excel_fix_steps': [
                         "1. In HRP1001, sort by 'Target object ID' column",
                         "2. Look for Target IDs that appear in the orphaned list below",
                         "3. Either create these units in HRP1000 or delete these rows from HRP1001",
-                        f"4. Most common missing Target ID: '{max(target_groups.keys(), key=lambda x: len(target_groups[x]))}'(appears {len(target_groups[max(target_groups.keys(), key=lambda x: len(target_groups[x]))])} times)"
+                        f"4. Most common missing Target ID: '{target_report['top_id']}'(appears {target_report['top_count']} times)"
                     ]
                 }
             )
         
         # Check Source IDs exist in HRP1000 (enhanced)
-        orphaned_sources = []
-        for idx, source_id in hrp1001_df['Source ID'].items():
-            if pd.notna(source_id) and str(source_id) not in valid_unit_ids:
-                target_id = hrp1001_df.iloc[idx].get('Target object ID', 'N/A')
-                relationship = hrp1001_df.iloc[idx].get('Relationship', 'N/A')
-                orphaned_sources.append({
-                    'excel_row': idx + 2,
-                    'source_id': str(source_id),
-                    'target_id': str(target_id),
-                    'relationship': str(relationship),
-                    'issue': f"Source ID '{source_id}' does not exist in HRP1000"
-                })
-        
-        if orphaned_sources:
+        source_report = integrity['Source ID']
+        if source_report['orphan_count']:
+            orphaned_sources = [
+                {
+                    'excel_row': orphan['excel_row'],
+                    'source_id': orphan['source_id'],
+                    'target_id': orphan['target_id'],
+                    'relationship': orphan['relationship'],
+                    'issue': f"Source ID '{orphan['source_id']}' does not exist in HRP1000"
+                }
+                for orphan in source_report['orphan_rows'].head(15).to_dict('records')
+            ]
+            
             self._add_error(
                 'ORPHANED_SOURCE_ID',
                 'CRITICAL',
                 f"Orphaned Source IDs",
-                f"Found {len(orphaned_sources)} Source IDs that don't exist in HRP1000",
+                f"Found {source_report['orphan_count']} Source IDs that don't exist in HRP1000",
                 "Create corresponding organizational units in HRP1000 or remove invalid relationships from HRP1001",
                 'HRP1001',
                 'Source ID',
                 {
-                    'orphaned_sources': orphaned_sources[:15],
-                    'total_orphaned_relationships': len(orphaned_sources)
+                    'orphaned_sources': orphaned_sources,
+                    'total_orphaned_relationships': source_report['orphan_count']
                 }
             )
     
@@ -724,46 +718,7 @@ class EnhancedMigrationValidator:
     
     def _calculate_hierarchy_from_scratch(self, hrp1000_df: pd.DataFrame, hrp1001_df: pd.DataFrame) -> Dict:
         """Recalculate hierarchy structure from source data"""
-        
-        # Build parent-child relationships
-        relationships = {}
-        for _, row in hrp1001_df.iterrows():
-            if pd.notna(row.get('Source ID')) and pd.notna(row.get('Target object ID')):
-                child_id = str(row['Source ID'])
-                parent_id = str(row['Target object ID'])
-                relationships[child_id] = parent_id
-        
-        # Calculate levels
-        hierarchy = {}
-        all_units = set(hrp1000_df['Object ID'].astype(str))
-        
-        for unit_id in all_units:
-            level = self._calculate_unit_level(unit_id, relationships)
-            unit_name = hrp1000_df[hrp1000_df['Object ID'].astype(str) == unit_id]['Name'].iloc[0] if not hrp1000_df[hrp1000_df['Object ID'].astype(str) == unit_id].empty else f"Unit {unit_id}"
-            
-            hierarchy[unit_id] = {
-                'name': unit_name,
-                'level': level,
-                'parent': relationships.get(unit_id),
-                'children': [k for k, v in relationships.items() if v == unit_id]
-            }
-        
-        return hierarchy
-    
-    def _calculate_unit_level(self, unit_id: str, relationships: Dict, visited: set = None) -> int:
-        """Calculate the level of a unit in the hierarchy"""
-        if visited is None:
-            visited = set()
-        
-        if unit_id in visited:
-            return 999  # Circular reference
-        
-        if unit_id not in relationships:
-            return 1  # Root level
-        
-        visited.add(unit_id)
-        parent_level = self._calculate_unit_level(relationships[unit_id], relationships, visited.copy())
-        return parent_level + 1
+        return build_hierarchy_structure(hrp1000_df, hrp1001_df)['hierarchy']
     
     def _detect_circular_references(self, hierarchy_structure: Dict) -> List:
         """Detect circular references in hierarchy"""
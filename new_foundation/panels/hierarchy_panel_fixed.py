@@ -3,9 +3,16 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import re
-import io
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
+import uuid
+from utils.mapping_engine import compile_mapping_plan, build_output_frame
+from utils.hierarchy_builder import build_hierarchy_structure
+from utils.transformation_compiler import get_compiled_transformation, get_transformation_timings
+from sap_common.streaming_reader import read_uploaded_file
+from utils.generation_scheduler import plan_generation_jobs, run_generation_jobs, replay_transformation_timings
+from utils.export_writer import (
+    EXPORT_FORMATS, export_dataframe, get_cached_export, get_export_filename, build_export_bundle,
+    has_export_bundle
+)
 
 def load_mapping_configuration(state):
     """Load and parse the mapping configuration from admin panel with better debugging"""
@@ -265,8 +272,8 @@ def apply_transformation(value, transformation, mapping_config=None, source_row=
                     'hash': hash
                 }
                 
-                # Execute the custom code
-                result = eval(custom_code, {"__builtins__": {}}, exec_env)
+                # Execute the custom code (parsed once per distinct expression)
+                result = get_compiled_transformation(custom_code).run_row({"__builtins__": {}}, exec_env)
                 return result
                 
             except Exception as e:
@@ -301,95 +308,13 @@ def apply_transformation(value, transformation, mapping_config=None, source_row=
 def create_output_dataframe(source_df, mappings, file_type):
     """Create output DataFrame with proper structure based on mappings"""
     
-    # Filter mappings for this file type
-    relevant_mappings = mappings[mappings['applies_to'] == file_type].copy()
+    # Compile the mappings for this file type once, then evaluate column by column
+    plan = compile_mapping_plan(mappings, file_type)
     
-    if relevant_mappings.empty:
+    if plan is None:
         return pd.DataFrame()
     
-    # Sort mappings to ensure consistent column order
-    relevant_mappings = relevant_mappings.reset_index(drop=True)
-    
-    # Create the output structure
-    output_data = []
-    
-    # Row 1: API field names (target_column1)
-    api_fields = relevant_mappings['target_column1'].tolist()
-    
-    # Special handling for the first column (Operator)
-    if file_type == 'Level':
-        api_fields[0] = '[OPERATOR]'  # Special formatting for operator column
-    elif file_type == 'Association':
-        if 'Operator' in api_fields:
-            idx = api_fields.index('Operator')
-            api_fields[idx] = '[OPERATOR]'
-    
-    output_data.append(api_fields)
-    
-    # Row 2: Human-readable headers (target_column2)
-    headers = relevant_mappings['target_column2'].tolist()
-    
-    # Special handling for operator header
-    if file_type == 'Level':
-        headers[0] = 'Supported operators: Delimit, Clear and Delete'
-    elif file_type == 'Association':
-        if 'Operator' in relevant_mappings['target_column2'].values:
-            idx = relevant_mappings[relevant_mappings['target_column2'] == 'Operator'].index[0]
-            headers[idx] = 'Supported operators: Delimit, Clear and Delete'
-    
-    output_data.append(headers)
-    
-    # Row 3-4: Empty rows for formatting
-    empty_row = [None] * len(api_fields)
-    output_data.append(empty_row)
-    output_data.append(empty_row)
-    
-    # Row 5+: Actual data
-    for _, source_row in source_df.iterrows():
-        data_row = []
-        
-        for _, mapping in relevant_mappings.iterrows():
-            source_column = mapping['source_column']
-            transformation = mapping['transformation']
-            default_value = mapping['default_value']
-            
-            # Get value from source
-            if source_column and source_column in source_df.columns:
-                value = source_row[source_column]
-            elif default_value:
-                value = default_value
-            else:
-                value = None
-            
-            # Apply transformation with enhanced parameters
-            if transformation and transformation != 'None':
-                # Convert mapping row to dict for easier access
-                mapping_dict = mapping.to_dict()
-                value = apply_transformation(value, transformation, mapping_dict, source_row, source_df)
-            
-            # Handle default values for null/empty values
-            if (pd.isna(value) or value is None or value == '') and default_value:
-                value = default_value
-            
-            # Ensure clean data types for Arrow compatibility
-            if pd.isna(value) or value is None:
-                value = ""
-            else:
-                value = str(value)  # Convert all values to string for consistency
-            
-            data_row.append(value)
-        
-        output_data.append(data_row)
-    
-    # Create DataFrame with the API field names as columns
-    columns = [f"Column_{i+1}" for i in range(len(api_fields))]
-    output_df = pd.DataFrame(output_data, columns=columns)
-    
-    # Ensure all columns are string type for Arrow compatibility
-    for col in output_df.columns:
-        output_df[col] = output_df[col].astype(str)
-    
-    return output_df
+    return build_output_frame(source_df, plan, warn=st.warning, error=st.error)
 
 def process_level_files(state, level_number):
     """Process level files with proper mapping configuration"""
@@ -415,13 +340,7 @@ def process_level_files(state, level_number):
         return None, "Failed to create output - check mapping configuration"
     
     # Generate dynamic filename using custom level names
-    level_names = state.get('level_names', {})
-    if level_number in level_names and level_names[level_number]:
-        level_name = level_names[level_number].replace(' ', '_')
-    else:
-        level_name = get_level_name(level_number, state).replace(' ', '_')
-    
-    filename = f"{level_name}.xlsx"
+    filename = f"{get_level_file_stem(level_number, state)}.xlsx"
     
     return output_df, filename
 
@@ -463,17 +382,19 @@ def process_association_files(state, level_number=None):
     
     # Generate dynamic filename
     if level_number:
-        level_names = state.get('level_names', {})
-        if level_number in level_names and level_names[level_number]:
-            level_name = level_names[level_number].replace(' ', '_')
-        else:
-            level_name = get_level_name(level_number, state).replace(' ', '_')
-        filename = f"{level_name}_Associations.xlsx"
+        filename = f"{get_level_file_stem(level_number, state)}_Associations.xlsx"
     else:
         filename = "All_Level_Associations.xlsx"
     
     return output_df, filename
 
+def get_level_file_stem(level_number, state):
+    """File name stem for a level, preferring custom level names"""
+    level_names = state.get('level_names', {})
+    if level_number in level_names and level_names[level_number]:
+        return level_names[level_number].replace(' ', '_')
+    return get_level_name(level_number, state).replace(' ', '_')
+
 def filter_data_for_level(hrp1000_df, level_number, state):
     """Filter HRP1000 data for specific hierarchy level"""
     
@@ -569,12 +490,27 @@ def validate_mapping_configuration(mapping_config):
     
     return True, "Mapping configuration is valid"
 
+def describe_reused_columns(reused_columns, output_df, reused_rows=0):
+    """Suffix for a generated file's status line when columns or rows came from the column cache"""
+    parts = []
+    if reused_columns:
+        parts.append(f"{reused_columns} of {len(output_df.columns)} columns unchanged")
+    if reused_rows:
+        parts.append(f"{reused_rows} of {len(output_df) - 4} rows unchanged")
+    return "".join(f", {part}" for part in parts)
+
+def get_delta_filename(filename):
+    """Name of the delta-only file generated next to a full file"""
+    stem, extension = filename.rsplit('.', 1)
+    return f"{stem}_Delta.{extension}"
+
 def generate_output_files(state):
     """Generate all output files based on mapping configuration AND store for statistics analysis"""
     
     results = {
         'level_files': {},
         'association_files': {},
+        'delta_files': {},
         'errors': []
     }
     
@@ -591,43 +527,85 @@ def generate_output_files(state):
         hierarchy = state.get('hierarchy_structure', {})
         max_level = max([info.get('level', 1) for info in hierarchy.values()]) if hierarchy else 1
         
-        # Generate level files
-        st.info(f"Generating files for {max_level} hierarchy levels...")
+        # Resolve level membership once, then build every file from the shared inputs
+        hrp1000_df = state.get('source_hrp1000')
+        hrp1001_df = state.get('source_hrp1001')
+        jobs, skipped = plan_generation_jobs(hrp1000_df, hrp1001_df, hierarchy, max_level)
+        
+        st.info(f"Generating {len(jobs)} files for {max_level} hierarchy levels...")
+        
+        # Columns whose mapping row and source rows are unchanged are reused from the last run;
+        # for a new extract of the same tables only inserted and changed rows are mapped again
+        column_cache = state.get('generated_column_cache', {})
+        generated = {}
+        deltas = {}
+        for job, output_df, messages, timings, seconds in run_generation_jobs(
+                hrp1000_df, hrp1001_df, mapping_config, jobs, column_cache=column_cache,
+                build_deltas=state.get('delta_mode', False)):
+            replay_transformation_timings(timings)
+            for kind, message in messages:
+                (st.error if kind == 'error' else st.warning)(message)
+            generated[(job['kind'], job['level'])] = (output_df, seconds, job.get('reused_columns', 0), job.get('reused_rows', 0))
+            if 'delta' in job:
+                deltas[(job['kind'], job['level'])] = job['delta']
+        state['generated_column_cache'] = column_cache
+        
+        errors = {(kind, level): reason for kind, level, reason in skipped}
+        file_timings = []
+        
+        # Collect level files
         for level_num in range(1, max_level + 1):
-            output_df, filename = process_level_files(state, level_num)
-            if output_df is not None:
+            output_df, seconds, reused_columns, reused_rows = generated.get(('Level', level_num), (None, 0.0, 0, 0))
+            if output_df is None:
+                results['errors'].append(f"Failed to generate Level {level_num}: {errors.get(('Level', level_num))}")
+            elif output_df.empty:
+                results['errors'].append(f"Failed to generate Level {level_num}: Failed to create output - check mapping configuration")
+            else:
+                filename = f"{get_level_file_stem(level_num, state)}.xlsx"
                 results['level_files'][level_num] = {
                     'data': output_df,
                     'filename': filename
                 }
-                st.success(f"Generated {filename}")
-            else:
-                results['errors'].append(f"Failed to generate Level {level_num}: {filename}")
+                file_timings.append({'file': filename, 'type': 'Level', 'level': level_num,
+                                     'rows': len(output_df) - 4, 'seconds': round(seconds, 3),
+                                     'reused_columns': reused_columns, 'reused_rows': reused_rows})
+                st.success(f"Generated {filename} ({seconds:.2f}s{describe_reused_columns(reused_columns, output_df, reused_rows)})")
+                if ('Level', level_num) in deltas:
+                    results['delta_files'][('Level', level_num)] = dict(deltas[('Level', level_num)], filename=get_delta_filename(filename))
         
-        # Generate association files for levels 2 and above (not level 1)
-        st.info("Generating association files for reporting relationships...")
+        # Collect association files for levels 2 and above (not level 1)
         for level_num in range(2, max_level + 1):
-            output_df, filename = process_association_files(state, level_num)
-            if output_df is not None:
+            output_df, seconds, reused_columns, reused_rows = generated.get(('Association', level_num), (None, 0.0, 0, 0))
+            if output_df is None:
+                results['errors'].append(f"Failed to generate Association file for Level {level_num}: {errors.get(('Association', level_num))}")
+            elif output_df.empty:
+                results['errors'].append(f"Failed to generate Association file for Level {level_num}: Failed to create output - check mapping configuration")
+            else:
+                filename = f"{get_level_file_stem(level_num, state)}_Associations.xlsx"
                 results['association_files'][level_num] = {
                     'data': output_df,
                     'filename': filename
                 }
-                st.success(f"Generated {filename}")
-            else:
-                results['errors'].append(f"Failed to generate Association file for Level {level_num}: {filename}")
+                file_timings.append({'file': filename, 'type': 'Association', 'level': level_num,
+                                     'rows': len(output_df) - 4, 'seconds': round(seconds, 3),
+                                     'reused_columns': reused_columns, 'reused_rows': reused_rows})
+                st.success(f"Generated {filename} ({seconds:.2f}s{describe_reused_columns(reused_columns, output_df, reused_rows)})")
+                if ('Association', level_num) in deltas:
+                    results['delta_files'][('Association', level_num)] = dict(deltas[('Association', level_num)], filename=get_delta_filename(filename))
         
         # CRITICAL: Store generated files in session state for statistics panel
         state['generated_output_files'] = results
         
         # Also store generation timestamp and metadata
         state['output_generation_metadata'] = {
+            'generation_id': uuid.uuid4().hex,
             'generated_at': datetime.now().isoformat(),
             'total_level_files': len(results['level_files']),
             'total_association_files': len(results['association_files']),
             'max_hierarchy_level': max_level,
             'mapping_config_used': mapping_config is not None,
-            'total_errors': len(results['errors'])
+            'total_errors': len(results['errors']),
+            'file_timings': file_timings
         }
         
         st.success("✅ Generated files saved for statistics analysis!")
@@ -639,69 +617,98 @@ def generate_output_files(state):
 
 def convert_df_to_excel(df):
     """Convert DataFrame to Excel format for download"""
-    output = io.BytesIO()
+    return export_dataframe(df, 'XLSX')
+
+def get_generation_id(state):
+    """Identifier of the current file generation (keys the export cache)"""
+    metadata = state.get('output_generation_metadata', {})
+    return metadata.get('generation_id') or metadata.get('generated_at')
+
+def get_export_cache(state):
+    """Session-state dict holding the memoized download bytes"""
+    if 'export_cache' not in state:
+        state['export_cache'] = {}
+    return state['export_cache']
+
+def get_file_download(state, file_kind, level_num, file_info, file_format='XLSX'):
+    """Download bytes, file name and mime type of a generated file (memoized per generation)"""
+    data = get_cached_export(get_export_cache(state), get_generation_id(state), (file_kind, level_num),
+                             file_info['data'], file_format)
+    
+    return data, get_export_filename(file_info['filename'], file_format), EXPORT_FORMATS[file_format]['mime']
+
+def show_delta_downloads(state, generated_files, file_format, key_prefix):
+    """Download buttons for the delta-only files built in delta mode"""
+    delta_files = generated_files.get('delta_files', {})
+    if not delta_files:
+        return
     
-    # Create workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
+    st.subheader("🔺 Delta Files")
+    st.info("**Delta files only hold what changed since the previously generated files: inserted and changed records, plus deleted records marked DELETE in the operator column (an [OPERATOR] column is added at the end of files without an Operator mapping).**")
     
-    # Write DataFrame to worksheet
-    for r in dataframe_to_rows(df, index=False, header=False):
-        ws.append(r)
+    for (file_kind, level_num), file_info in delta_files.items():
+        counts = file_info['counts']
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            st.write(f"**{file_info['filename']}**")
+            st.write(f"{counts['inserted']} inserted, {counts['changed']} changed, {counts['deleted']} deleted, {counts['unchanged']} unchanged")
+        
+        with col2:
+            file_data, file_name, mime = get_file_download(state, f"{file_kind} Delta", level_num, file_info, file_format)
+            st.download_button(
+                label="Download",
+                data=file_data,
+                file_name=file_name,
+                mime=mime,
+                key=f"{key_prefix}_delta_{file_kind.lower()}_{level_num}"
+            )
+
+def show_bundle_download(state, generated_files, file_format, key):
+    """One download button for all level and association files as a ZIP with a manifest.
+
+    The ZIP is only built when asked for; the prepare button has a single key
+    so a click is still seen after the rerun switches to the existing-files view.
+    """
+    file_count = len(generated_files.get('level_files', {})) + len(generated_files.get('association_files', {}))
+    if file_count == 0:
+        return
     
-    wb.save(output)
-    output.seek(0)
-    return output.getvalue()
+    export_cache = get_export_cache(state)
+    generation_id = get_generation_id(state)
+    if not has_export_bundle(export_cache, generation_id, file_format):
+        if not st.button(f"📦 Prepare All {file_count} Files as ZIP", key="prepare_export_bundle",
+                         help="Builds one archive of all level and association files, with a manifest of row counts and checksums"):
+            return
+    
+    with st.spinner("Building ZIP archive..."):
+        # Generated files carry 4 template header rows before the data
+        data = build_export_bundle(export_cache, generation_id, generated_files, file_format, header_rows=4)
+    generated_at = state.get('output_generation_metadata', {}).get('generated_at', datetime.now().isoformat())
+    stamp = generated_at[:19].replace('-', '').replace(':', '').replace('T', '_')
+    
+    st.download_button(
+        label=f"📦 Download All {file_count} Files (ZIP)",
+        data=data,
+        file_name=f"foundation_files_{stamp}.zip",
+        mime="application/zip",
+        key=key,
+        help="All level and association files in one archive, with a manifest of row counts and checksums"
+    )
 
-def analyze_hierarchy_structure(hrp1000_df, hrp1001_df):
+def analyze_hierarchy_structure(hrp1000_df, hrp1001_df, state=None):
     """Analyze and build hierarchy structure from the data"""
     if hrp1000_df is None or hrp1001_df is None:
         return {}
     
-    # Build parent-child relationships
-    relationships = {}
-    for _, row in hrp1001_df.iterrows():
-        if pd.notna(row.get('Source ID')) and pd.notna(row.get('Target object ID')):
-            child_id = str(row['Source ID'])
-            parent_id = str(row['Target object ID'])
-            relationships[child_id] = parent_id
-    
-    # Determine levels
-    hierarchy = {}
-    
-    # Find root nodes (nodes without parents)
-    all_units = set(hrp1000_df['Object ID'].astype(str))
-    child_units = set(relationships.keys())
-    root_units = all_units - child_units
-    
-    # Assign levels starting from roots
-    for unit_id in all_units:
-        level = calculate_unit_level(unit_id, relationships)
-        unit_name = hrp1000_df[hrp1000_df['Object ID'].astype(str) == unit_id]['Name'].iloc[0] if not hrp1000_df[hrp1000_df['Object ID'].astype(str) == unit_id].empty else f"Unit {unit_id}"
-        
-        hierarchy[unit_id] = {
-            'name': unit_name,
-            'level': level,
-            'parent': relationships.get(unit_id),
-            'children': [k for k, v in relationships.items() if v == unit_id]
-        }
-    
-    return hierarchy
-
-def calculate_unit_level(unit_id, relationships, visited=None):
-    """Calculate the level of a unit in the hierarchy"""
-    if visited is None:
-        visited = set()
-    
-    if unit_id in visited:
-        return 999  # Circular reference
+    # Single pass over integer-coded IDs; also reports cycles and orphans
+    result = build_hierarchy_structure(hrp1000_df, hrp1001_df)
     
-    if unit_id not in relationships:
-        return 1  # Root level
+    if state is not None:
+        state['hierarchy_cycles'] = result['cycles']
+        state['hierarchy_orphans'] = result['orphans']
     
-    visited.add(unit_id)
-    parent_level = calculate_unit_level(relationships[unit_id], relationships, visited.copy())
-    return parent_level + 1
+    return result['hierarchy']
 
 def test_transformation_preview(state):
     """Test transformation preview to help debug mapping issues"""
@@ -994,10 +1001,7 @@ def show_hierarchy_panel(state):
             
             if hrp1000_file is not None:
                 try:
-                    if hrp1000_file.name.endswith('.csv'):
-                        hrp1000_temp = pd.read_csv(hrp1000_file)
-                    else:
-                        hrp1000_temp = pd.read_excel(hrp1000_file)
+                    hrp1000_temp = read_uploaded_file(hrp1000_file)
                     
                     st.success(f"File loaded: {len(hrp1000_temp)} rows, {len(hrp1000_temp.columns)} columns")
                     
@@ -1025,10 +1029,7 @@ def show_hierarchy_panel(state):
             
             if hrp1001_file is not None:
                 try:
-                    if hrp1001_file.name.endswith('.csv'):
-                        hrp1001_temp = pd.read_csv(hrp1001_file)
-                    else:
-                        hrp1001_temp = pd.read_excel(hrp1001_file)
+                    hrp1001_temp = read_uploaded_file(hrp1001_file)
                     
                     st.success(f"File loaded: {len(hrp1001_temp)} rows, {len(hrp1001_temp.columns)} columns")
                     
@@ -1050,16 +1051,10 @@ def show_hierarchy_panel(state):
             if st.button("Process Both Files", type="primary"):
                 try:
                     # Process HRP1000
-                    if hrp1000_file.name.endswith('.csv'):
-                        hrp1000_temp = pd.read_csv(hrp1000_file)
-                    else:
-                        hrp1000_temp = pd.read_excel(hrp1000_file)
+                    hrp1000_temp = read_uploaded_file(hrp1000_file)
                     
                     # Process HRP1001
-                    if hrp1001_file.name.endswith('.csv'):
-                        hrp1001_temp = pd.read_csv(hrp1001_file)
-                    else:
-                        hrp1001_temp = pd.read_excel(hrp1001_file)
+                    hrp1001_temp = read_uploaded_file(hrp1001_file)
                     
                     # Save both to state
                     state['source_hrp1000'] = hrp1000_temp
@@ -1118,13 +1113,19 @@ def show_hierarchy_panel(state):
     
     # Analyze hierarchy structure
     with st.spinner("Analyzing hierarchy structure..."):
-        hierarchy = analyze_hierarchy_structure(hrp1000_df, hrp1001_df)
+        hierarchy = analyze_hierarchy_structure(hrp1000_df, hrp1001_df, state)
         state['hierarchy_structure'] = hierarchy
     
     if not hierarchy:
         st.error("Failed to analyze hierarchy structure from the data.")
         return
     
+    if state.get('hierarchy_cycles'):
+        st.warning(f"Found {len(state['hierarchy_cycles'])} circular reporting chains. Units on these chains are placed at level 1000+.")
+    
+    if state.get('hierarchy_orphans'):
+        st.warning(f"Found {len(state['hierarchy_orphans'])} units whose parent is missing from HRP1000.")
+    
     # Display hierarchy summary
     max_level = max([info.get('level', 1) for info in hierarchy.values()])
     st.subheader("Hierarchy Analysis")
@@ -1210,10 +1211,26 @@ def show_hierarchy_panel(state):
         else:
             st.warning("No mapping configuration loaded")
     
+    export_format = st.radio(
+        "Download format",
+        list(EXPORT_FORMATS),
+        horizontal=True,
+        key="export_format",
+        help="CSV downloads are much faster to prepare for very large files"
+    )
+    
+    state['delta_mode'] = st.checkbox(
+        "Delta mode",
+        value=state.get('delta_mode', False),
+        key="delta_mode_toggle",
+        help="When a new extract of HRP1000/HRP1001 is uploaded, also build delta-only files against the previously generated files"
+    )
+    
     # FIXED: Check if files are already generated and show download buttons immediately
     existing_files = state.get('generated_output_files')
     if existing_files and (existing_files.get('level_files') or existing_files.get('association_files')):
         st.success("Files already generated! Ready for download:")
+        show_bundle_download(state, existing_files, export_format, key="existing_download_bundle")
         
         # Level files
         if existing_files.get('level_files'):
@@ -1232,11 +1249,12 @@ def show_hierarchy_panel(state):
                     st.caption(f"This file contains all organizational units for {display_level_name} with their properties and metadata.")
                 
                 with col2:
+                    file_data, file_name, mime = get_file_download(state, 'Level', level_num, file_info, export_format)
                     st.download_button(
                         label="Download",
-                        data=convert_df_to_excel(file_info['data']),
-                        file_name=file_info['filename'],
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        data=file_data,
+                        file_name=file_name,
+                        mime=mime,
                         key=f"existing_download_level_{level_num}"
                     )
         
@@ -1257,14 +1275,17 @@ def show_hierarchy_panel(state):
                     st.caption(f"This file defines how {display_level_name} units report to their parent units in the hierarchy.")
                 
                 with col2:
+                    file_data, file_name, mime = get_file_download(state, 'Association', level_num, file_info, export_format)
                     st.download_button(
                         label="Download",
-                        data=convert_df_to_excel(file_info['data']),
-                        file_name=file_info['filename'],
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        data=file_data,
+                        file_name=file_name,
+                        mime=mime,
                         key=f"existing_download_association_{level_num}"
                     )
         
+        show_delta_downloads(state, existing_files, export_format, key_prefix="existing_download")
+        
         # Show statistics integration status
         show_statistics_preview(state)
         
@@ -1276,6 +1297,8 @@ def show_hierarchy_panel(state):
                 del state['generated_output_files']
             if 'output_generation_metadata' in state:
                 del state['output_generation_metadata']
+            if 'export_cache' in state:
+                del state['export_cache']
             st.rerun()
     
     else:
@@ -1290,6 +1313,8 @@ def show_hierarchy_panel(state):
                 for error in results['errors']:
                     st.write(f"• {error}")
             
+            show_bundle_download(state, results, export_format, key="download_bundle")
+            
             # Level files
             if results['level_files']:
                 st.success(f"Generated {len(results['level_files'])} level files")
@@ -1307,11 +1332,12 @@ def show_hierarchy_panel(state):
                         st.caption(f"This file contains all organizational units for {display_level_name} with their properties and metadata.")
                     
                     with col2:
+                        file_data, file_name, mime = get_file_download(state, 'Level', level_num, file_info, export_format)
                         st.download_button(
                             label="Download",
-                            data=convert_df_to_excel(file_info['data']),
-                            file_name=file_info['filename'],
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            data=file_data,
+                            file_name=file_name,
+                            mime=mime,
                             key=f"download_level_{level_num}"
                         )
             
@@ -1332,14 +1358,17 @@ def show_hierarchy_panel(state):
                         st.caption(f"This file defines how {display_level_name} units report to their parent units in the hierarchy.")
                     
                     with col2:
+                        file_data, file_name, mime = get_file_download(state, 'Association', level_num, file_info, export_format)
                         st.download_button(
                             label="Download",
-                            data=convert_df_to_excel(file_info['data']),
-                            file_name=file_info['filename'],
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            data=file_data,
+                            file_name=file_name,
+                            mime=mime,
                             key=f"download_association_{level_num}"
                         )
             
+            show_delta_downloads(state, results, export_format, key_prefix="download")
+            
             # Show statistics integration status
             show_statistics_preview(state)
     
@@ -1405,6 +1434,21 @@ def show_hierarchy_panel(state):
         else:
             st.write("Using default mapping")
         
+        st.write("**Transformation Timings:**")
+        timings = get_transformation_timings()
+        if not timings.empty:
+            st.caption("Per-mapping transformation time, slowest first. 'row' mode expressions are evaluated per value.")
+            st.dataframe(timings, use_container_width=True)
+        else:
+            st.write("No transformations timed yet")
+        
+        st.write("**File Generation Timings:**")
+        file_timings = state.get('output_generation_metadata', {}).get('file_timings', [])
+        if file_timings:
+            st.dataframe(pd.DataFrame(file_timings), use_container_width=True)
+        else:
+            st.write("No files generated yet")
+        
         st.write("**Hierarchy Structure Sample:**")
         if hierarchy:
             sample_hierarchy = dict(list(hierarchy.items())[:3])
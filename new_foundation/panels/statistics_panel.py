@@ -7,8 +7,15 @@ import numpy as np
 from datetime import datetime
 import re
 from collections import Counter
+from itertools import islice
 import json
 
+from utils.integrity_engine import check_referential_integrity, count_id_occurrences
+from utils.detective_index import (
+    build_detective_index, classify_records, get_output_files_for, ExplainedRecordCache, LazyRecordMap
+)
+from sap_common.session_memory import get_state_token
+
 def analyze_data_quality(df, df_name):
     """Comprehensive data quality analysis for developers"""
     
@@ -476,15 +483,12 @@ def build_data_lineage(state):
     return lineage
 
 def generate_detective_report(state):
-    """Generate comprehensive record-by-record analysis in plain English"""
+    """Generate comprehensive record-by-record analysis in plain English
     
-    detective_report = {
-        'all_records': {},
-        'successful_transformations': {},
-        'issues_found': {},
-        'issue_categories': {},
-        'analysis_metadata': {}
-    }
+    Record statuses, counts and issue categories are worked out for every ID
+    up front; the plain-English analysis of a record is only built when it is
+    read from 'all_records', 'successful_transformations' or 'issues_found'.
+    """
     
     # Get all data sources
     source_hrp1000 = state.get("source_hrp1000")
@@ -492,51 +496,56 @@ def generate_detective_report(state):
     output_files = state.get("generated_output_files", {})
     hierarchy_structure = state.get("hierarchy_structure", {})
     
-    # Analyze every Object ID from HRP1000
-    if source_hrp1000 is not None and 'Object ID' in source_hrp1000.columns:
-        for idx, row in source_hrp1000.iterrows():
-            object_id = str(row['Object ID'])
-            unit_name = row.get('Name', 'Unknown')
-            status = row.get('Planning status', 'Unknown')
-            
-            # Analyze this specific record
-            record_analysis = analyze_single_record(
-                object_id, unit_name, status, 
-                source_hrp1000, source_hrp1001, 
-                output_files, hierarchy_structure
-            )
-            
-            detective_report['all_records'][object_id] = record_analysis
-            
-            # Categorize the result
-            if record_analysis['status'] == 'SUCCESS':
-                detective_report['successful_transformations'][object_id] = record_analysis
-            else:
-                detective_report['issues_found'][object_id] = record_analysis
+    # Index source rows, hierarchy, output files and relationships once for the whole run
+    record_index = build_detective_index(source_hrp1000, source_hrp1001, output_files, hierarchy_structure)
+    
+    # Classify every Object ID from HRP1000 (a repeated ID is reported once, from its last row)
+    records = classify_records(record_index, hierarchy_structure)
     
-    # Analyze relationship IDs from HRP1001
+    # Relationship IDs from HRP1001 that are missing from HRP1000 become orphans
+    orphan_ids = {}
+    relationship_counts = {}
     if source_hrp1001 is not None:
-        for idx, row in source_hrp1001.iterrows():
-            source_id = str(row.get('Source ID', ''))
-            target_id = str(row.get('Target object ID', ''))
-            
-            # Check if these IDs are orphaned (not in HRP1000)
-            if source_id and source_id not in detective_report['all_records']:
-                orphan_analysis = analyze_orphaned_relationship_id(
-                    source_id, 'Source ID', source_hrp1000, source_hrp1001
-                )
-                detective_report['all_records'][source_id] = orphan_analysis
-                detective_report['issues_found'][source_id] = orphan_analysis
-            
-            if target_id and target_id not in detective_report['all_records']:
-                orphan_analysis = analyze_orphaned_relationship_id(
-                    target_id, 'Target object ID', source_hrp1000, source_hrp1001
-                )
-                detective_report['all_records'][target_id] = orphan_analysis
-                detective_report['issues_found'][target_id] = orphan_analysis
+        orphan_ids = check_referential_integrity(
+            source_hrp1000, source_hrp1001, valid_ids=set(records.index),
+            row_level=True, skip_missing=False
+        )['orphan_ids']
+        relationship_counts = count_id_occurrences(source_hrp1001, orphan_ids).to_dict()
+        records = pd.concat([records, pd.DataFrame(
+            {'status': 'ERROR', 'issue_type': 'ORPHANED_RELATIONSHIP'},
+            index=pd.Index(list(orphan_ids), dtype=object)
+        )])
+    
+    def explain_record(object_id):
+        """Build the full analysis of one record"""
+        # The frames are read from state on demand, so the cached report does
+        # not keep them in memory (or stop them from being spilled)
+        source_hrp1000 = state.get("source_hrp1000")
+        source_hrp1001 = state.get("source_hrp1001")
+        output_files = state.get("generated_output_files", {})
+        position = record_index['positions'].get(object_id)
+        if position is None:
+            return analyze_orphaned_relationship_id(
+                object_id, orphan_ids[object_id], source_hrp1000, source_hrp1001,
+                relationship_count=relationship_counts[object_id]
+            )
+        return analyze_single_record(
+            object_id, record_index['unit_names'][position], record_index['statuses'][position],
+            source_hrp1000, source_hrp1001,
+            output_files, hierarchy_structure,
+            record_index=record_index
+        )
     
-    # Generate issue categories summary
-    detective_report['issue_categories'] = categorize_issues(detective_report['issues_found'])
+    record_cache = ExplainedRecordCache(explain_record)
+    successful = (records['status'] == 'SUCCESS').to_numpy()
+    
+    detective_report = {
+        'all_records': LazyRecordMap(records.index, record_cache),
+        'successful_transformations': LazyRecordMap(records.index[successful], record_cache),
+        'issues_found': LazyRecordMap(records.index[~successful], record_cache),
+        'issue_categories': summarize_issue_categories(records['issue_type'][~successful]),
+        'analysis_metadata': {}
+    }
     
     # Add metadata
     detective_report['analysis_metadata'] = {
@@ -549,8 +558,39 @@ def generate_detective_report(state):
     
     return detective_report
 
-def analyze_single_record(object_id, unit_name, status, hrp1000_df, hrp1001_df, output_files, hierarchy_structure):
-    """Analyze a single Object ID through the entire transformation pipeline"""
+def get_detective_report(state):
+    """Return the detective report, regenerating it only when its inputs changed"""
+    
+    inputs = tuple(get_state_token(state, key) for key in
+                   ("source_hrp1000", "source_hrp1001", "generated_output_files", "hierarchy_structure"))
+    cached = state.get('detective_report_cache')
+    
+    if cached is not None and len(cached['inputs']) == len(inputs) and all(
+            cached_input is current for cached_input, current in zip(cached['inputs'], inputs)):
+        return cached['report']
+    
+    detective_report = generate_detective_report(state)
+    state['detective_report_cache'] = {'inputs': inputs, 'report': detective_report}
+    return detective_report
+
+def materialize_detective_report(detective_report):
+    """Plain-dict copy of a detective report with every record explained (for export)"""
+    
+    return {
+        key: {object_id: record for object_id, record in value.items()} if isinstance(value, LazyRecordMap) else value
+        for key, value in detective_report.items()
+    }
+
+def analyze_single_record(object_id, unit_name, status, hrp1000_df, hrp1001_df, output_files, hierarchy_structure, record_index=None):
+    """Analyze a single Object ID through the entire transformation pipeline
+    
+    record_index is the run's build_detective_index() result; without one a
+    small index is built for this ID alone.
+    """
+    
+    if record_index is None:
+        record_index = build_detective_index(hrp1000_df, hrp1001_df, output_files, hierarchy_structure,
+                                             object_ids=[object_id])
     
     analysis = {
         'object_id': object_id,
@@ -571,7 +611,7 @@ def analyze_single_record(object_id, unit_name, status, hrp1000_df, hrp1001_df,
     # Check hierarchy assignment
     if hierarchy_structure and object_id in hierarchy_structure:
         unit_info = hierarchy_structure[object_id]
-        assigned_level = unit_info.get('level', 'Unknown')
+        assigned_level = record_index['levels'].get(object_id, 'Unknown')
         parent_id = unit_info.get('parent', 'None')
         children_count = len(unit_info.get('children', []))
         
@@ -579,45 +619,35 @@ def analyze_single_record(object_id, unit_name, status, hrp1000_df, hrp1001_df,
         analysis['technical_details']['parent_unit'] = parent_id
         analysis['technical_details']['children_count'] = children_count
         
+        # Output files this Object ID appears in
+        found_in_files = get_output_files_for(record_index, object_id)
+        
         # Check if appears in correct level file
-        level_files = output_files.get('level_files', {})
         found_in_level_file = False
-        
-        if assigned_level in level_files:
-            level_data = level_files[assigned_level].get('data')
-            if level_data is not None:
-                # Check if this Object ID appears in the level file
-                # Look for the Object ID in any column that might contain it
-                for col in level_data.columns:
-                    if level_data[col].astype(str).str.contains(object_id, na=False).any():
-                        found_in_level_file = True
-                        analysis['appears_in'].append(f"Level {assigned_level} file ({level_files[assigned_level].get('filename', 'Unknown')})")
-                        break
+        for kind, level_num, filename in found_in_files:
+            if kind == 'Level' and level_num == assigned_level:
+                found_in_level_file = True
+                analysis['appears_in'].append(f"Level {assigned_level} file ({filename})")
+                break
         
         # Check if appears in association files (if it has relationships)
-        association_files = output_files.get('association_files', {})
         found_in_associations = False
         
         # Check if this ID appears as source or target in HRP1001
         has_relationships = False
-        if hrp1001_df is not None:
-            is_source = hrp1001_df['Source ID'].astype(str).eq(object_id).any() if 'Source ID' in hrp1001_df.columns else False
-            is_target = hrp1001_df['Target object ID'].astype(str).eq(object_id).any() if 'Target object ID' in hrp1001_df.columns else False
+        if record_index['has_hrp1001']:
+            is_source = object_id in record_index['relationships']['as_source']
+            is_target = object_id in record_index['relationships']['as_target']
             has_relationships = is_source or is_target
             
             analysis['technical_details']['appears_as_source'] = is_source
             analysis['technical_details']['appears_as_target'] = is_target
         
         if has_relationships:
-            for level_num, assoc_info in association_files.items():
-                assoc_data = assoc_info.get('data')
-                if assoc_data is not None:
-                    # Check if this Object ID appears in association file
-                    for col in assoc_data.columns:
-                        if assoc_data[col].astype(str).str.contains(object_id, na=False).any():
-                            found_in_associations = True
-                            analysis['appears_in'].append(f"Association Level {level_num} file ({assoc_info.get('filename', 'Unknown')})")
-                            break
+            for kind, level_num, filename in found_in_files:
+                if kind == 'Association':
+                    found_in_associations = True
+                    analysis['appears_in'].append(f"Association Level {level_num} file ({filename})")
         
         # Generate explanation based on findings
         if found_in_level_file:
@@ -683,7 +713,7 @@ def analyze_single_record(object_id, unit_name, status, hrp1000_df, hrp1001_df,
     
     return analysis
 
-def analyze_orphaned_relationship_id(object_id, id_type, hrp1000_df, hrp1001_df):
+def analyze_orphaned_relationship_id(object_id, id_type, hrp1000_df, hrp1001_df, relationship_count=None):
     """Analyze an Object ID that appears in relationships but not in HRP1000"""
     
     analysis = {
@@ -702,13 +732,9 @@ def analyze_orphaned_relationship_id(object_id, id_type, hrp1000_df, hrp1001_df)
         'how_to_fix': []
     }
     
-    # Count how many times this ID appears in relationships
-    relationship_count = 0
-    if hrp1001_df is not None:
-        if 'Source ID' in hrp1001_df.columns:
-            relationship_count += hrp1001_df['Source ID'].astype(str).eq(object_id).sum()
-        if 'Target object ID' in hrp1001_df.columns:
-            relationship_count += hrp1001_df['Target object ID'].astype(str).eq(object_id).sum()
+    # Count how many times this ID appears in relationships (unless already counted)
+    if relationship_count is None:
+        relationship_count = count_id_occurrences(hrp1001_df, [object_id])[object_id]
     
     analysis['technical_details']['relationship_count'] = relationship_count
     analysis['technical_details']['id_type'] = id_type
@@ -744,6 +770,16 @@ def categorize_issues(issues_dict):
     
     return categories
 
+def summarize_issue_categories(issue_types):
+    """categorize_issues() from the issue types alone, in order of first appearance"""
+    
+    # Warnings carry no issue type (None, or NaN once in a frame)
+    issue_types = [issue_type if isinstance(issue_type, str) else None for issue_type in issue_types]
+    return {
+        issue_type: [count, get_issue_description(issue_type)]
+        for issue_type, count in Counter(issue_types).items()
+    }
+
 def get_issue_description(issue_type):
     """Get human-readable description for issue types"""
     
@@ -777,9 +813,9 @@ def search_object_id_journey(detective_report, search_id, search_type):
         results.append(search_data[search_id])
     
     # Search for partial matches (in case of different formatting)
-    for record_id, record_info in search_data.items():
-        if search_id.lower() in record_id.lower() and record_id != search_id:
-            results.append(record_info)
+    record_ids = pd.Index(list(search_data), dtype=object)
+    partial = record_ids.str.lower().str.contains(search_id.lower(), regex=False) & (record_ids != search_id)
+    results.extend(search_data[record_id] for record_id in record_ids[partial])
     
     return results
 
@@ -1312,7 +1348,7 @@ def show_statistics_panel(state):
         
         # Generate detective report
         with st.spinner("Analyzing every record through the transformation pipeline..."):
-            detective_report = generate_detective_report(state)
+            detective_report = get_detective_report(state)
         
         # Summary statistics
         st.subheader("Detective Analysis Summary")
@@ -1416,7 +1452,7 @@ def show_statistics_panel(state):
             st.info("**Review these examples to understand common data issues in your transformation pipeline.**")
             
             # Show first 10 issues as examples
-            sample_issues = list(issues_found.items())[:10]
+            sample_issues = list(islice(issues_found.items(), 10))
             
             for i, (object_id, issue_info) in enumerate(sample_issues):
                 st.markdown(f"#### Issue #{i+1}: Object ID {object_id} - {issue_info['issue_type']}")
@@ -1451,7 +1487,7 @@ def show_statistics_panel(state):
             st.info("**See examples of records that were processed correctly through the pipeline.**")
             
             # Show first 5 successful transformations
-            sample_success = list(successful_transformations.items())[:5]
+            sample_success = list(islice(successful_transformations.items(), 5))
             
             for i, (object_id, success_info) in enumerate(sample_success):
                 level_num = success_info.get('technical_details', {}).get('assigned_level', 'Unknown')
@@ -1475,7 +1511,7 @@ def show_statistics_panel(state):
         # Export detective report
         if st.button("Export Complete Detective Report", type="primary"):
             detective_export = {
-                'detective_analysis': detective_report,
+                'detective_analysis': materialize_detective_report(detective_report),
                 'generated_at': datetime.now().isoformat(),
                 'summary': {
                     'total_ids_analyzed': len(detective_report.get('all_records', {})),
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Column Cache Tests
+Checks that incremental regeneration reuses only what is unchanged
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Repository root for sap_common, this directory for utils
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from sap_common.streaming_reader import compact_output_frame
+from utils.mapping_engine import compile_mapping_plan, build_output_frame
+from utils.generation_scheduler import plan_generation_jobs, run_generation_jobs
+
+
+def make_hrp1000(names):
+    rows = len(names)
+    return pd.DataFrame({
+        'Object ID': [str(50000000 + i) for i in range(rows)],
+        'Start date': ['01.01.2020'] * rows,
+        'End Date': ['31.12.9999'] * rows,
+        'Name': names
+    })
+
+
+def make_hrp1001(rows):
+    return pd.DataFrame({
+        'Source ID': [str(50000000 + i // 2) for i in range(rows)],
+        'Relationship': ['B002'] * rows,
+        'Target object ID': [str(50000000 + i) for i in range(rows)],
+        'Start date': ['01.01.2020'] * rows,
+        'End Date': ['31.12.9999'] * rows
+    })
+
+
+def make_mappings(name_transformation='UPPERCASE'):
+    rows = [
+        ('Level', 'externalCode', 'Object ID', 'None'),
+        ('Level', 'effectiveStartDate', 'Start date', 'Date Format (YYYY-MM-DD)'),
+        ('Level', 'name.en_US', 'Name', name_transformation),
+        ('Level', 'name.defaultValue', 'Name', 'Trim Whitespace'),
+        ('Association', 'externalCode', 'Target object ID', 'None'),
+        ('Association', 'parentCode', 'Source ID', 'None')
+    ]
+    return pd.DataFrame([
+        {'applies_to': file_type, 'target_column1': field, 'target_column2': field, 'source_column': source,
+         'transformation': transformation, 'default_value': ''}
+        for file_type, field, source, transformation in rows
+    ])
+
+
+def generate(hrp1000, hrp1001, mappings, column_cache):
+    """Generated frames and finished jobs by (kind, level), built in this process"""
+    jobs, _ = plan_generation_jobs(hrp1000, hrp1001, None, 2)
+    results = run_generation_jobs(hrp1000, hrp1001, mappings, jobs, parallel=False, column_cache=column_cache)
+    return {(job['kind'], job['level']): (job, output_df) for job, output_df, *_ in results}
+
+
+def build_fresh(source_df, mappings, file_type):
+    """The file a build without any cache gives, compacted the way generated files are stored"""
+    return compact_output_frame(build_output_frame(source_df, compile_mapping_plan(mappings, file_type)))
+
+
+HRP1000 = make_hrp1000([f' unit {i} ' for i in range(50)])
+HRP1001 = make_hrp1001(50)
+
+
+def test_first_run_reuses_nothing():
+    column_cache = {}
+    files = generate(HRP1000, HRP1001, make_mappings(), column_cache)
+
+    assert set(column_cache) == {('Level', 1), ('Association', 2)}
+    for job, _ in files.values():
+        assert job['reused_columns'] == 0
+
+
+def test_unchanged_run_reuses_every_column():
+    column_cache = {}
+    generate(HRP1000, HRP1001, make_mappings(), column_cache)
+    files = generate(HRP1000, HRP1001, make_mappings(), column_cache)
+
+    job, output_df = files[('Level', 1)]
+    assert job['reused_columns'] == 4
+    pd.testing.assert_frame_equal(output_df, build_fresh(HRP1000, make_mappings(), 'Level'))
+
+
+def test_mapping_edit_rebuilds_only_its_column():
+    column_cache = {}
+    generate(HRP1000, HRP1001, make_mappings(), column_cache)
+    mappings = make_mappings(name_transformation='Title Case')
+    files = generate(HRP1000, HRP1001, mappings, column_cache)
+
+    job, output_df = files[('Level', 1)]
+    assert job['reused_columns'] == 3
+    pd.testing.assert_frame_equal(output_df, build_fresh(HRP1000, mappings, 'Level'))
+    # The Association mappings did not change
+    assert files[('Association', 2)][0]['reused_columns'] == 2
+
+
+def test_changed_extract_rebuilds_only_changed_rows():
+    column_cache = {}
+    generate(HRP1000, HRP1001, make_mappings(), column_cache)
+    hrp1000 = HRP1000.copy()
+    hrp1000.loc[7, 'Name'] = ' renamed unit '
+    files = generate(hrp1000, HRP1001, make_mappings(), column_cache)
+
+    job, output_df = files[('Level', 1)]
+    assert job['reused_columns'] == 0
+    assert job['reused_rows'] == len(hrp1000) - 1
+    pd.testing.assert_frame_equal(output_df, build_fresh(hrp1000, make_mappings(), 'Level'))
+
+
+def test_step_with_warning_not_reused():
+    """A step that reported a warning is evaluated again, so the warning is shown again"""
+    mappings = make_mappings()
+    mappings.loc[2, 'transformation'] = 'Concatenate'
+    mappings['secondary_column'] = 'missing'
+    column_cache = {}
+    generate(HRP1000, HRP1001, mappings, column_cache)
+    assert column_cache[('Level', 1)]['clean'] == [True, True, False, True]
+    files = generate(HRP1000, HRP1001, mappings, column_cache)
+
+    job, output_df = files[('Level', 1)]
+    assert job['reused_columns'] == 3
+    pd.testing.assert_frame_equal(output_df, build_fresh(HRP1000, mappings, 'Level'))
+
+
+def test_dropped_files_leave_the_cache():
+    column_cache = {}
+    generate(HRP1000, HRP1001, make_mappings(), column_cache)
+    generate(HRP1000, None, make_mappings(), column_cache)
+
+    assert set(column_cache) == {('Level', 1)}
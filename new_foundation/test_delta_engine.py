@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Delta Engine Tests
+Checks that delta files carry every insert, change and delete of a new extract
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Repository root for sap_common, this directory for utils
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from sap_common.delta_engine import (
+    hash_rows, compute_row_delta, build_delta_frame, get_delta_counts,
+    DELTA_OPERATOR_COLUMN, DELTA_OPERATOR_DELETE
+)
+from utils.mapping_engine import compile_mapping_plan, build_output_frame, get_operator_position
+from utils.generation_scheduler import get_delta_file
+
+
+def make_extract(ids, names):
+    return pd.DataFrame({
+        'Object ID': ids,
+        'Start date': ['01.01.2020'] * len(ids),
+        'End Date': ['31.12.9999'] * len(ids),
+        'Name': names
+    })
+
+
+def make_mappings(with_operator):
+    rows = [
+        {'applies_to': 'Level', 'target_column1': 'externalCode', 'target_column2': 'External Code',
+         'source_column': 'Object ID', 'transformation': 'None', 'default_value': ''},
+        {'applies_to': 'Level', 'target_column1': 'name.en_US', 'target_column2': 'Name',
+         'source_column': 'Name', 'transformation': 'None', 'default_value': ''}
+    ]
+    if with_operator:
+        rows.insert(1, {'applies_to': 'Level', 'target_column1': 'Operator', 'target_column2': 'Operator',
+                        'source_column': '', 'transformation': 'None', 'default_value': 'N/A'})
+    return pd.DataFrame(rows)
+
+
+def apply_delta(previous_df, delta_df, key_column, operator_column, header_rows=0):
+    """Replay a delta file on the previous output, keyed on one data column"""
+    previous = previous_df.iloc[header_rows:].set_index(key_column, drop=False)
+    rows = delta_df.iloc[header_rows:]
+    deleted = rows[rows.iloc[:, operator_column] == DELTA_OPERATOR_DELETE][key_column]
+    upserts = rows[rows.iloc[:, operator_column] != DELTA_OPERATOR_DELETE].set_index(key_column, drop=False)
+    result = previous.drop(index=deleted)
+    result = pd.concat([result[~result.index.isin(upserts.index)], upserts[previous_df.columns]])
+    return result.sort_index()
+
+
+PREVIOUS = make_extract(['1', '2', '3', '4'], ['A', 'B', 'C', 'D'])
+# 2 changed, 4 deleted, 5 inserted
+CURRENT = make_extract(['1', '2', '3', '5'], ['A', 'B2', 'C', 'E'])
+
+
+def get_delta():
+    return compute_row_delta(hash_rows(PREVIOUS, 'HRP1000'), hash_rows(CURRENT, 'HRP1000'))
+
+
+def test_row_delta_counts():
+    delta = get_delta()
+    assert get_delta_counts(delta) == {'inserted': 1, 'changed': 1, 'unchanged': 2, 'deleted': 1}
+
+
+def test_delta_round_trip_without_header_rows():
+    """Employee/payroll style delta: an [OPERATOR] column is added and replaying it gives the new output"""
+    delta = get_delta()
+    delta_df = build_delta_frame(CURRENT, PREVIOUS, delta)
+
+    assert list(delta_df.columns) == list(CURRENT.columns) + [DELTA_OPERATOR_COLUMN]
+    assert delta_df[DELTA_OPERATOR_COLUMN].tolist() == ['', '', DELTA_OPERATOR_DELETE]
+    replayed = apply_delta(PREVIOUS, delta_df, 'Object ID', len(CURRENT.columns))
+    expected = CURRENT.set_index('Object ID', drop=False).sort_index()
+    pd.testing.assert_frame_equal(replayed.astype(str), expected.astype(str))
+
+
+def test_level_without_operator_mapping_keeps_data_columns():
+    """A Level plan without an Operator row gets an [OPERATOR] column instead of losing its first column"""
+    plan = compile_mapping_plan(make_mappings(with_operator=False), 'Level')
+    assert plan['api_fields'][0] == '[OPERATOR]'
+    assert get_operator_position(plan) is None
+
+    previous_df = build_output_frame(PREVIOUS, plan)
+    output_df = build_output_frame(CURRENT, plan)
+    delta = get_delta()
+    delta_df = get_delta_file(output_df, {'data': previous_df}, delta, plan)['data'].astype(str)
+
+    assert delta_df.shape == (4 + 3, len(output_df.columns) + 1)
+    assert delta_df.iloc[0, -1] == '[OPERATOR]'
+    # External codes of the changed, inserted and deleted records are all kept
+    assert delta_df.iloc[4:, 0].tolist() == ['2', '5', '4']
+    assert delta_df.iloc[4:, -1].tolist() == ['', '', DELTA_OPERATOR_DELETE]
+
+    replayed = apply_delta(previous_df, delta_df, 'Column_1', len(output_df.columns), header_rows=4)
+    expected = output_df.iloc[4:].set_index('Column_1', drop=False).sort_index()
+    pd.testing.assert_frame_equal(replayed.astype(str), expected.astype(str))
+
+
+def test_level_with_operator_mapping_uses_its_column():
+    plan = compile_mapping_plan(make_mappings(with_operator=True), 'Level')
+    operator_column = get_operator_position(plan)
+    assert operator_column == 1
+
+    previous_df = build_output_frame(PREVIOUS, plan)
+    output_df = build_output_frame(CURRENT, plan)
+    delta_df = get_delta_file(output_df, {'data': previous_df}, get_delta(), plan)['data'].astype(str)
+
+    assert list(delta_df.columns) == list(output_df.columns)
+    assert delta_df.iloc[4:, operator_column].tolist() == ['', '', DELTA_OPERATOR_DELETE]
+    assert delta_df.iloc[4:, 0].tolist() == ['2', '5', '4']
+
+
+def test_unchanged_extract_gives_empty_delta():
+    delta = compute_row_delta(hash_rows(PREVIOUS, 'HRP1000'), hash_rows(PREVIOUS.copy(), 'HRP1000'))
+    delta_df = build_delta_frame(PREVIOUS, PREVIOUS, delta)
+
+    assert get_delta_counts(delta)['unchanged'] == len(PREVIOUS)
+    assert delta_df.empty
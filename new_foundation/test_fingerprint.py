@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Fingerprint Tests
+Checks the shared frame fingerprints and the per-file deduplication memo
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Repository root, for the shared sap_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sap_common.fingerprint import hash_frame, get_frame_fingerprint, get_unique_rows
+
+
+def make_frame(values):
+    return pd.DataFrame({'Pers.No.': ['1', '1', '2', '3'], 'Value': values})
+
+
+def test_fingerprint_follows_content():
+    df = make_frame(['a', 'b', 'c', 'd'])
+
+    assert get_frame_fingerprint(df) == get_frame_fingerprint(df.copy())
+    assert get_frame_fingerprint(df) != get_frame_fingerprint(make_frame(['a', 'b', 'c', 'x']))
+    assert get_frame_fingerprint(df) != get_frame_fingerprint(df.astype({'Value': object}))
+    assert get_frame_fingerprint(None) is None
+
+
+def test_index_only_counts_when_asked():
+    df = make_frame(['a', 'b', 'c', 'd'])
+    moved = df.set_axis([10, 11, 12, 13])
+
+    assert hash_frame(df) == hash_frame(moved)
+    assert hash_frame(df, index=True) != hash_frame(moved, index=True)
+
+
+def test_unique_rows_reused_while_file_unchanged():
+    cache = {}
+    df = make_frame(['a', 'b', 'c', 'd'])
+    first = get_unique_rows(cache, 'PA0006', df, get_frame_fingerprint(df), 'Pers.No.')
+
+    assert first['Value'].tolist() == ['a', 'c', 'd']
+    assert get_unique_rows(cache, 'PA0006', df.copy(), get_frame_fingerprint(df), 'Pers.No.') is first
+
+    replaced = make_frame(['x', 'b', 'c', 'd'])
+    second = get_unique_rows(cache, 'PA0006', replaced, get_frame_fingerprint(replaced), 'Pers.No.')
+    assert second['Value'].tolist() == ['x', 'c', 'd']
+    assert cache['PA0006']['data'] is second
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Frame Delta Tests
+Checks that reverting a logged delta gives back the frame the old full-copy log kept
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Repository root, for foundation_module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from foundation_module.utils.frame_delta import (
+    diff_frames, revert_frame_delta, describe_frame_delta, get_delta_counts
+)
+
+
+def make_frame(rows=20):
+    return pd.DataFrame({
+        'Object ID': [str(50000000 + i) for i in range(rows)],
+        'Name': [f"Unit {i}" if i % 5 else None for i in range(rows)],
+        'Level': np.arange(rows) % 4,
+        'Score': np.arange(rows) * 0.5
+    })
+
+
+def assert_reverts(before, after):
+    delta = diff_frames(before, after)
+    pd.testing.assert_frame_equal(revert_frame_delta(after, delta), before)
+    return delta
+
+
+def change_cells(df):
+    after = df.copy()
+    after.loc[[1, 6], 'Name'] = ['Renamed', 'Also renamed']
+    after.loc[0, 'Name'] = None
+    after.loc[3, 'Score'] = np.nan
+    return after
+
+
+def test_changed_cells():
+    before = make_frame()
+    delta = assert_reverts(before, change_cells(before))
+    assert get_delta_counts(delta) == {'rows_added': 0, 'rows_removed': 0, 'cells_changed': 3}
+
+
+def test_missing_values_on_both_sides_are_unchanged():
+    before = make_frame()
+    delta = diff_frames(before, before.copy())
+    assert delta['cells'] == {} and delta['replaced_columns'] == {}
+
+
+def test_removed_and_added_rows():
+    before = make_frame()
+    after = before.drop(index=[0, 7, 19])
+    after = pd.concat([after, pd.DataFrame({'Object ID': ['NEW'], 'Name': ['New'], 'Level': [1], 'Score': [1.0]},
+                                           index=[100])])
+    after.loc[4, 'Name'] = 'Changed'
+    delta = assert_reverts(before, after)
+    assert get_delta_counts(delta) == {'rows_added': 1, 'rows_removed': 3, 'cells_changed': 1}
+
+
+def test_filtered_rows():
+    before = make_frame()
+    assert_reverts(before, before[before['Level'] != 2])
+
+
+def test_reordered_rows():
+    before = make_frame()
+    assert_reverts(before, change_cells(before).sort_values('Name', ascending=False))
+
+
+def test_added_removed_and_retyped_columns():
+    before = make_frame()
+    after = before.drop(columns=['Score'])
+    after['Level'] = after['Level'].astype(str)
+    after['Parent'] = 'X'
+    delta = assert_reverts(before, after)
+    changes = describe_frame_delta(diff_frames(before, after), after)
+    assert changes['columns_added'] == ['Parent']
+    assert changes['columns_removed'] == ['Score']
+    assert set(delta['replaced_columns']) == {'Score', 'Level'}
+
+
+def test_non_unique_rows_fall_back_to_snapshot():
+    before = make_frame().set_index('Level', drop=False)
+    after = change_cells(make_frame()).set_index('Level', drop=False)
+    delta = assert_reverts(before, after)
+    assert 'snapshot' in delta
+    assert get_delta_counts(delta)['cells_changed'] is None
+
+
+def test_describe_changed_cells():
+    before = make_frame()
+    after = change_cells(before)
+    changes = describe_frame_delta(diff_frames(before, after), after)
+    # Row 0 was already missing, so it is not a change
+    assert changes['cells']['Name'] == {
+        'keys': [1, 6], 'before': ['Unit 1', 'Unit 6'], 'after': ['Renamed', 'Also renamed']
+    }
+    assert changes['cells']['Score'] == {'keys': [3], 'before': [1.5], 'after': [None]}
+
+
+def test_logger_rolls_back_chain(tmp_path, monkeypatch):
+    """Rolling back an operation reverts it and every later one, like restoring its full copy"""
+    pytest.importorskip('streamlit')
+    from foundation_module.panels.transformation_logger import TransformationLogger
+
+    monkeypatch.chdir(tmp_path)
+    logger = TransformationLogger()
+    original = make_frame()
+    renamed = change_cells(original)
+    filtered = renamed[renamed['Level'] != 1]
+    logger.add_entry('Rename', {'type': 'rename'}, original, renamed)
+    logger.add_entry('Filter', {'type': 'filter'}, renamed, filtered)
+    assert logger.get_rollback_options() == ['Rename', 'Filter']
+
+    # Reverting needs the data the last transformation left
+    assert logger.rollback_to('Rename', renamed) is None
+    assert logger.rollback_to('Unknown', filtered) is None
+    assert logger.get_rollback_options() == ['Rename', 'Filter']
+
+    pd.testing.assert_frame_equal(logger.rollback_to('Filter', filtered.copy()), renamed)
+    assert logger.get_rollback_options() == ['Rename']
+    pd.testing.assert_frame_equal(logger.rollback_to('Rename', renamed), original)
+    assert logger.get_rollback_options() == []
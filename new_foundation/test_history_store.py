@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+History Store Tests
+Checks paging and filtering of the transformation history and the import of old JSON logs
+"""
+
+import json
+import os
+import sys
+
+# Repository root, for foundation_module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from foundation_module.utils.history_store import TransformationHistoryStore
+
+
+def make_entry(i, operation=None, transform_type=None):
+    return {
+        'timestamp': f"2024-01-{1 + i // 24:02d}T{i % 24:02d}:00:00",
+        'operation': operation or f"Operation {i % 3}",
+        'details': {'type': transform_type or ['filter', 'rename'][i % 2], 'index': i},
+        'changes': None
+    }
+
+
+def read_all(store, page_size, **filters):
+    """Every entry, page by page, and the number of pages read"""
+    entries, cursor = store.get_page(page_size=page_size, **filters)
+    pages = 1
+    while cursor is not None:
+        page, cursor = store.get_page(cursor=cursor, page_size=page_size, **filters)
+        entries.extend(page)
+        pages += 1
+    return entries, pages
+
+
+def get_indexes(entries):
+    return [entry['details']['index'] for entry in entries]
+
+
+def test_pages_cover_every_entry_newest_first(tmp_path):
+    store = TransformationHistoryStore(str(tmp_path))
+    for i in range(53):
+        store.add(make_entry(i))
+
+    entries, pages = read_all(store, page_size=10)
+    assert get_indexes(entries) == list(range(52, -1, -1))
+    assert pages == 6
+
+
+def test_equal_timestamps_are_not_skipped_or_repeated(tmp_path):
+    """Entries logged within the same timestamp are kept apart by their id"""
+    store = TransformationHistoryStore(str(tmp_path))
+    for i in range(7):
+        store.add(dict(make_entry(0), details={'type': 'filter', 'index': i}))
+
+    entries, _ = read_all(store, page_size=3)
+    assert get_indexes(entries) == [6, 5, 4, 3, 2, 1, 0]
+
+
+def test_last_full_page_has_no_cursor(tmp_path):
+    store = TransformationHistoryStore(str(tmp_path))
+    for i in range(4):
+        store.add(make_entry(i))
+
+    entries, cursor = store.get_page(page_size=4)
+    assert len(entries) == 4 and cursor is None
+
+
+def test_filters(tmp_path):
+    store = TransformationHistoryStore(str(tmp_path))
+    all_entries = [make_entry(i) for i in range(60)]
+    for entry in all_entries:
+        store.add(entry)
+
+    def expected(keep):
+        return [entry['details']['index'] for entry in reversed(all_entries) if keep(entry)]
+
+    entries, _ = read_all(store, page_size=7, operation='Operation 1')
+    assert get_indexes(entries) == expected(lambda entry: entry['operation'] == 'Operation 1')
+
+    entries, _ = read_all(store, page_size=7, transform_type='rename')
+    assert get_indexes(entries) == expected(lambda entry: entry['details']['type'] == 'rename')
+
+    since, until = '2024-01-01T12:00:00', '2024-01-02T06:00:00'
+    entries, _ = read_all(store, page_size=7, operation='Operation 0', since=since, until=until)
+    assert get_indexes(entries) == expected(
+        lambda entry: entry['operation'] == 'Operation 0' and since <= entry['timestamp'] < until
+    )
+
+
+def test_legacy_logs_imported_once(tmp_path):
+    legacy = [make_entry(i) for i in range(5)]
+    with open(tmp_path / "transforms_20240101.json", 'w') as f:
+        json.dump(legacy[:3], f)
+    with open(tmp_path / "transforms_20240102.jsonl", 'w') as f:
+        f.write(json.dumps(legacy[3]) + "\n")
+        f.write("{not json\n")
+        f.write(json.dumps(legacy[4]) + "\n")
+    with open(tmp_path / "other.json", 'w') as f:
+        json.dump([make_entry(99)], f)
+
+    store = TransformationHistoryStore(str(tmp_path))
+    assert store.migrate_legacy_logs() == 5
+    assert store.migrate_legacy_logs() == 0
+    # A store opened later does not import the files again
+    assert TransformationHistoryStore(str(tmp_path)).migrate_legacy_logs() == 0
+
+    entries, _ = read_all(store, page_size=2)
+    assert get_indexes(entries) == [4, 3, 2, 1, 0]
+    assert entries[0] == legacy[4]
+
+
+def test_new_legacy_log_imported_after_earlier_migration(tmp_path):
+    store = TransformationHistoryStore(str(tmp_path))
+    store.add(make_entry(10))
+    with open(tmp_path / "transforms_20240101.json", 'w') as f:
+        json.dump([make_entry(0)], f)
+    assert store.migrate_legacy_logs() == 1
+
+    with open(tmp_path / "transforms_20240102.json", 'w') as f:
+        json.dump([make_entry(1), 'not an entry'], f)
+    assert store.migrate_legacy_logs() == 1
+
+    entries, _ = read_all(store, page_size=50)
+    assert get_indexes(entries) == [10, 1, 0]
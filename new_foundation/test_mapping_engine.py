@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Mapping Engine Tests
+Checks the column-at-a-time engine against the original row-by-row builder
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Repository root for sap_common, this directory for utils
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from utils.mapping_engine import compile_mapping_plan, build_output_frame
+
+
+def apply_row_transformation(value, transformation, mapping, source_row):
+    """The original per-value transformation (Streamlit messages left out)"""
+    if pd.isna(value) or value is None:
+        if transformation != 'Concatenate':
+            return value
+
+    value_str = str(value) if not pd.isna(value) else ""
+
+    if transformation == 'Trim Whitespace':
+        return value_str.strip()
+    elif transformation == 'Title Case':
+        return value_str.title()
+    elif transformation == 'UPPERCASE':
+        return value_str.upper()
+    elif transformation == 'lowercase':
+        return value_str.lower()
+    elif transformation == 'Lookup Value':
+        status_map = {'1': 'Active', '2': 'Inactive', '3': 'Planned', '0': 'Deleted',
+                      1: 'Active', 2: 'Inactive', 3: 'Planned', 0: 'Deleted'}
+        return status_map.get(value, 'Active')
+    elif transformation == 'Concatenate':
+        secondary_column = mapping.get('secondary_column', '')
+        if secondary_column and secondary_column in source_row.index:
+            secondary_value = source_row[secondary_column]
+            secondary_str = str(secondary_value) if not pd.isna(secondary_value) else ""
+            if value_str and secondary_str:
+                return f"{value_str} - {secondary_str}"
+            return value_str or secondary_str
+        return value_str
+    elif transformation == 'Custom Python':
+        secondary_value = None
+        secondary_column = mapping.get('secondary_column', '')
+        if secondary_column and secondary_column in source_row.index:
+            secondary_value = source_row[secondary_column]
+        exec_env = {'value': value, 'secondary_value': secondary_value, 'pd': pd, 'np': np,
+                    'datetime': datetime, 'str': str, 'int': int, 'float': float, 'len': len,
+                    'abs': abs, 'round': round, 'hash': hash}
+        try:
+            return eval(mapping['transformation_code'], {"__builtins__": {}}, exec_env)
+        except Exception:
+            return value_str
+    elif transformation == 'Extract First Word':
+        if value_str and value_str.strip():
+            return value_str.split()[0]
+        return value_str
+    elif transformation == 'Date Format (YYYY-MM-DD)':
+        if '.' in value_str:
+            parts = value_str.split('.')
+            if len(parts) == 3:
+                day, month, year = parts
+                return f"{year.zfill(4)}-{month.zfill(2)}-{day.zfill(2)}"
+        return value_str
+    return value
+
+
+def build_rows_reference(source_df, mappings, file_type):
+    """The original create_output_dataframe: header rows, then one iterrows() pass per source row"""
+    relevant_mappings = mappings[mappings['applies_to'] == file_type].reset_index(drop=True)
+    api_fields = relevant_mappings['target_column1'].tolist()
+    headers = relevant_mappings['target_column2'].tolist()
+    if file_type == 'Level':
+        api_fields[0] = '[OPERATOR]'
+        headers[0] = 'Supported operators: Delimit, Clear and Delete'
+    elif 'Operator' in api_fields:
+        api_fields[api_fields.index('Operator')] = '[OPERATOR]'
+    if file_type == 'Association' and 'Operator' in relevant_mappings['target_column2'].values:
+        idx = relevant_mappings[relevant_mappings['target_column2'] == 'Operator'].index[0]
+        headers[idx] = 'Supported operators: Delimit, Clear and Delete'
+
+    output_data = [api_fields, headers, [None] * len(api_fields), [None] * len(api_fields)]
+    for _, source_row in source_df.iterrows():
+        data_row = []
+        for _, mapping in relevant_mappings.iterrows():
+            source_column = mapping['source_column']
+            transformation = mapping['transformation']
+            default_value = mapping['default_value']
+            if source_column and source_column in source_df.columns:
+                value = source_row[source_column]
+            elif default_value:
+                value = default_value
+            else:
+                value = None
+            if transformation and transformation != 'None':
+                value = apply_row_transformation(value, transformation, mapping.to_dict(), source_row)
+            if (pd.isna(value) or value is None or value == '') and default_value:
+                value = default_value
+            data_row.append("" if pd.isna(value) or value is None else str(value))
+        output_data.append(data_row)
+
+    output_df = pd.DataFrame(output_data, columns=[f"Column_{i+1}" for i in range(len(api_fields))])
+    for col in output_df.columns:
+        output_df[col] = output_df[col].astype(str)
+    return output_df
+
+
+TRANSFORMATIONS = [
+    'None', 'Trim Whitespace', 'Title Case', 'UPPERCASE', 'lowercase', 'Lookup Value', 'Concatenate',
+    'Custom Python', 'Extract First Word', 'Date Format (YYYY-MM-DD)', 'Unknown'
+]
+SOURCE_COLUMNS = ['Object ID', 'Name', 'Start date', 'Planning status', 'Object abbr.', None, '', 'missing']
+
+
+def make_source(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.array([' alpha beta ', 'gamma', '', None, "o'neil dept", '  ', 'x.y.z', np.nan], dtype=object)
+    dates = np.array(['01.02.2020', '1.2.99', '2020-01-01', None, '31.12.9999', 'a.b', ''], dtype=object)
+    return pd.DataFrame({
+        'Object ID': 50000000 + np.arange(rows),
+        'Name': names[rng.integers(0, len(names), rows)],
+        'Start date': dates[rng.integers(0, len(dates), rows)],
+        'Planning status': np.array([1, 2, 3, 0, 5, None], dtype=object)[rng.integers(0, 6, rows)],
+        'Object abbr.': np.array(['AB', None, 'c d', 12], dtype=object)[rng.integers(0, 4, rows)]
+    })
+
+
+def make_mappings():
+    rows = []
+    for file_type in ('Level', 'Association'):
+        for i, transformation in enumerate(TRANSFORMATIONS * 2):
+            rows.append({
+                'applies_to': file_type,
+                'target_column1': 'Operator' if i == 2 else f'{file_type}{i}',
+                'target_column2': 'Operator' if i == 3 else f'Header {i}',
+                'source_column': SOURCE_COLUMNS[(i * 3) % len(SOURCE_COLUMNS)],
+                'transformation': transformation,
+                'default_value': [None, 'DEF', '', np.nan][i % 4],
+                'secondary_column': ['Name', 'missing', 'Start date', 'Object ID'][i % 4],
+                'transformation_code': ['str(value).upper()', 'value[:3]', 'value + 1', 'secondary_value'][i % 4]
+            })
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize('file_type', ['Level', 'Association'])
+@pytest.mark.parametrize('rows', [0, 1, 300])
+def test_engine_matches_row_builder(file_type, rows):
+    source_df = make_source(rows)
+    mappings = make_mappings()
+
+    expected = build_rows_reference(source_df, mappings, file_type)
+    result = build_output_frame(source_df, compile_mapping_plan(mappings, file_type))
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_engine_matches_row_builder_on_numeric_frame():
+    """iterrows() upcasts the values of an all-numeric frame; the engine reads them the same way"""
+    source_df = pd.DataFrame({'Object ID': range(20), 'Name': np.arange(20) * 0.5})
+    mappings = make_mappings()
+    mappings['source_column'] = ['Object ID', 'Name'] * (len(mappings) // 2)
+
+    for file_type in ('Level', 'Association'):
+        expected = build_rows_reference(source_df, mappings, file_type)
+        result = build_output_frame(source_df, compile_mapping_plan(mappings, file_type))
+        pd.testing.assert_frame_equal(result, expected)
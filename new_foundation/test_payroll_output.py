@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Payroll Output Tests
+Checks that the chunked payroll build gives the single-pass output
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Repository root for sap_common, new_payroll for the payroll engine
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'new_payroll')))
+from payroll_output_engine import PAYROLL_TARGET_COLUMNS, build_payroll_column_plan, build_payroll_output
+
+
+def make_payroll(rows, seed=0):
+    rng = np.random.default_rng(seed)
+
+    def pick(values):
+        return np.array(values, dtype=object)[rng.integers(0, len(values), rows)]
+
+    return pd.DataFrame({
+        'Pers.No.': rng.integers(1, 50, rows),
+        'Wage Type': pick(['m100', ' M200 ', None]),
+        'Amount': pick(['1,234.5', '12', 'abc', '', 3.14159, None]),
+        'Currency': pick(['eur', None]),
+        'Start date': pick(['01.02.2020', '2020-01-15', '3/4/2021', 'garbage', None]),
+        'Status': pick([1, 2, '3', 0, 9, None])
+    })
+
+
+def make_mappings():
+    rows = [
+        ('EMPLOYEE_ID', 'Pers.No.', 'None', ''),
+        ('WAGE_TYPE', 'Wage Type', 'Trim Whitespace', ''),
+        ('AMOUNT', 'Amount', 'Number Format', '0.00'),
+        ('CURRENCY', 'Currency', 'UPPERCASE', 'EUR'),
+        ('PAY_PERIOD', 'Start date', 'Date Format (YYYY-MM)', ''),
+        ('PAYMENT_DATE', 'Start date', 'Date Format (YYYY-MM-DD)', ''),
+        ('STATUS', 'Status', 'Status Mapping', 'Pending'),
+        ('COST_CENTER', '', 'None', 'CC01')
+    ]
+    return pd.DataFrame([
+        {'target_column': target, 'source_column': source, 'transformation': transformation, 'default_value': default}
+        for target, source, transformation, default in rows
+    ])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 100, 299, 300, 1000])
+def test_chunked_build_matches_single_pass(chunk_size):
+    data = make_payroll(300)
+    plan = build_payroll_column_plan(make_mappings())
+
+    expected = build_payroll_output(data, plan)
+    result = build_payroll_output(data, plan, chunk_size=chunk_size)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_chunked_build_keeps_reused_columns():
+    data = make_payroll(50)
+    plan = build_payroll_column_plan(make_mappings())
+    expected = build_payroll_output(data, plan)
+    reuse = {'AMOUNT': expected['AMOUNT'].to_numpy(dtype=object)}
+
+    result = build_payroll_output(data, plan, reuse=reuse, chunk_size=8)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert list(result.columns) == PAYROLL_TARGET_COLUMNS
+
+
+def test_chunked_build_of_empty_data():
+    data = make_payroll(0)
+    plan = build_payroll_column_plan(make_mappings())
+
+    pd.testing.assert_frame_equal(build_payroll_output(data, plan, chunk_size=10), build_payroll_output(data, plan))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Session Memory Tests
+Checks that spilling session frames really releases them
+"""
+
+import gc
+import os
+import sys
+import weakref
+
+import pandas as pd
+import pytest
+
+# Repository root, for the shared sap_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sap_common.session_memory import SessionMemoryManager, SpilledFrame, get_state_token
+
+pytest.importorskip('pyarrow')
+
+
+def make_frame(rows=2000, prefix='X'):
+    return pd.DataFrame({
+        'Object ID': [f"{prefix}{i}" for i in range(rows)],
+        'Name': [f"Unit {i}" for i in range(rows)],
+        'Level': list(range(rows))
+    })
+
+
+def make_state(tmp_path):
+    # A zero budget spills every key except the one just stored or read
+    return SessionMemoryManager(budget_mb=0, spill_dir=str(tmp_path))
+
+
+def test_spill_releases_frame(tmp_path):
+    """A spilled frame is no longer referenced by the state"""
+    state = make_state(tmp_path)
+    df = make_frame()
+    ref = weakref.ref(df)
+    expected = df.copy()
+    state['source_hrp1000'] = df
+    del df
+    state['source_hrp1001'] = make_frame(prefix='Y')
+    gc.collect()
+
+    assert ref() is None
+    assert isinstance(dict.get(state, 'source_hrp1000'), SpilledFrame)
+    pd.testing.assert_frame_equal(state['source_hrp1000'], expected)
+
+
+def test_shared_frame_counted_and_spilled_once(tmp_path):
+    """A frame held by two managed keys is counted once and freed from both"""
+    state = SessionMemoryManager(spill_dir=str(tmp_path))
+    df = make_frame()
+    ref = weakref.ref(df)
+    frame_bytes = int(df.memory_usage(deep=True, index=True).sum())
+    state['generated_output_files'] = {'level_files': {1: {'data': df}}}
+    state['generated_column_cache'] = {1: {'data': df}}
+    del df
+    assert state.get_memory_bytes() == frame_bytes
+
+    assert state.spill('generated_output_files') == frame_bytes
+    gc.collect()
+    assert ref() is None
+    assert state.get_memory_bytes() == 0
+    assert isinstance(dict.get(state, 'generated_column_cache')[1]['data'], SpilledFrame)
+
+    # Reloading one key gives both keys the same single copy back
+    reloaded = state['generated_column_cache'][1]['data']
+    assert dict.get(state, 'generated_output_files')['level_files'][1]['data'] is reloaded
+    assert state.get_memory_bytes() == frame_bytes
+
+
+def test_pinned_frame_not_spilled(tmp_path):
+    """Frames an unmanaged key also holds are not spilled or counted as freed"""
+    state = make_state(tmp_path)
+    df = make_frame()
+    state['source_hrp1000'] = df
+    state['detective_report_cache'] = {'report': df}
+    state['source_hrp1001'] = make_frame(prefix='Y')
+
+    assert dict.get(state, 'source_hrp1000') is df
+    assert state.spill('source_hrp1000') == 0
+    assert state.spill_count == 0
+
+
+def test_items_do_not_reload(tmp_path):
+    """items() and values() return the stored handles without loading them"""
+    state = make_state(tmp_path)
+    state['source_hrp1000'] = make_frame()
+    state['source_hrp1001'] = make_frame(prefix='Y')
+
+    assert any(isinstance(value, SpilledFrame) for value in state.values())
+    assert state.reload_count == 0
+
+
+def test_state_token_survives_reload(tmp_path):
+    """The state token changes on assignment, not when a spilled key is reloaded"""
+    state = make_state(tmp_path)
+    state['source_hrp1000'] = make_frame()
+    token = get_state_token(state, 'source_hrp1000')
+    state['source_hrp1001'] = make_frame(prefix='Y')
+    state['source_hrp1000']
+
+    assert get_state_token(state, 'source_hrp1000') is token
+    state['source_hrp1000'] = make_frame()
+    assert get_state_token(state, 'source_hrp1000') is not token
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Streaming Reader Tests
+Checks the chunked upload reader against pd.read_csv and that its frames stay writable
+"""
+
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Repository root for sap_common, this directory for utils
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from sap_common.streaming_reader import read_upload
+from utils.hierarchy_utils import apply_mappings
+
+
+def make_upload(df, name='extract.csv'):
+    upload = io.BytesIO(df.to_csv(index=False).encode('utf-8'))
+    upload.name = name
+    return upload
+
+
+def make_extract(rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    object_types = np.array(['O', 'O', 'S', None], dtype=object)
+    # Numbers in the first rows, codes only further down
+    codes = [str(i) if i < rows // 2 else f"A{i}" for i in range(rows)]
+    return pd.DataFrame({
+        'Object ID': 50000000 + np.arange(rows),
+        'Object type': object_types[rng.integers(0, len(object_types), rows)],
+        'Planning status': np.array([1, 2, None], dtype=object)[rng.integers(0, 3, rows)],
+        'Name': [f"Unit {i}" if i % 7 else None for i in range(rows)],
+        'Code': codes,
+        'Amount': rng.random(rows).round(2)
+    })
+
+
+def get_values(column):
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 100, 1000])
+def test_chunked_read_matches_read_csv(chunk_rows):
+    extract = make_extract()
+    expected = pd.read_csv(make_upload(extract))
+
+    result = read_upload(make_upload(extract), chunk_rows=chunk_rows)
+
+    assert list(result.columns) == list(expected.columns)
+    for col in expected.columns:
+        assert get_values(result[col]) == get_values(expected[col]), col
+        assert pd.api.types.is_numeric_dtype(result[col]) == pd.api.types.is_numeric_dtype(expected[col]), col
+
+
+def test_source_code_columns_are_not_categorical():
+    result = read_upload(make_upload(make_extract()), chunk_rows=50)
+    assert not any(isinstance(dtype, pd.CategoricalDtype) for dtype in result.dtypes)
+
+
+def test_default_fill_on_code_column():
+    """A default value that never occurs in a code column can still be filled in"""
+    hrp1000 = read_upload(make_upload(make_extract()), chunk_rows=50)
+    mappings = [{'applies_to': 'Level', 'target_column1': 'type', 'source_column': 'Object type',
+                 'transformation': 'None', 'default_value': 'ORG'}]
+
+    result = apply_mappings(hrp1000, mappings, 'Level')
+
+    expected = [value if value is not None else 'ORG' for value in get_values(hrp1000['Object type'])]
+    assert get_values(result['type']) == expected
+
+
+def test_cell_edit_on_code_column():
+    hrp1000 = read_upload(make_upload(make_extract()), chunk_rows=50)
+    hrp1000.loc[0, 'Object type'] = 'NEW'
+    assert hrp1000.loc[0, 'Object type'] == 'NEW'
@@ -0,0 +1,212 @@
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from sap_common.column_engine import get_row_dtype, get_column_values
+
+# Lookup tables for the statistics detective report.
+# Everything a per-record analysis needs is indexed once per run: the HRP1000
+# row of each Object ID, its hierarchy level, the output files it appears in
+# and its HRP1001 relationships. Analysing a record is then a handful of dict
+# lookups instead of rescanning HRP1000/HRP1001 and every output file.
+# Record statuses are classified for all IDs in vectorized passes; the full
+# per-record explanations are only built when a record is actually read, and
+# the most recently read ones are kept in an LRU cache.
+
+# A cell "contains" an Object ID if the whole cell or one of its alphanumeric
+# tokens equals the ID (e.g. '50000123' or 'ORG_50000123 / Sales')
+ID_TOKEN_PATTERN = r'[0-9A-Za-z]+'
+ID_SEPARATOR_PATTERN = r'[^0-9A-Za-z]'
+
+# Explained records kept per report
+DETECTIVE_CACHE_RECORDS = 512
+
+
+def get_record_ids(hrp1000_df):
+    """HRP1000 Object IDs, names and statuses as a row-by-row scan reads them"""
+    row_dtype = get_row_dtype(hrp1000_df)
+    ids = get_column_values(hrp1000_df, 'Object ID', row_dtype).map(str)
+
+    def get_column(column):
+        if column in hrp1000_df.columns:
+            return get_column_values(hrp1000_df, column, row_dtype).tolist()
+        return ['Unknown'] * len(hrp1000_df)
+
+    return ids.tolist(), get_column('Name'), get_column('Planning status')
+
+
+def get_cell_tokens(data):
+    """All distinct cell texts of a frame plus the alphanumeric tokens inside them"""
+    if len(data.columns) == 0:
+        return pd.Series([], dtype=object)
+
+    cells = pd.concat([data[col].astype(str) for col in data.columns], ignore_index=True)
+    cells = cells.dropna().drop_duplicates()
+
+    # Cells that are a single token already are one
+    compound = cells[cells.str.contains(ID_SEPARATOR_PATTERN, regex=True).to_numpy(dtype=bool)]
+    tokens = compound.str.findall(ID_TOKEN_PATTERN).explode().dropna()
+    return pd.Series(np.concatenate([cells.to_numpy(dtype=object), tokens.to_numpy(dtype=object)]), dtype=object)
+
+
+def index_output_files(output_files, object_ids):
+    """Find the given Object IDs in every output file.
+
+    Returns a list of {'kind', 'level_num', 'filename', 'ids'} in the order the
+    report lists files, kind being 'Level' or 'Association' and ids a pd.Index
+    of the Object IDs found in that file.
+    """
+    wanted = pd.Index(pd.unique(np.asarray(list(object_ids), dtype=object)), dtype=object)
+    files = []
+
+    for kind, files_key in (('Level', 'level_files'), ('Association', 'association_files')):
+        for level_num, file_info in output_files.get(files_key, {}).items():
+            data = file_info.get('data')
+            if data is None:
+                continue
+            positions = wanted.get_indexer(get_cell_tokens(data))
+            found = wanted[np.unique(positions[positions >= 0])]
+            files.append({
+                'kind': kind,
+                'level_num': level_num,
+                'filename': file_info.get('filename', 'Unknown'),
+                'ids': found
+            })
+
+    return files
+
+
+def get_output_files_for(record_index, object_id):
+    """The output files an Object ID appears in, as (kind, level_num, filename)"""
+    return [
+        (file_entry['kind'], file_entry['level_num'], file_entry['filename'])
+        for file_entry in record_index['output_files']
+        if object_id in file_entry['ids']
+    ]
+
+
+def index_relationships(hrp1001_df):
+    """The distinct Object IDs occurring as Source ID / Target object ID"""
+    relationships = {}
+    for column, role in (('Source ID', 'as_source'), ('Target object ID', 'as_target')):
+        if hrp1001_df is not None and column in hrp1001_df.columns:
+            ids = hrp1001_df[column].astype(str).dropna().to_numpy(dtype=object)
+            relationships[role] = pd.Index(pd.unique(ids), dtype=object)
+        else:
+            relationships[role] = pd.Index([], dtype=object)
+    return relationships
+
+
+def build_detective_index(hrp1000_df, hrp1001_df, output_files, hierarchy_structure, object_ids=None):
+    """Build the detective report's lookup tables once.
+
+    object_ids limits the output-file index to the given IDs (defaults to
+    every HRP1000 Object ID).
+
+    Returns a dict with:
+      'positions'     - Object ID -> HRP1000 row position (last occurrence)
+      'unit_names', 'statuses' - HRP1000 names / planning statuses by row position
+      'levels'        - Object ID -> hierarchy level
+      'output_files'  - per output file, the Object IDs found in it (see index_output_files)
+      'relationships' - {'as_source': Index of IDs, 'as_target': Index of IDs}
+      'has_hrp1001'   - whether relationship data was available
+    """
+    record_ids, unit_names, statuses = [], [], []
+    if hrp1000_df is not None and 'Object ID' in hrp1000_df.columns:
+        record_ids, unit_names, statuses = get_record_ids(hrp1000_df)
+    if object_ids is None:
+        object_ids = record_ids
+
+    hierarchy_structure = hierarchy_structure or {}
+    return {
+        'positions': {object_id: position for position, object_id in enumerate(record_ids)},
+        'unit_names': unit_names,
+        'statuses': statuses,
+        'levels': {unit_id: info.get('level', 'Unknown') for unit_id, info in hierarchy_structure.items()},
+        'output_files': index_output_files(output_files or {}, object_ids),
+        'relationships': index_relationships(hrp1001_df),
+        'has_hrp1001': hrp1001_df is not None
+    }
+
+
+def classify_records(record_index, hierarchy_structure):
+    """Status and issue type of every HRP1000 record, without building explanations.
+
+    Mirrors the outcome of the per-record analysis: not in the hierarchy or
+    missing from its level file is an ERROR; relationships without any
+    association file entry is a WARNING (issue type None); otherwise SUCCESS.
+    Returns a DataFrame indexed by Object ID in report order.
+    """
+    ids = pd.Index(list(record_index['positions']), dtype=object)
+
+    in_hierarchy = ids.isin(list(hierarchy_structure)) if hierarchy_structure else np.zeros(len(ids), dtype=bool)
+    levels = pd.Series(ids.map(record_index['levels']), dtype=object)
+
+    found_in_level_file = np.zeros(len(ids), dtype=bool)
+    found_in_associations = np.zeros(len(ids), dtype=bool)
+    for file_entry in record_index['output_files']:
+        in_file = np.zeros(len(ids), dtype=bool)
+        in_file[ids.get_indexer(file_entry['ids'])] = True
+        if file_entry['kind'] == 'Level':
+            found_in_level_file |= in_file & (levels == file_entry['level_num']).to_numpy()
+        else:
+            found_in_associations |= in_file
+
+    relationships = record_index['relationships']
+    has_relationships = np.zeros(len(ids), dtype=bool)
+    if record_index['has_hrp1001']:
+        has_relationships = ids.isin(relationships['as_source']) | ids.isin(relationships['as_target'])
+
+    status = np.select(
+        [~in_hierarchy, ~found_in_level_file, has_relationships & ~found_in_associations],
+        ['ERROR', 'ERROR', 'WARNING'], 'SUCCESS'
+    )
+    issue_type = np.select(
+        [~in_hierarchy, ~found_in_level_file],
+        ['NOT_IN_HIERARCHY', 'MISSING_FROM_OUTPUT'], None
+    )
+    return pd.DataFrame({'status': status, 'issue_type': issue_type}, index=ids)
+
+
+class ExplainedRecordCache:
+    """LRU cache of explained detective records, built on first access"""
+
+    def __init__(self, explain, max_records=DETECTIVE_CACHE_RECORDS):
+        self.explain = explain
+        self.max_records = max_records
+        self.records = OrderedDict()
+
+    def get(self, object_id):
+        if object_id in self.records:
+            self.records.move_to_end(object_id)
+            return self.records[object_id]
+
+        record = self.explain(object_id)
+        self.records[object_id] = record
+        if len(self.records) > self.max_records:
+            self.records.popitem(last=False)
+        return record
+
+
+class LazyRecordMap(Mapping):
+    """Read-only Object ID -> record mapping whose records are explained on access"""
+
+    def __init__(self, object_ids, record_cache):
+        self.object_ids = dict.fromkeys(np.asarray(object_ids, dtype=object).tolist())
+        self.record_cache = record_cache
+
+    def __getitem__(self, object_id):
+        if object_id not in self.object_ids:
+            raise KeyError(object_id)
+        return self.record_cache.get(object_id)
+
+    def __contains__(self, object_id):
+        return object_id in self.object_ids
+
+    def __iter__(self):
+        return iter(self.object_ids)
+
+    def __len__(self):
+        return len(self.object_ids)
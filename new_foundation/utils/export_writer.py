@@ -0,0 +1,155 @@
+import os
+import json
+import hashlib
+import tempfile
+import zipfile
+from io import BytesIO
+from datetime import datetime
+from openpyxl import Workbook
+
+# Export of generated migration files for download.
+# XLSX is written with openpyxl's write-only workbook, which streams rows to
+# disk instead of building every cell in memory, into a spooled temp file
+# that only moves to disk once it gets large. CSV skips the workbook entirely.
+# Finished bytes are memoized per file and generation, so Streamlit reruns
+# re-serve them instead of rebuilding every download. All files of a
+# generation can also be bundled, on request, into one ZIP with a manifest.
+# XLSX members are stored as-is since they are already compressed. Once the
+# ZIP exists the separate bytes of its members are dropped and single-file
+# downloads are read back out of the archive, so each file is held once.
+
+EXPORT_FORMATS = {
+    'XLSX': {'extension': '.xlsx', 'mime': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    'CSV': {'extension': '.csv', 'mime': "text/csv"}
+}
+
+# Exports above this size are spooled to disk while they are written
+EXPORT_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+BUNDLE_MANIFEST_NAME = 'manifest.json'
+
+
+def write_xlsx(df, target):
+    """Stream a DataFrame's rows (no index, no header row) into an XLSX file object"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+
+    for row in df.itertuples(index=False, name=None):
+        ws.append(list(row))
+
+    wb.save(target)
+
+
+def write_csv(df, target):
+    """Write a DataFrame's rows (no index, no header row) as UTF-8 CSV into a binary file object"""
+    df.to_csv(target, index=False, header=False, encoding='utf-8')
+
+
+def export_dataframe(df, file_format='XLSX'):
+    """Serialize a generated file in the given format and return its bytes"""
+    writer = write_csv if file_format == 'CSV' else write_xlsx
+
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES) as spool:
+        writer(df, spool)
+        spool.seek(0)
+        return spool.read()
+
+
+def get_export_filename(filename, file_format='XLSX'):
+    """Swap a generated file's extension for the export format's"""
+    extension = EXPORT_FORMATS[file_format]['extension']
+    stem = filename.rsplit('.', 1)[0] if '.' in filename else filename
+    return f"{stem}{extension}"
+
+
+def get_generation_exports(export_cache, generation_id):
+    """The memoized exports of a generation, emptying the cache when the generation changed"""
+    if export_cache.get('generation_id') != generation_id:
+        export_cache.clear()
+        export_cache['generation_id'] = generation_id
+        export_cache['files'] = {}
+    return export_cache['files']
+
+
+def get_cached_export(export_cache, generation_id, file_key, df, file_format='XLSX'):
+    """Bytes of a generated file, built once per (file, format) for a generation.
+
+    export_cache is a dict kept in session state; it is emptied whenever the
+    generation id changes so exports of replaced files are dropped. Files
+    already in the generation's bundle are read from the ZIP.
+    """
+    exports = get_generation_exports(export_cache, generation_id)
+
+    cache_key = (file_key, file_format)
+    if cache_key in exports:
+        return exports[cache_key]
+
+    members = exports.get(('bundle_members', file_format), {})
+    if file_key in members:
+        with zipfile.ZipFile(BytesIO(exports[('bundle', file_format)])) as bundle:
+            return bundle.read(members[file_key])
+
+    exports[cache_key] = export_dataframe(df, file_format)
+    return exports[cache_key]
+
+
+def has_export_bundle(export_cache, generation_id, file_format='XLSX'):
+    """Check whether the ZIP of a generation has been built in the given format"""
+    return (export_cache.get('generation_id') == generation_id
+            and ('bundle', file_format) in export_cache.get('files', {}))
+
+
+def iter_generated_files(generated_files):
+    """(file_key, filename, data) of every level and association file, in panel order"""
+    for file_kind, files_key in (('Level', 'level_files'), ('Association', 'association_files')):
+        for level_num, file_info in generated_files.get(files_key, {}).items():
+            yield (file_kind, level_num), file_info['filename'], file_info['data']
+
+
+def build_export_bundle(export_cache, generation_id, generated_files, file_format='XLSX', header_rows=0):
+    """Bytes of a ZIP holding every generated file plus a manifest.json.
+
+    Files already exported for this generation are reused, the rest are
+    serialized one at a time. The manifest lists each file's row count
+    (minus header_rows), size and SHA-256. The bundle itself is memoized like
+    the single-file exports, which it replaces in the cache.
+    """
+    exports = get_generation_exports(export_cache, generation_id)
+    bundle_key = ('bundle', file_format)
+    if bundle_key in exports:
+        return exports[bundle_key]
+
+    manifest = {
+        'generation_id': generation_id,
+        'exported_at': datetime.now().isoformat(),
+        'format': file_format,
+        'files': []
+    }
+    members = {}
+    member_compression = zipfile.ZIP_STORED if file_format == 'XLSX' else zipfile.ZIP_DEFLATED
+
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES) as spool:
+        with zipfile.ZipFile(spool, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+            for file_key, filename, data in iter_generated_files(generated_files):
+                file_bytes = exports.pop((file_key, file_format), None)
+                if file_bytes is None:
+                    file_bytes = export_dataframe(data, file_format)
+                member_name = get_export_filename(filename, file_format)
+                bundle.writestr(member_name, file_bytes, compress_type=member_compression)
+                members[file_key] = member_name
+                manifest['files'].append({
+                    'name': member_name,
+                    'type': file_key[0],
+                    'level': file_key[1],
+                    'rows': max(len(data) - header_rows, 0),
+                    'bytes': len(file_bytes),
+                    'sha256': hashlib.sha256(file_bytes).hexdigest()
+                })
+
+            bundle.writestr(BUNDLE_MANIFEST_NAME, json.dumps(manifest, indent=2, default=str))
+
+        spool.seek(0)
+        exports[bundle_key] = spool.read()
+    exports[('bundle_members', file_format)] = members
+
+    return exports[bundle_key]
@@ -2,17 +2,17 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
+from sap_common.streaming_reader import read_upload_cached
 
-def load_data(file):
+def load_data(file, progress=None):
     """Load HRP1000 or HRP1001 file with comprehensive error handling"""
     if file is None:
         raise ValueError("No file uploaded")
     
     try:
-        if file.name.endswith('.csv'):
-            return pd.read_csv(file)
-        elif file.name.endswith(('.xlsx', '.xls')):
-            return pd.read_excel(file)
+        if file.name.endswith(('.csv', '.xlsx', '.xls')):
+            # Chunked, compacted read; files parsed before come straight from the disk cache
+            return read_upload_cached(file, progress=progress)
         else:
             raise ValueError("Unsupported file format. Please upload CSV or Excel files.")
     except pd.errors.EmptyDataError:
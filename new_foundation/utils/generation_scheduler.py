@@ -0,0 +1,375 @@
+import os
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.mapping_engine import (
+    compile_mapping_plan, build_output_frame, evaluate_step, get_operator_position, get_operator_header, get_step_key, report_to
+)
+from sap_common.column_engine import get_row_dtype
+from sap_common.fingerprint import get_frame_fingerprint
+from sap_common.delta_engine import (
+    hash_rows, slice_row_hashes, compute_row_delta, get_insert_delta, can_reuse_rows, get_delta_counts,
+    get_reprocess_positions, get_unchanged_values, splice_rows, build_delta_frame
+)
+from sap_common.streaming_reader import compact_output_frame
+from utils.transformation_compiler import (
+    clear_transformation_timings, get_transformation_timings, record_transformation_timing
+)
+
+# Scheduler for the per-level foundation output files.
+# The mapping plans and the level -> row positions of HRP1000/HRP1001 are
+# worked out once; each Level/Association file is then an independent job
+# that only slices the shared frames and evaluates a plan. Large orgs fan
+# the jobs out to a process pool whose workers receive the read-only inputs
+# once at start-up; small ones run inline, where a pool would cost more than it saves.
+# With a column cache, each file remembers its source fingerprint and the step
+# key of every column; after a mapping edit only the columns whose step
+# changed are evaluated again and the rest are spliced in from the cached file.
+# It also keeps a key/content hash per source row, so when a new extract of the
+# same table comes in only its inserted and changed rows are evaluated, and a
+# delta-only file (deleted rows marked in the operator column) can be built.
+
+# Below this many source rows in total, files are generated in-process
+PARALLEL_MIN_ROWS = 50000
+
+# Worker-side copy of the shared read-only inputs
+_worker_inputs = {}
+
+
+def get_generation_workers(job_count):
+    """Number of worker processes to use for a generation run"""
+    return max(1, min(os.cpu_count() or 1, job_count))
+
+
+def get_level_positions(ids, level_by_unit):
+    """Map each hierarchy level to the row positions whose ID belongs to that level"""
+    if not level_by_unit or ids is None:
+        return {}
+
+    levels = pd.Series(ids.astype(str).map(level_by_unit).to_numpy(), dtype=object)
+    present = levels.notna().to_numpy()
+    if not present.any():
+        return {}
+
+    row_positions = np.flatnonzero(present)
+    row_levels = levels[present].to_numpy()
+    positions = {}
+    for level in pd.unique(row_levels):
+        positions[level] = row_positions[row_levels == level]
+    return positions
+
+
+def get_job_fingerprint(source_fingerprint, positions):
+    """Fingerprint of the source rows a job reads"""
+    digest = hashlib.sha256(str(source_fingerprint).encode('utf-8'))
+    if positions is not None:
+        digest.update(np.asarray(positions, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def get_clean_positions(entry, plan):
+    """Step index -> column position in the cached file, for steps whose key matches a clean cached column"""
+    positions = {}
+    for position, (step_key, clean) in enumerate(zip(entry['step_keys'], entry['clean'])):
+        if clean:
+            positions.setdefault(step_key, position)
+
+    clean_positions = {}
+    for i, step in enumerate(plan['steps']):
+        position = positions.get(get_step_key(step))
+        if position is not None:
+            clean_positions[i] = position
+    return clean_positions
+
+
+def get_cached_columns(entry, fingerprint, plan):
+    """Data of the plan steps whose column can be taken from a cached file, by step index.
+
+    A cached column is reused when the file was built from the same source rows
+    and a step with the same key produced it without warnings or errors.
+    """
+    if not entry or plan is None or entry['fingerprint'] != fingerprint:
+        return {}
+
+    cached_df = entry['data']
+    # Rows 0-3 are the header rows
+    return {
+        i: cached_df.iloc[4:, position].to_numpy(dtype=object)
+        for i, position in get_clean_positions(entry, plan).items()
+    }
+
+
+def get_cached_rows(entry, row_hashes, plan):
+    """Row delta of a job against its cached file, plus what can be reused row by row.
+
+    Returns (delta, row_reuse). delta is None without a comparable cached
+    file. row_reuse is None unless the unchanged rows can keep their output;
+    otherwise it holds the delta and, by step index, the cached values of the
+    unchanged rows for every clean step whose key is unchanged.
+    """
+    if not entry or plan is None or entry.get('row_hashes') is None or row_hashes is None:
+        return None, None
+
+    delta = compute_row_delta(entry['row_hashes'], row_hashes)
+    if not can_reuse_rows(entry['row_hashes'], row_hashes, delta):
+        return delta, None
+
+    cached_df = entry['data']
+    values = {
+        i: get_unchanged_values(delta, cached_df.iloc[4:, position].to_numpy(dtype=object))
+        for i, position in get_clean_positions(entry, plan).items()
+    }
+    return delta, ({'delta': delta, 'values': values} if values else None)
+
+
+def splice_cached_rows(source_df, plan, row_reuse, warn=None, error=None, reported_steps=None):
+    """Data columns of the row-reused steps: cached unchanged rows plus the inserted/changed rows evaluated"""
+    delta = row_reuse['delta']
+    reprocess_df = source_df.iloc[get_reprocess_positions(delta)]
+    row_dtype = get_row_dtype(source_df)
+
+    columns = {}
+    for i, unchanged_values in row_reuse['values'].items():
+        reported = []
+        data = evaluate_step(reprocess_df, plan['steps'][i], row_dtype, report_to(warn, reported), report_to(error, reported))
+        if reported and reported_steps is not None:
+            reported_steps.add(i)
+        columns[i] = splice_rows(delta, unchanged_values, data)
+    return columns
+
+
+def get_column_cache_entry(job, plan, output_df, row_hashes=None):
+    """Cache entry for a generated file: its source fingerprint and row hashes, step keys and data"""
+    reported_steps = set(job.get('reported_steps', []))
+    return {
+        'fingerprint': job['fingerprint'],
+        'row_hashes': row_hashes,
+        'step_keys': [get_step_key(step) for step in plan['steps']],
+        'clean': [i not in reported_steps for i in range(len(plan['steps']))],
+        'data': output_df
+    }
+
+
+def get_delta_file(output_df, entry, delta, plan):
+    """Delta-only file of a generated file and its row counts (see build_delta_frame)"""
+    previous_df = entry['data'] if entry else None
+    delta_df = build_delta_frame(output_df, previous_df, delta, header_rows=4,
+                                 operator_column=get_operator_position(plan), operator_header=get_operator_header())
+    return {'data': compact_output_frame(delta_df), 'counts': get_delta_counts(delta)}
+
+
+def plan_generation_jobs(hrp1000_df, hrp1001_df, hierarchy, max_level):
+    """Work out every Level/Association job once from the hierarchy.
+
+    Returns (jobs, skipped): jobs are dicts with kind, level and the row
+    positions to slice (None for the whole frame); skipped lists
+    (kind, level, reason) for files that have no rows.
+    """
+    level_by_unit = {unit_id: info.get('level') for unit_id, info in hierarchy.items()} if hierarchy else {}
+
+    jobs = []
+    skipped = []
+
+    if hrp1000_df is None or hrp1000_df.empty:
+        skipped.extend(('Level', level, "HRP1000 data not found") for level in range(1, max_level + 1))
+    else:
+        level_positions = get_level_positions(hrp1000_df['Object ID'], level_by_unit) if hierarchy else {}
+        for level in range(1, max_level + 1):
+            if not hierarchy:
+                # Without a hierarchy the whole file is level 1
+                positions = None if level == 1 else np.array([], dtype=np.intp)
+            else:
+                positions = level_positions.get(level, np.array([], dtype=np.intp))
+            if positions is not None and len(positions) == 0:
+                skipped.append(('Level', level, f"No data found for Level {level}"))
+                continue
+            jobs.append({'kind': 'Level', 'level': level, 'positions': positions})
+
+    if hrp1001_df is None or hrp1001_df.empty:
+        skipped.extend(('Association', level, "HRP1001 data not found") for level in range(2, max_level + 1))
+    else:
+        source_positions = get_level_positions(hrp1001_df['Source ID'], level_by_unit) if hierarchy else {}
+        for level in range(2, max_level + 1):
+            positions = source_positions.get(level, np.array([], dtype=np.intp)) if hierarchy else None
+            if positions is not None and len(positions) == 0:
+                skipped.append(('Association', level, f"No association data found for Level {level}"))
+                continue
+            jobs.append({'kind': 'Association', 'level': level, 'positions': positions})
+
+    return jobs, skipped
+
+
+def init_generation_worker(inputs):
+    """Process pool initializer: keep the shared inputs for every job this worker runs"""
+    _worker_inputs.clear()
+    _worker_inputs.update(inputs)
+
+
+def run_generation_job(job, inputs=None):
+    """Build one output file; returns (job, output_df, messages, timings, seconds).
+
+    output_df comes back compacted (see compact_output_frame). Columns in
+    job['reuse'] are spliced in instead of evaluated, and for the steps in
+    job['row_reuse'] only the inserted/changed rows are evaluated. The
+    returned job drops both and records 'reused_columns', 'reused_rows' and
+    the 'reported_steps' that warned.
+
+    In a worker process (inputs=None) the transformation timings recorded for
+    the job are returned so the parent can merge them; inline runs record
+    them directly and return none.
+    """
+    in_worker = inputs is None
+    inputs = _worker_inputs if in_worker else inputs
+    started = time.perf_counter()
+
+    source_df = inputs['hrp1000'] if job['kind'] == 'Level' else inputs['hrp1001']
+    if job['positions'] is not None:
+        source_df = source_df.iloc[job['positions']]
+
+    messages = []
+    reported_steps = set()
+    plan = inputs['plans'][job['kind']]
+    reuse = dict(job.get('reuse') or {})
+    reused_columns = len(reuse)
+    row_reuse = job.get('row_reuse')
+
+    def warn(message):
+        messages.append(('warning', message))
+
+    def error(message):
+        messages.append(('error', message))
+
+    if in_worker:
+        clear_transformation_timings()
+    if row_reuse:
+        reuse.update(splice_cached_rows(source_df, plan, row_reuse, warn, error, reported_steps))
+    output_df = build_output_frame(source_df, plan, warn=warn, error=error, reuse=reuse, reported_steps=reported_steps)
+    timings = get_transformation_timings().to_dict('records') if in_worker else []
+
+    # Outputs are kept in session state, so store them compactly (also shrinks what workers send back)
+    output_df = compact_output_frame(output_df)
+
+    finished = {key: value for key, value in job.items() if key not in ('reuse', 'row_reuse')}
+    finished['reused_columns'] = reused_columns
+    finished['reused_rows'] = len(row_reuse['delta']['unchanged']) if row_reuse else 0
+    finished['reported_steps'] = sorted(reported_steps)
+    return finished, output_df, messages, timings, time.perf_counter() - started
+
+
+def get_job_rows(job, inputs):
+    """Number of source rows a job reads"""
+    if job['positions'] is not None:
+        return len(job['positions'])
+    source_df = inputs['hrp1000'] if job['kind'] == 'Level' else inputs['hrp1001']
+    return len(source_df) if source_df is not None else 0
+
+
+def get_pending_rows(job, inputs):
+    """Number of source rows a job still evaluates (0 when every column comes from the cache)"""
+    plan = inputs['plans'][job['kind']]
+    if plan is None:
+        return 0
+
+    steps = len(plan['steps'])
+    reused = len(job.get('reuse') or {})
+    row_reuse = job.get('row_reuse')
+    if row_reuse and reused + len(row_reuse['values']) >= steps:
+        return len(get_reprocess_positions(row_reuse['delta']))
+    return get_job_rows(job, inputs) if reused < steps else 0
+
+
+def run_generation_jobs(hrp1000_df, hrp1001_df, mapping_config, jobs, parallel=None, column_cache=None,
+                        build_deltas=False):
+    """Run the jobs, in a process pool when worthwhile; yields results in job order.
+
+    The mapping plans are compiled once here and shared with every job.
+    parallel=None decides from the number of source rows that still need
+    evaluating; the pool falls back to in-process generation if worker
+    processes cannot be started.
+
+    column_cache is a dict kept in session state, keyed by (kind, level).
+    When given, unchanged columns (or, for a new extract, unchanged rows) are
+    reused from it and it is updated in place with the files of this run.
+    With build_deltas, each job that has a file to compare with gets
+    job['delta'] = {'data', 'counts'}: its delta-only file against the cached
+    one (a file new to this run counts as all inserts).
+    """
+    inputs = {
+        'hrp1000': hrp1000_df,
+        'hrp1001': hrp1001_df,
+        'plans': {
+            'Level': compile_mapping_plan(mapping_config, 'Level'),
+            'Association': compile_mapping_plan(mapping_config, 'Association')
+        }
+    }
+
+    row_hashes = {}
+    deltas = {}
+    has_baseline = bool(column_cache)
+    if column_cache is not None:
+        source_fingerprints = {'Level': get_frame_fingerprint(hrp1000_df), 'Association': get_frame_fingerprint(hrp1001_df)}
+        source_row_hashes = {'Level': hash_rows(hrp1000_df, 'HRP1000'), 'Association': hash_rows(hrp1001_df, 'HRP1001')}
+        for job in jobs:
+            file_key = (job['kind'], job['level'])
+            entry = column_cache.get(file_key)
+            plan = inputs['plans'][job['kind']]
+            job['fingerprint'] = get_job_fingerprint(source_fingerprints[job['kind']], job['positions'])
+            job['reuse'] = get_cached_columns(entry, job['fingerprint'], plan)
+            row_hashes[file_key] = slice_row_hashes(source_row_hashes[job['kind']], job['positions'])
+            deltas[file_key], row_reuse = get_cached_rows(entry, row_hashes[file_key], plan)
+            if row_reuse and entry['fingerprint'] != job['fingerprint']:
+                job['row_reuse'] = row_reuse
+
+        # Forget files this run no longer generates
+        for file_key in set(column_cache) - {(job['kind'], job['level']) for job in jobs}:
+            del column_cache[file_key]
+
+    if parallel is None:
+        # Files whose columns all come from the cache only need assembling
+        pending_rows = [get_pending_rows(job, inputs) for job in jobs]
+        parallel = sum(1 for rows in pending_rows if rows) > 1 and sum(pending_rows) >= PARALLEL_MIN_ROWS
+
+    for result in iter_generation_results(inputs, jobs, parallel):
+        job, output_df = result[0], result[1]
+        file_key = (job['kind'], job['level'])
+        plan = inputs['plans'][job['kind']]
+        if column_cache is not None and plan is not None and not output_df.empty:
+            entry = column_cache.get(file_key)
+            delta = deltas.get(file_key)
+            if delta is None and entry is None and has_baseline:
+                delta = get_insert_delta(len(output_df) - 4)
+            if build_deltas and delta is not None:
+                job['delta'] = get_delta_file(output_df, entry, delta, plan)
+            column_cache[file_key] = get_column_cache_entry(job, plan, output_df, row_hashes.get(file_key))
+        yield result
+
+
+def iter_generation_results(inputs, jobs, parallel):
+    """Run the jobs in a process pool or inline; yields results in job order"""
+    if parallel:
+        try:
+            with ProcessPoolExecutor(max_workers=get_generation_workers(len(jobs)),
+                                     initializer=init_generation_worker, initargs=(inputs,)) as pool:
+                results = list(pool.map(run_generation_job, jobs))
+            for result in results:
+                yield result
+            return
+        except (BrokenProcessPool, OSError, NotImplementedError):
+            # e.g. sandboxed hosts without multiprocessing support
+            pass
+
+    for job in jobs:
+        yield run_generation_job(job, inputs)
+
+
+def replay_transformation_timings(timings):
+    """Merge timings recorded in a worker into this process's transformation timings"""
+    for entry in timings:
+        record_transformation_timing(
+            entry['mapping'], entry['transformation_code'], entry['mode'],
+            entry['rows'], entry['total_seconds'], calls=entry['calls']
+        )
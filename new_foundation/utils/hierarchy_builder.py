@@ -0,0 +1,164 @@
+import pandas as pd
+import numpy as np
+
+from sap_common.column_engine import get_row_dtype, get_column_values
+
+# Linear-time builder for the foundation hierarchy_structure dict.
+# IDs are factorized to integer codes once and every unit is resolved to its
+# top ancestor by pointer jumping over NumPy arrays, so no per-unit parent walk
+# (or recursion) is needed. Children are served from a CSR adjacency.
+
+# Level offset used for units on (or hanging below) a circular reference
+CIRCULAR_LEVEL = 999
+
+
+def get_relationship_pairs(hrp1001_df):
+    """Return the child -> parent relationships as a dict, last row winning"""
+    if hrp1001_df is None or hrp1001_df.empty:
+        return {}
+    if 'Source ID' not in hrp1001_df.columns or 'Target object ID' not in hrp1001_df.columns:
+        return {}
+
+    row_dtype = get_row_dtype(hrp1001_df)
+    source_ids = get_column_values(hrp1001_df, 'Source ID', row_dtype)
+    target_ids = get_column_values(hrp1001_df, 'Target object ID', row_dtype)
+
+    valid = source_ids.notna() & target_ids.notna()
+    child_ids = source_ids[valid].map(str).to_numpy(dtype=object).tolist()
+    parent_ids = target_ids[valid].map(str).to_numpy(dtype=object).tolist()
+    return dict(zip(child_ids, parent_ids))
+
+
+def build_child_index(child_codes, parent_of_child, node_count):
+    """Build a CSR adjacency (offsets, children) keeping relationship order within each parent"""
+    order = np.argsort(parent_of_child, kind='stable')
+    children = child_codes[order]
+    counts = np.bincount(parent_of_child, minlength=node_count)
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, children
+
+
+def jump_to_top(parent_codes):
+    """Resolve every node to its top ancestor and its distance from it by pointer jumping"""
+    node_count = len(parent_codes)
+    nodes = np.arange(node_count)
+    has_parent = parent_codes >= 0
+
+    ancestor = np.where(has_parent, parent_codes, nodes)
+    distance = has_parent.astype(np.int64)
+
+    # 2**rounds >= node_count steps reaches past any chain in the graph
+    rounds = max(int(np.ceil(np.log2(max(node_count, 2)))) + 1, 1)
+    for _ in range(rounds):
+        distance = distance + distance[ancestor]
+        ancestor = ancestor[ancestor]
+
+    return ancestor, distance
+
+
+def split_cycles(cycle_entries, parent_codes):
+    """Walk each cycle once from one of its nodes, collecting its members in parent order"""
+    cycles = []
+    seen = set()
+    for start in cycle_entries.tolist():
+        if start in seen:
+            continue
+        cycle = [start]
+        seen.add(start)
+        node = int(parent_codes[start])
+        while node != start:
+            cycle.append(node)
+            seen.add(node)
+            node = int(parent_codes[node])
+        cycles.append(cycle)
+    return cycles
+
+
+def assign_levels(parent_codes):
+    """Assign levels: roots are 1, cycle members 999 + cycle length, everyone else parent + 1"""
+    ancestor, distance = jump_to_top(parent_codes)
+
+    # Units whose top ancestor still has a parent never reached a root
+    cyclic = parent_codes[ancestor] >= 0
+    if not cyclic.any():
+        return distance + 1, []
+
+    cycles = split_cycles(np.unique(ancestor[cyclic]), parent_codes)
+
+    # Cut every cycle open so its members act as roots with a circular base level
+    base = np.ones(len(parent_codes), dtype=np.int64)
+    cut_parents = parent_codes.copy()
+    for cycle in cycles:
+        cycle = np.asarray(cycle, dtype=np.int64)
+        cut_parents[cycle] = -1
+        base[cycle] = CIRCULAR_LEVEL + len(cycle)
+
+    ancestor, distance = jump_to_top(cut_parents)
+    return base[ancestor] + distance, cycles
+
+
+def build_hierarchy_structure(hrp1000_df, hrp1001_df):
+    """Build the hierarchy_structure dict plus cycle and orphan diagnostics in linear time"""
+    result = {
+        'hierarchy': {},
+        'cycles': [],
+        'orphans': [],
+        'max_level': 0
+    }
+
+    if hrp1000_df is None or hrp1001_df is None:
+        return result
+
+    relationships = get_relationship_pairs(hrp1001_df)
+
+    # First row per Object ID supplies the unit name
+    unit_ids = hrp1000_df['Object ID'].astype(str).astype(object)
+    first_rows = ~unit_ids.duplicated(keep='first')
+    units = unit_ids[first_rows].to_numpy()
+    names = hrp1000_df['Name'][first_rows.to_numpy()].to_numpy(dtype=object)
+
+    child_ids = np.array(list(relationships.keys()), dtype=object)
+    parent_ids = np.array(list(relationships.values()), dtype=object)
+
+    # Integer-code every ID that appears anywhere in the graph
+    codes, labels = pd.factorize(np.concatenate([units, child_ids, parent_ids]), use_na_sentinel=False)
+    node_count = len(labels)
+    unit_codes = codes[:len(units)]
+    child_codes = codes[len(units):len(units) + len(child_ids)]
+    parent_of_child = codes[len(units) + len(child_ids):]
+
+    parent_codes = np.full(node_count, -1, dtype=np.int64)
+    parent_codes[child_codes] = parent_of_child
+
+    levels, cycles = assign_levels(parent_codes)
+    offsets, children = build_child_index(child_codes, parent_of_child, node_count)
+
+    is_unit = np.zeros(node_count, dtype=bool)
+    is_unit[unit_codes] = True
+    unit_parents = parent_codes[unit_codes]
+    parent_list = unit_parents.tolist()
+
+    # Convert once to Python lists; the dict build below is then plain list slicing
+    label_list = labels.tolist()
+    child_labels = labels[children].tolist()
+    offset_list = offsets.tolist()
+    level_list = levels[unit_codes].tolist()
+
+    hierarchy = {}
+    for i, (unit_id, code, name) in enumerate(zip(units.tolist(), unit_codes.tolist(), names.tolist())):
+        parent = parent_list[i]
+        hierarchy[unit_id] = {
+            'name': name,
+            'level': level_list[i],
+            'parent': label_list[parent] if parent >= 0 else None,
+            'children': child_labels[offset_list[code]:offset_list[code + 1]]
+        }
+
+    orphan_mask = (unit_parents >= 0) & ~is_unit[np.maximum(unit_parents, 0)]
+
+    result['hierarchy'] = hierarchy
+    result['cycles'] = [labels[np.asarray(cycle)].tolist() for cycle in cycles]
+    result['orphans'] = units[orphan_mask].tolist()
+    result['max_level'] = max(level_list) if level_list else 0
+    return result
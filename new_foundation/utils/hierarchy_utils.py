@@ -5,6 +5,8 @@ import os
 from pathlib import Path
 from datetime import datetime
 import sys
+from utils.picklist_registry import STATUS_CODE_MAP, get_picklist_index, lookup_series
+from utils.transformation_compiler import get_compiled_transformation, run_transformation
 
 # Set recursion limit higher
 sys.setrecursionlimit(10000)
@@ -87,31 +89,15 @@ def convert_german_date(value):
 def lookup_value(value, picklist_name, picklist_column="", default=""):
     """Helper for picklist lookups with your status mapping"""
     try:
-        if not picklist_name or not os.path.exists(f"picklists/{picklist_name}"):
+        index = get_picklist_index(picklist_name, picklist_column)
+        if index is None:
             return default
-            
-        picklist = pd.read_csv(f"picklists/{picklist_name}")
         
+        lookup_key = str(value)
         if picklist_name == "status_mapping.csv":
-            status_map = {
-                '1': 'ACT',
-                '2': 'INA',
-                '3': 'PND',
-                '0': 'DEL'
-            }
-            lookup_value = status_map.get(str(value), str(value))
-        else:
-            lookup_value = str(value)
-        
-        matched = picklist[picklist['status_code'] == lookup_value]
+            lookup_key = STATUS_CODE_MAP.get(lookup_key, lookup_key)
         
-        if not matched.empty:
-            if picklist_column and picklist_column in picklist.columns:
-                return matched[picklist_column].iloc[0]
-            else:
-                return matched['status_label'].iloc[0]
-        
-        return default
+        return index.get(lookup_key, default)
     except Exception as e:
         print(f"Picklist lookup error: {e}")
         return default
@@ -128,15 +114,43 @@ def apply_transformation(value, transformation_code, secondary_value=None):
         if "lookup_value" in transformation_code:
             return str(value)
         
+        # Parsed once per distinct expression, not on every call
+        compiled = get_compiled_transformation(transformation_code)
+        local_values = {
+            'value': value,
+            'transformation_code': transformation_code,
+            'secondary_value': secondary_value
+        }
         if secondary_value is not None and not pd.isna(secondary_value):
-            value1, value2 = value, secondary_value
-            return eval(transformation_code)
-        else:
-            return eval(transformation_code)
+            local_values['value1'], local_values['value2'] = value, secondary_value
+        return compiled.run_row(globals(), local_values)
     except Exception as e:
         print(f"Transformation error: {e}")
         return value
 
+def apply_transformation_column(values, transformation_code, label=None):
+    """Apply transformation code to a whole column, vectorized where the expression allows"""
+    values = values.astype(object)
+    values = values.where(values.notna(), "")
+    
+    try:
+        if "convert_german_date" in transformation_code:
+            return values.apply(convert_german_date)
+        
+        if "lookup_value" in transformation_code:
+            return values.map(str)
+    except Exception as e:
+        print(f"Transformation error: {e}")
+        return values
+    
+    def report_error(value, error):
+        print(f"Transformation error: {error}")
+        return value
+    
+    local_values = {'transformation_code': transformation_code, 'secondary_value': None}
+    return run_transformation(values, transformation_code, globals(), local_values,
+                              label=label, on_error=report_error)
+
 def apply_mappings(df, mappings, export_type, hrp1000_df=None, hrp1001_df=None):
     """Apply configured mappings to transform data"""
     if df.empty:
@@ -178,14 +192,12 @@ def apply_mappings(df, mappings, export_type, hrp1000_df=None, hrp1001_df=None):
             source_values = pd.Series([default_value] * len(df))
         
         if transformation == "Lookup Value" and picklist_source:
-            result_df[target_col] = source_values.apply(
-                lambda x: lookup_value(x, picklist_source, picklist_column, default_value)
-            )
+            result_df[target_col] = lookup_series(source_values, picklist_source, picklist_column, default_value)
         elif transformation == "Date Format (YYYY-MM-DD)":
             result_df[target_col] = source_values.apply(convert_german_date)
         elif transformation != "None":
-            result_df[target_col] = source_values.apply(
-                lambda x: apply_transformation(x, transformation_code)
+            result_df[target_col] = apply_transformation_column(
+                source_values, transformation_code, label=f"{export_type}: {target_col}"
             )
         else:
             result_df[target_col] = source_values.fillna(default_value)
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from sap_common.column_engine import get_row_dtype
+
+# Referential-integrity engine for HRP1001 relationships.
+# Each ID column is factorized once, so stringifying, the anti-join against
+# the HRP1000 Object IDs and the orphan counts work on distinct IDs and map
+# back to rows through the codes; row context (other ID, relationship) is
+# gathered for the orphaned rows only.
+
+ID_COLUMNS = ['Source ID', 'Target object ID']
+
+
+def get_id_codes(hrp1001_df, column, row_dtype=None, skip_missing=True):
+    """Factorize an ID column; returns (codes, texts) with texts[code] the ID as a string.
+
+    IDs are str() of .items() values or, with row_dtype, of iterrows values,
+    computed once per distinct value. With skip_missing, missing IDs get
+    code -1 instead of reading as 'nan'.
+    """
+    codes, uniques = pd.factorize(hrp1001_df[column], use_na_sentinel=skip_missing)
+    values = pd.Series(pd.Index(uniques).to_numpy(dtype=row_dtype or object), dtype=object)
+    if row_dtype is not None:
+        # Rows of text infer to a string Series, which reads None as NaN
+        values = values.where(values.notna(), np.nan)
+    return codes, values.map(str).astype(object).to_numpy()
+
+
+def get_valid_unit_ids(hrp1000_df):
+    """The set of HRP1000 Object IDs as strings"""
+    if hrp1000_df is None or 'Object ID' not in hrp1000_df.columns:
+        return set()
+    return set(hrp1000_df['Object ID'].astype(str))
+
+
+def get_context_values(hrp1001_df, column, positions, row_dtype):
+    """Row-level values of a context column for the given row positions ('N/A' if the column is missing)"""
+    if column not in hrp1001_df.columns:
+        return ['N/A'] * len(positions)
+    values = hrp1001_df[column].iloc[positions].to_numpy(dtype=row_dtype)
+    return [str(value) for value in values]
+
+
+def check_referential_integrity(hrp1000_df, hrp1001_df, valid_ids=None, row_level=False, skip_missing=True):
+    """Find HRP1001 Source/Target IDs that have no HRP1000 unit, in one pass per column.
+
+    Returns a dict keyed by ID column. Each entry holds:
+      'orphan_rows'  - DataFrame of orphaned rows (excel_row, source_id, target_id, relationship)
+      'orphan_count' - number of orphaned relationships
+      'counts'       - Series orphan ID -> occurrences, in order of first appearance
+      'top_id', 'top_count' - the most frequent orphan ID (first seen wins ties)
+    plus 'orphan_ids': non-empty orphan ID -> the column it is first seen in, in
+    row order (source before target within a row).
+
+    valid_ids defaults to the HRP1000 Object IDs. row_level reads IDs the way
+    iterrows would (with the frame's common row dtype); skip_missing leaves
+    out missing IDs instead of matching them as the strings 'nan'/'None'.
+    """
+    if valid_ids is None:
+        valid_ids = get_valid_unit_ids(hrp1000_df)
+
+    row_dtype = get_row_dtype(hrp1001_df)
+    report = {}
+    first_seen = []
+
+    for offset, column in enumerate(ID_COLUMNS):
+        if column not in hrp1001_df.columns:
+            continue
+
+        codes, texts = get_id_codes(hrp1001_df, column, row_dtype if row_level else None, skip_missing)
+        orphan_codes = ~pd.Series(texts, dtype=object).isin(valid_ids).to_numpy()
+
+        orphan_mask = (codes >= 0) & orphan_codes[codes]
+        positions = np.flatnonzero(orphan_mask)
+
+        orphan_rows = pd.DataFrame({
+            'excel_row': [label + 2 if isinstance(label, (int, np.integer)) else label
+                          for label in hrp1001_df.index[positions]],
+            'source_id': get_context_values(hrp1001_df, 'Source ID', positions, row_dtype),
+            'target_id': get_context_values(hrp1001_df, 'Target object ID', positions, row_dtype),
+            'relationship': get_context_values(hrp1001_df, 'Relationship', positions, row_dtype)
+        })
+
+        # Codes follow first appearance, so grouping the per-code counts by text keeps that order
+        code_counts = pd.Series(np.bincount(codes[positions], minlength=len(texts)), index=texts)
+        counts = code_counts[orphan_codes & (code_counts.to_numpy() > 0)]
+        counts = counts.groupby(level=0, sort=False).sum()
+        report[column] = {
+            'orphan_rows': orphan_rows,
+            'orphan_count': len(positions),
+            'counts': counts,
+            'top_id': counts.idxmax() if len(counts) else None,
+            'top_count': int(counts.max()) if len(counts) else 0
+        }
+
+        # Scan position (row, then source before target) of each orphan ID's first appearance
+        code_positions = np.unique(codes[positions], return_index=True)
+        first_seen.append(pd.DataFrame({
+            'order': positions[code_positions[1]] * len(ID_COLUMNS) + offset,
+            'object_id': texts[code_positions[0]],
+            'column': column
+        }))
+
+    # Orphan IDs in the order a row-by-row scan meets them
+    report['orphan_ids'] = {}
+    if first_seen:
+        scan = pd.concat(first_seen, ignore_index=True).sort_values('order', kind='stable')
+        scan = scan.drop_duplicates('object_id')
+        for object_id, column in zip(scan['object_id'], scan['column']):
+            if object_id:
+                report['orphan_ids'][object_id] = column
+
+    return report
+
+
+def count_id_occurrences(hrp1001_df, object_ids):
+    """How often each ID appears across Source ID and Target object ID (string match)"""
+    totals = pd.Series(0, index=pd.Index(list(object_ids), dtype=object), dtype=np.int64)
+    for column in ID_COLUMNS:
+        if hrp1001_df is not None and column in hrp1001_df.columns:
+            counts = hrp1001_df[column].astype(str).value_counts()
+            totals += counts.reindex(totals.index, fill_value=0).to_numpy()
+    return totals
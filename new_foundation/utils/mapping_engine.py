@@ -0,0 +1,308 @@
+import hashlib
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from utils.transformation_compiler import run_transformation
+from sap_common.column_engine import get_row_dtype, get_column_values, has_column, to_text, reformat_dotted_dates
+
+# Column-at-a-time mapping engine for the foundation Level/Association files.
+# Every mapping row is compiled once into a plan step and evaluated over whole
+# Series, so the output matches the old row-by-row builder cell for cell.
+# Each step has a key hashing everything that decides its output column, so
+# columns of unchanged mapping rows can be reused from an earlier build.
+
+OPERATOR_HEADER = 'Supported operators: Delimit, Clear and Delete'
+
+# Planning status codes used by the 'Lookup Value' transformation
+STATUS_LOOKUP = {
+    '1': 'Active',
+    '2': 'Inactive',
+    '3': 'Planned',
+    '0': 'Deleted',
+    1: 'Active',
+    2: 'Inactive',
+    3: 'Planned',
+    0: 'Deleted'
+}
+
+CUSTOM_CODE_BUILTINS = {
+    'pd': pd,
+    'np': np,
+    'datetime': datetime,
+    'str': str,
+    'int': int,
+    'float': float,
+    'len': len,
+    'abs': abs,
+    'round': round,
+    'hash': hash
+}
+
+
+def build_header_rows(relevant_mappings, file_type):
+    """Build the API field row and the human-readable header row"""
+    api_fields = relevant_mappings['target_column1'].tolist()
+
+    # Special handling for the operator column
+    if file_type == 'Level':
+        api_fields[0] = '[OPERATOR]'
+    elif file_type == 'Association':
+        if 'Operator' in api_fields:
+            idx = api_fields.index('Operator')
+            api_fields[idx] = '[OPERATOR]'
+
+    headers = relevant_mappings['target_column2'].tolist()
+
+    if file_type == 'Level':
+        headers[0] = OPERATOR_HEADER
+    elif file_type == 'Association':
+        if 'Operator' in relevant_mappings['target_column2'].values:
+            idx = relevant_mappings[relevant_mappings['target_column2'] == 'Operator'].index[0]
+            headers[idx] = OPERATOR_HEADER
+
+    return api_fields, headers
+
+
+def get_operator_position(plan):
+    """Column position of a plan's 'Operator' mapping row (None if it has none).
+
+    The [OPERATOR] header a Level file puts over its first column does not
+    count: that column holds mapped data.
+    """
+    if plan is None:
+        return None
+    for i, step in enumerate(plan['steps']):
+        if step['mapping'].get('target_column1') == 'Operator':
+            return i
+    return None
+
+
+def get_operator_header():
+    """The 4 header rows of an [OPERATOR] column added to a file without an Operator mapping"""
+    return [str(value) for value in ('[OPERATOR]', OPERATOR_HEADER, None, None)]
+
+
+def compile_mapping_plan(mappings, file_type):
+    """Resolve the mappings for a file type once into an ordered list of plan steps"""
+    relevant_mappings = mappings[mappings['applies_to'] == file_type].copy()
+
+    if relevant_mappings.empty:
+        return None
+
+    relevant_mappings = relevant_mappings.reset_index(drop=True)
+    api_fields, headers = build_header_rows(relevant_mappings, file_type)
+
+    steps = []
+    for _, mapping in relevant_mappings.iterrows():
+        mapping_dict = mapping.to_dict()
+        steps.append({
+            'source_column': mapping['source_column'],
+            'transformation': mapping['transformation'],
+            'default_value': mapping['default_value'],
+            'secondary_column': mapping_dict.get('secondary_column', ''),
+            'has_custom_code': 'transformation_code' in mapping_dict,
+            'transformation_code': mapping_dict.get('transformation_code'),
+            'mapping': mapping_dict,
+            'label': f"{file_type}: {mapping['target_column1']}"
+        })
+
+    return {
+        'file_type': file_type,
+        'api_fields': api_fields,
+        'headers': headers,
+        'steps': steps
+    }
+
+
+def evaluate_custom_code(values, step, source_df, row_dtype, error=None):
+    """Evaluate a 'Custom Python' expression through the cached transformation compiler"""
+    result = values.copy()
+    null_mask = values.isna()
+    if null_mask.all():
+        return result
+
+    present = values[~null_mask]
+    if not step['has_custom_code']:
+        result[~null_mask] = to_text(present)
+        return result
+
+    custom_code = step['transformation_code']
+    secondary_values = None
+    secondary_column = step['secondary_column']
+    if has_column(source_df, secondary_column):
+        secondary_values = get_column_values(source_df, secondary_column, row_dtype)[~null_mask]
+
+    reported = []
+
+    def report_error(value, e):
+        if error and not reported:
+            error(f"Error executing custom Python code: {str(e)}")
+            error(f"Code: {custom_code}")
+            reported.append(True)
+        return str(value)
+
+    local_values = dict(CUSTOM_CODE_BUILTINS)
+    local_values['secondary_value'] = None
+    transformed = run_transformation(
+        present, custom_code, {"__builtins__": {}}, local_values,
+        label=step['label'], secondary_values=secondary_values, on_error=report_error
+    )
+    result[~null_mask] = transformed.astype(object)
+    return result
+
+
+def evaluate_concatenate(values, step, source_df, row_dtype, warn=None):
+    """Join the primary and secondary column with ' - ', skipping empty sides"""
+    null_mask = values.isna()
+    primary = to_text(values).where(~null_mask, '')
+
+    secondary_column = step['secondary_column']
+    if not has_column(source_df, secondary_column):
+        if warn and len(values):
+            warn(f"Secondary column '{secondary_column}' not found for concatenation")
+        return primary
+
+    secondary_values = get_column_values(source_df, secondary_column, row_dtype)
+    secondary = to_text(secondary_values).where(~secondary_values.isna(), '')
+
+    has_primary = primary != ''
+    has_secondary = secondary != ''
+
+    result = primary.where(has_primary, secondary)
+    both = has_primary & has_secondary
+    if both.any():
+        result[both] = primary[both] + ' - ' + secondary[both]
+    return result.astype(object)
+
+
+def evaluate_transformation(values, step, source_df, row_dtype, warn=None, error=None):
+    """Apply a step's transformation to a whole column of source values"""
+    transformation = step['transformation']
+
+    if transformation == 'Concatenate':
+        return evaluate_concatenate(values, step, source_df, row_dtype, warn)
+
+    if transformation == 'Custom Python':
+        return evaluate_custom_code(values, step, source_df, row_dtype, error)
+
+    null_mask = values.isna()
+    present = values[~null_mask]
+    if present.empty:
+        return values
+
+    if transformation == 'Trim Whitespace':
+        transformed = to_text(present).str.strip()
+    elif transformation == 'Title Case':
+        transformed = to_text(present).str.title()
+    elif transformation == 'UPPERCASE':
+        transformed = to_text(present).str.upper()
+    elif transformation == 'lowercase':
+        transformed = to_text(present).str.lower()
+    elif transformation == 'Lookup Value':
+        transformed = present.map(lambda value: STATUS_LOOKUP.get(value, 'Active'))
+    elif transformation == 'Extract First Word':
+        text = to_text(present)
+        first_words = text.str.split().str[0]
+        transformed = text.where(text.str.strip() == '', first_words)
+    elif transformation == 'Date Format (YYYY-MM-DD)':
+        transformed = reformat_dotted_dates(to_text(present))
+    else:
+        # Unknown transformations return the original value
+        return values
+
+    result = values.copy()
+    result[~null_mask] = transformed.astype(object)
+    return result
+
+
+def evaluate_step(source_df, step, row_dtype, warn=None, error=None):
+    """Evaluate one plan step into a column of output strings"""
+    source_column = step['source_column']
+    transformation = step['transformation']
+    default_value = step['default_value']
+    has_default = bool(default_value)
+
+    # Get values from source, falling back to the default value
+    if has_column(source_df, source_column):
+        values = get_column_values(source_df, source_column, row_dtype)
+    elif has_default:
+        values = pd.Series([default_value] * len(source_df), index=source_df.index, dtype=object)
+    else:
+        values = pd.Series([None] * len(source_df), index=source_df.index, dtype=object)
+
+    if transformation and transformation != 'None':
+        values = evaluate_transformation(values, step, source_df, row_dtype, warn, error)
+
+    # Handle default values for null/empty values
+    null_mask = values.isna()
+    if has_default:
+        empty_mask = null_mask | (values == '')
+        if empty_mask.any():
+            values = values.copy()
+            values[empty_mask] = default_value
+            null_mask = values.isna()
+
+    # Clean string output for Arrow compatibility
+    output = values.where(~null_mask, '')
+    return output.map(str).astype(object).to_numpy()
+
+
+def get_step_key(step):
+    """Hash of the mapping fields that decide a step's output column (not its header rows)"""
+    fields = (
+        step['source_column'], step['transformation'], step['default_value'],
+        step['secondary_column'], step['has_custom_code'], step['transformation_code']
+    )
+    return hashlib.sha256(repr(fields).encode('utf-8')).hexdigest()
+
+
+def report_to(callback, reported):
+    """Wrap a warn/error callback so each message is also collected in reported"""
+    def report(message):
+        reported.append(message)
+        if callback:
+            callback(message)
+    return report
+
+
+def build_output_frame(source_df, plan, warn=None, error=None, reuse=None, reported_steps=None):
+    """Build the output frame: 4 header rows followed by the mapped data rows.
+
+    reuse maps step indexes to already evaluated data columns, which are taken
+    as they are instead of being evaluated again. The indexes of steps that
+    reported a warning or error are added to reported_steps, if given.
+    """
+    if plan is None:
+        return pd.DataFrame()
+
+    api_fields = plan['api_fields']
+    headers = plan['headers']
+    row_dtype = get_row_dtype(source_df)
+
+    columns = {}
+    for i, step in enumerate(plan['steps']):
+        if reuse and i in reuse:
+            data = reuse[i]
+        elif reported_steps is None:
+            data = evaluate_step(source_df, step, row_dtype, warn, error)
+        else:
+            reported = []
+            data = evaluate_step(source_df, step, row_dtype, report_to(warn, reported), report_to(error, reported))
+            if reported:
+                reported_steps.add(i)
+        column = np.empty(len(data) + 4, dtype=object)
+        column[0] = api_fields[i]
+        column[1] = headers[i]
+        column[2] = None
+        column[3] = None
+        column[4:] = data
+        columns[f"Column_{i+1}"] = column
+
+    output_df = pd.DataFrame(columns)
+
+    # Ensure all columns are string type for Arrow compatibility
+    for col in output_df.columns:
+        output_df[col] = output_df[col].astype(str)
+
+    return output_df
@@ -0,0 +1,90 @@
+import os
+import pandas as pd
+
+# Per-process registry of picklist CSVs used by "Lookup Value" mappings.
+# Each picklist is read from disk once and re-read only when its mtime changes;
+# code -> label indexes are built lazily per label column.
+
+PICKLIST_DIR = "picklists"
+
+# Status codes translated before matching against status_mapping.csv
+STATUS_CODE_MAP = {
+    '1': 'ACT',
+    '2': 'INA',
+    '3': 'PND',
+    '0': 'DEL'
+}
+
+_picklist_cache = {}
+
+
+def get_picklist_path(picklist_name):
+    """Return the on-disk path of a picklist"""
+    return os.path.join(PICKLIST_DIR, picklist_name)
+
+
+def load_picklist(picklist_name):
+    """Load a picklist once, reloading it only when the file changes on disk"""
+    if not picklist_name:
+        return None
+
+    path = get_picklist_path(picklist_name)
+    if not os.path.exists(path):
+        _picklist_cache.pop(path, None)
+        return None
+
+    mtime = os.path.getmtime(path)
+    entry = _picklist_cache.get(path)
+    if entry is None or entry['mtime'] != mtime:
+        entry = {
+            'mtime': mtime,
+            'data': pd.read_csv(path),
+            'indexes': {}
+        }
+        _picklist_cache[path] = entry
+
+    return entry
+
+
+def get_picklist_index(picklist_name, picklist_column=""):
+    """Return the status_code -> label hash index for a picklist (first match wins)"""
+    entry = load_picklist(picklist_name)
+    if entry is None:
+        return None
+
+    picklist = entry['data']
+    label_column = picklist_column if picklist_column and picklist_column in picklist.columns else 'status_label'
+
+    index = entry['indexes'].get(label_column)
+    if index is None:
+        codes = picklist['status_code']
+        first_rows = ~codes.duplicated(keep='first')
+        index = dict(zip(codes[first_rows].tolist(), picklist[label_column][first_rows].tolist()))
+        entry['indexes'][label_column] = index
+
+    return index
+
+
+def lookup_series(values, picklist_name, picklist_column="", default=""):
+    """Look up a whole column of values in a picklist with a single Series.map"""
+    try:
+        index = get_picklist_index(picklist_name, picklist_column)
+        if index is None:
+            return pd.Series(default, index=values.index, dtype=object)
+
+        keys = values.map(str).astype(object)
+        if picklist_name == "status_mapping.csv":
+            keys = keys.map(lambda key: STATUS_CODE_MAP.get(key, key))
+
+        found = keys.isin(list(index.keys()))
+        labels = keys.map(index).astype(object)
+        labels[~found] = default
+        return labels
+    except Exception as e:
+        print(f"Picklist lookup error: {e}")
+        return pd.Series(default, index=values.index, dtype=object)
+
+
+def clear_picklist_cache():
+    """Drop all cached picklists"""
+    _picklist_cache.clear()
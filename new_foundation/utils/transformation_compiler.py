@@ -0,0 +1,254 @@
+import ast
+import time
+import pandas as pd
+
+# Compiler for mapping transformation_code expressions.
+# Each expression is parsed once and cached. Simple string expressions
+# (value.upper(), str(value).strip(), value[:3], 'X' + value, ...) become
+# pandas string operations over the whole column; anything else runs as a
+# precompiled code object per row. Per-mapping timings are recorded so slow
+# expressions can be spotted in the hierarchy panel.
+
+# str methods planned onto the pandas .str accessor, with their allowed constant arguments
+VECTOR_STRING_METHODS = {
+    'upper': (),
+    'lower': (),
+    'title': (),
+    'capitalize': (),
+    'swapcase': (),
+    'strip': (str,),
+    'lstrip': (str,),
+    'rstrip': (str,),
+    'zfill': (int,),
+    'replace': (str, str)
+}
+
+_compiled_cache = {}
+_transformation_timings = {}
+
+_NOT_CONSTANT = object()
+
+
+class CompiledTransformation:
+    """A transformation_code expression parsed once, with an optional vectorized form"""
+
+    def __init__(self, code):
+        self.code = code
+        self.code_object = None
+        self.compile_error = None
+        self.vector_fn = None
+        self.needs_text_input = False
+
+        if not isinstance(code, str):
+            # Same failure eval() would raise for a missing (NaN) code
+            self.compile_error = TypeError("eval() arg 1 must be a string, bytes or code object")
+            return
+
+        try:
+            tree = ast.parse(code, mode='eval')
+            self.code_object = compile(tree, '<transformation_code>', 'eval')
+        except Exception as e:
+            self.compile_error = e
+            return
+
+        plan = plan_expression(tree.body)
+        if plan is not None:
+            self.vector_fn, self.needs_text_input = plan
+
+    @property
+    def is_vectorized(self):
+        return self.vector_fn is not None
+
+    def can_vectorize(self, values):
+        """Plans that use bare `value` as a string need every value to be a string"""
+        if self.vector_fn is None:
+            return False
+        if not self.needs_text_input:
+            return True
+        return pd.api.types.infer_dtype(values, skipna=False) in ('string', 'empty')
+
+    def run_row(self, namespace, local_values):
+        """Evaluate the precompiled code object for a single value"""
+        if self.code_object is None:
+            raise self.compile_error
+        return eval(self.code_object, namespace, local_values)
+
+
+def get_compiled_transformation(code):
+    """Return the cached compiled form of a transformation_code expression"""
+    if not isinstance(code, str):
+        return CompiledTransformation(code)
+
+    compiled = _compiled_cache.get(code)
+    if compiled is None:
+        compiled = CompiledTransformation(code)
+        _compiled_cache[code] = compiled
+    return compiled
+
+
+def to_object(series):
+    """Keep string results in object dtype so .str methods keep Python semantics"""
+    return series.astype(object)
+
+
+def get_constant(node):
+    """Return the value of a str/int literal node, or _NOT_CONSTANT"""
+    if isinstance(node, ast.Constant) and type(node.value) in (str, int):
+        return node.value
+    if (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub)
+            and isinstance(node.operand, ast.Constant) and type(node.operand.value) is int):
+        return -node.operand.value
+    return _NOT_CONSTANT
+
+
+def plan_expression(node):
+    """Translate an expression into (Series -> Series function, needs_text_input), or None"""
+    if isinstance(node, ast.Name) and node.id == 'value':
+        return (lambda values: values), False
+    return plan_text(node)
+
+
+def plan_text(node):
+    """Plan an expression that produces a string for every value"""
+    # str(value)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'str'
+            and len(node.args) == 1 and not node.keywords
+            and isinstance(node.args[0], ast.Name) and node.args[0].id == 'value'):
+        return (lambda values: to_object(values.map(str))), False
+
+    # Bare value used as a string
+    if isinstance(node, ast.Name) and node.id == 'value':
+        return (lambda values: values), True
+
+    # Method calls such as value.upper() or str(value).strip()
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and not node.keywords:
+        method = node.func.attr
+        arg_types = VECTOR_STRING_METHODS.get(method)
+        if arg_types is None:
+            return None
+        args = [get_constant(arg) for arg in node.args]
+        if method in ('strip', 'lstrip', 'rstrip'):
+            arg_types = arg_types[:len(args)]
+        if len(args) != len(arg_types) or any(type(arg) is not kind for arg, kind in zip(args, arg_types)):
+            return None
+        inner = plan_text(node.func.value)
+        if inner is None:
+            return None
+        inner_fn, needs_text = inner
+        if method == 'replace':
+            return (lambda values: to_object(inner_fn(values).str.replace(args[0], args[1], regex=False))), needs_text
+        return (lambda values: to_object(getattr(inner_fn(values).str, method)(*args))), needs_text
+
+    # Slices such as value[:3] or value[-4:]
+    if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+        bounds = [get_constant(part) if part is not None else None
+                  for part in (node.slice.lower, node.slice.upper, node.slice.step)]
+        if any(bound is not None and type(bound) is not int for bound in bounds):
+            return None
+        inner = plan_text(node.value)
+        if inner is None:
+            return None
+        inner_fn, needs_text = inner
+        start, stop, step = bounds
+        return (lambda values: to_object(inner_fn(values).str.slice(start, stop, step))), needs_text
+
+    # Concatenation of string expressions and string literals
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left = plan_operand(node.left)
+        right = plan_operand(node.right)
+        if left is None or right is None or (isinstance(left, str) and isinstance(right, str)):
+            return None
+        needs_text = any(not isinstance(part, str) and part[1] for part in (left, right))
+
+        def concatenate(values):
+            left_part = left if isinstance(left, str) else left[0](values)
+            right_part = right if isinstance(right, str) else right[0](values)
+            return to_object(left_part + right_part)
+
+        return concatenate, needs_text
+
+    return None
+
+
+def plan_operand(node):
+    """Plan one side of a concatenation: a string literal or a planned string expression"""
+    constant = get_constant(node)
+    if isinstance(constant, str):
+        return constant
+    if constant is not _NOT_CONSTANT:
+        return None
+    return plan_text(node)
+
+
+def record_transformation_timing(label, code, mode, rows, seconds, calls=1):
+    """Accumulate timing for one mapping's transformation"""
+    entry = _transformation_timings.setdefault(label, {
+        'mapping': label,
+        'transformation_code': code,
+        'mode': mode,
+        'calls': 0,
+        'rows': 0,
+        'total_seconds': 0.0
+    })
+    entry['transformation_code'] = code
+    entry['mode'] = mode
+    entry['calls'] += calls
+    entry['rows'] += rows
+    entry['total_seconds'] += seconds
+
+
+def get_transformation_timings():
+    """Return recorded per-mapping timings, slowest first"""
+    columns = ['mapping', 'transformation_code', 'mode', 'calls', 'rows', 'total_seconds', 'ms_per_1k_rows']
+    if not _transformation_timings:
+        return pd.DataFrame(columns=columns)
+    timings = pd.DataFrame(list(_transformation_timings.values()))
+    timings['ms_per_1k_rows'] = timings['total_seconds'] * 1e6 / timings['rows'].clip(lower=1)
+    return timings.sort_values('total_seconds', ascending=False).reset_index(drop=True)[columns]
+
+
+def clear_transformation_timings():
+    """Reset the recorded per-mapping timings"""
+    _transformation_timings.clear()
+
+
+def run_transformation(values, code, namespace, local_values=None, label=None,
+                       secondary_values=None, on_error=None):
+    """Apply a transformation_code expression to an object Series.
+
+    Runs the vectorized plan when the expression and data allow it, otherwise
+    evaluates the precompiled code object per value with `value` (and
+    `secondary_value`) bound on top of local_values. on_error(value, error)
+    supplies the result for values whose evaluation raises.
+    """
+    compiled = get_compiled_transformation(code)
+    started = time.perf_counter()
+    result = None
+    mode = 'vectorized'
+
+    if secondary_values is None and compiled.can_vectorize(values):
+        try:
+            result = compiled.vector_fn(values)
+        except Exception:
+            result = None
+
+    if result is None:
+        mode = 'row'
+        base_locals = dict(local_values or {})
+        secondary_list = secondary_values.tolist() if secondary_values is not None else None
+        results = []
+        for position, value in enumerate(values.tolist()):
+            row_locals = dict(base_locals)
+            row_locals['value'] = value
+            if secondary_list is not None:
+                row_locals['secondary_value'] = secondary_list[position]
+            try:
+                results.append(compiled.run_row(namespace, row_locals))
+            except Exception as e:
+                results.append(on_error(value, e) if on_error else value)
+        result = pd.Series(results, index=values.index, dtype=object)
+
+    if label is not None:
+        record_transformation_timing(label, code, mode, len(values), time.perf_counter() - started)
+
+    return result
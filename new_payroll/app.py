@@ -1,6 +1,9 @@
 import streamlit as st
+import os
 import sys
 sys.path.append('payroll_panels')
+# Repository root, for the shared sap_common package
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import payroll panel functions
 from payroll_main_panel import show_payroll_panel
@@ -8,6 +11,7 @@ from payroll_statistics_panel import show_payroll_statistics_panel
 from payroll_validation_panel import show_payroll_validation_panel
 from payroll_dashboard_panel import show_payroll_dashboard_panel
 from payroll_admin_panel import show_payroll_admin_panel
+from sap_common.session_memory import SessionMemoryManager
 
 # Configure Streamlit for better performance
 st.set_page_config(
@@ -17,9 +21,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state
+# Initialize session state (source/merged/generated frames are kept within the session memory budget)
 if 'payroll_state' not in st.session_state:
-    st.session_state.payroll_state = {}
+    st.session_state.payroll_state = SessionMemoryManager()
 
 payroll_state = st.session_state.payroll_state
 
@@ -8,6 +8,7 @@ import json
 import psutil
 import os
 from collections import defaultdict
+from sap_common.session_memory import get_frame_summary, get_session_memory_report, get_session_memory_totals
 
 def get_system_performance():
     """Get simple system performance metrics"""
@@ -43,52 +44,36 @@ def analyze_payroll_data_size_and_performance(state):
         # Analyze payroll source files
         source_files = ['PA0008', 'PA0014']
         
+        # Sizes come from the session memory manager, so spilled frames are not reloaded
         for file_key in source_files:
-            source_data = state.get(f'source_{file_key.lower()}')
-            if source_data is not None and not source_data.empty:
-                try:
-                    size_mb = source_data.memory_usage(deep=True).sum() / 1024 / 1024
-                    analysis['file_sizes'][file_key] = {
-                        'size_mb': round(size_mb, 1),
-                        'rows': len(source_data),
-                        'columns': len(source_data.columns)
-                    }
-                    analysis['total_data_size_mb'] += size_mb
-                except:
-                    analysis['file_sizes'][file_key] = {
-                        'size_mb': 0,
-                        'rows': 0,
-                        'columns': 0
-                    }
+            summary = get_frame_summary(state, f'source_{file_key.lower()}')
+            if summary is not None and summary['rows'] > 0:
+                analysis['file_sizes'][file_key] = {
+                    'size_mb': round(summary['size_mb'], 1),
+                    'rows': summary['rows'],
+                    'columns': summary['columns']
+                }
+                analysis['total_data_size_mb'] += summary['size_mb']
         
         # Analyze merged payroll data if available
-        merged_data = state.get('merged_payroll_data')
-        if merged_data is not None and not merged_data.empty:
-            try:
-                merged_size_mb = merged_data.memory_usage(deep=True).sum() / 1024 / 1024
-                analysis['file_sizes']['Merged Payroll Data'] = {
-                    'size_mb': round(merged_size_mb, 1),
-                    'rows': len(merged_data),
-                    'columns': len(merged_data.columns)
-                }
-                analysis['total_data_size_mb'] += merged_size_mb
-            except:
-                pass
+        merged_summary = get_frame_summary(state, 'merged_payroll_data')
+        if merged_summary is not None and merged_summary['rows'] > 0:
+            analysis['file_sizes']['Merged Payroll Data'] = {
+                'size_mb': round(merged_summary['size_mb'], 1),
+                'rows': merged_summary['rows'],
+                'columns': merged_summary['columns']
+            }
+            analysis['total_data_size_mb'] += merged_summary['size_mb']
         
         # Analyze payroll output files
-        output_files = state.get('generated_payroll_files', {})
-        if output_files and 'payroll_data' in output_files:
-            try:
-                output_data = output_files['payroll_data']
-                output_size_mb = output_data.memory_usage(deep=True).sum() / 1024 / 1024
-                analysis['file_sizes']['Payroll Output'] = {
-                    'size_mb': round(output_size_mb, 1),
-                    'rows': len(output_data),
-                    'columns': len(output_data.columns)
-                }
-                analysis['total_data_size_mb'] += output_size_mb
-            except:
-                pass
+        output_summary = get_frame_summary(state, 'generated_payroll_files')
+        if output_summary is not None:
+            analysis['file_sizes']['Payroll Output'] = {
+                'size_mb': round(output_summary['size_mb'], 1),
+                'rows': output_summary['rows'],
+                'columns': output_summary['columns']
+            }
+            analysis['total_data_size_mb'] += output_summary['size_mb']
         
         analysis['total_data_size_mb'] = round(analysis['total_data_size_mb'], 1)
         
@@ -307,6 +292,31 @@ def create_payroll_processing_timeline(state):
     
     return timeline_steps
 
+def show_session_memory(state):
+    """Per-key memory of the data frames held in this session"""
+    st.subheader("🧠 Session Memory")
+    
+    report = get_session_memory_report(state)
+    if report.empty:
+        st.info("No data frames stored in this session yet")
+        return
+    
+    totals = get_session_memory_totals(state)
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("In Memory", f"{totals['memory_mb']:.1f} MB", help="Data frames currently held in memory by this session")
+    
+    with col2:
+        st.metric("Spilled to Disk", f"{totals['spilled_mb']:.1f} MB", help="Least recently used frames moved to disk; they reload when next used")
+    
+    with col3:
+        budget = f"{totals['budget_mb']:.0f} MB" if totals['budget_mb'] else "Not set"
+        st.metric("Session Budget", budget)
+    
+    st.dataframe(report, use_container_width=True)
+    st.caption(f"{totals['spill_count']} spills and {totals['reload_count']} reloads this session")
+
 def show_payroll_dashboard_panel(state):
     """Comprehensive payroll dashboard for monitoring system performance and data health"""
     
@@ -497,6 +507,9 @@ def show_payroll_dashboard_panel(state):
         st.warning("No payroll data files loaded yet")
         st.info("**What to do:** Go to Payroll panel → Upload your PA files → Return here to monitor performance")
     
+    # Per-key session memory
+    show_session_memory(state)
+    
     # Quick Actions
     st.subheader("⚡ Quick Actions")
     
@@ -504,7 +517,7 @@ def show_payroll_dashboard_panel(state):
     
     with col1:
         if st.button("🧹 Clear Payroll Cache", help="Free up memory by clearing cached payroll data"):
-            keys_to_clear = ['merged_payroll_data', 'payroll_merge_stats']
+            keys_to_clear = ['merged_payroll_data', 'payroll_merge_stats', 'merged_payroll_fingerprints', 'merged_payroll_prefix', 'merged_payroll_unique']
             cleared_count = 0
             
             for key in keys_to_clear:
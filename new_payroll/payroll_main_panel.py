@@ -7,56 +7,94 @@ import io
 from openpyxl import Workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 import traceback
-
-# Performance optimization with caching
-@st.cache_data(ttl=600)  # Cache for 10 minutes
-def merge_payroll_files_cached(pa0008_hash, pa0014_hash):
-    """Cache merged payroll files to avoid re-processing"""
-    return None  # Placeholder for cache key
+from sap_common.streaming_reader import read_uploaded_file, compact_output_frame
+from sap_common.delta_engine import hash_rows, get_delta_counts, build_delta_frame
+from sap_common.fingerprint import get_frame_fingerprint, get_unique_rows
+from payroll_output_engine import (
+    PAYROLL_TARGET_COLUMNS, PAYROLL_CHUNK_ROWS, build_payroll_column_plan, build_payroll_output,
+    get_cached_columns, get_cached_rows, build_column_cache
+)
 
 def is_dataframe_available(df):
     """Check if DataFrame is available and not empty"""
     return df is not None and isinstance(df, pd.DataFrame) and not df.empty
 
+# Payroll files joined onto PA0008, in merge order
+PAYROLL_MERGE_ORDER = ['PA0014']
+
 def get_or_create_merged_payroll_data(state):
-    """Get merged payroll data from cache or create it - OPTIMIZED"""
-    
-    # Check if we already have merged data in session state
-    if 'merged_payroll_data' in state:
-        cached_data = state['merged_payroll_data']
-        if is_dataframe_available(cached_data):
-            return cached_data
+    """Get merged payroll data from cache or create it - memoized on per-file fingerprints"""
     
     # Get source files
     pa0008 = state.get('source_pa0008')  # Wage types
-    pa0014 = state.get('source_pa0014')  # Recurring payments/deductions
+    pa_files = {file_key: state.get(f'source_{file_key.lower()}') for file_key in PAYROLL_MERGE_ORDER}
     
     if not is_dataframe_available(pa0008):
         return None
     
-    with st.spinner("🔄 Merging payroll files (one-time setup)..."):
-        # Start with PA0008 as base (wage types)
-        merged_data = pa0008.copy()
-        
-        # Merge PA0014 if available
-        merge_stats = {'PA0008': len(merged_data)}
-        
-        if is_dataframe_available(pa0014) and 'Pers.No.' in pa0014.columns:
-            # Only keep first record per employee per wage type to prevent duplicates
-            pa0014_unique = pa0014.drop_duplicates(subset=['Pers.No.'], keep='first')
-            st.write(f"✅ Merged PA0014: {len(pa0014):,} records → {len(pa0014_unique):,} unique employees")
+    # A file only takes part in the merge if it is loaded and has the key column
+    fingerprints = [('PA0008', get_frame_fingerprint(pa0008))]
+    for file_key in PAYROLL_MERGE_ORDER:
+        file_df = pa_files[file_key]
+        mergeable = is_dataframe_available(file_df) and 'Pers.No.' in file_df.columns
+        fingerprints.append((file_key, get_frame_fingerprint(file_df) if mergeable else None))
+    
+    # Reuse the merged data while none of the source files changed
+    if 'merged_payroll_data' in state and state.get('merged_payroll_fingerprints') == fingerprints:
+        cached_data = state['merged_payroll_data']
+        if is_dataframe_available(cached_data):
+            return cached_data
+    
+    # Only the join chain up to its last join is kept (under a managed key):
+    # replacing only the last file redoes just that join
+    merge_prefix = state.get('merged_payroll_prefix')
+    # Each joined file's first record per employee is kept per file fingerprint (also under a managed key):
+    # replacing one file (e.g. PA0014) deduplicates just that file again
+    unique_rows = dict(state.get('merged_payroll_unique') or {})
+    joins = [
+        (step, file_key) for step, (file_key, fingerprint) in enumerate(fingerprints[1:], start=1)
+        if fingerprint is not None
+    ]
+    
+    with st.spinner("🔄 Merging payroll files..."):
+        merge_stats = {'PA0008': len(pa0008)}
+        merged_data = pa0008
+        start = 0
+        if len(joins) > 1 and isinstance(merge_prefix, dict) and merge_prefix.get('key') == fingerprints[:joins[-2][0] + 1]:
+            merged_data = merge_prefix['data']
+            merge_stats.update(merge_prefix['stats'])
+            start = len(joins) - 1
+        
+        for position in range(start, len(joins)):
+            step, file_key = joins[position]
+            file_df = pa_files[file_key]
             
+            # Only keep first record per employee per wage type to prevent duplicates
+            file_df_unique = get_unique_rows(unique_rows, file_key, file_df, fingerprints[step][1], 'Pers.No.')
+            merge_stats[file_key] = len(file_df_unique)
+            st.write(f"✅ Merged {file_key}: {len(file_df):,} records → {len(file_df_unique):,} unique employees")
             merged_data = merged_data.merge(
-                pa0014_unique, 
+                file_df_unique, 
                 on='Pers.No.', 
                 how='left', 
-                suffixes=('', '_PA0014')
+                suffixes=('', f'_{file_key}')
             )
-            
-            merge_stats['PA0014'] = len(pa0014_unique)
+            if position == len(joins) - 2:
+                state['merged_payroll_prefix'] = {
+                    'key': fingerprints[:step + 1], 'data': merged_data, 'stats': dict(merge_stats)
+                }
+        
+        if len(joins) < 2 and 'merged_payroll_prefix' in state:
+            del state['merged_payroll_prefix']
+        state['merged_payroll_unique'] = {
+            file_key: unique_rows[file_key] for _, file_key in joins if file_key in unique_rows
+        }
+        if not joins:
+            merged_data = pa0008.copy()
         
         # Cache the merged data in session state
         state['merged_payroll_data'] = merged_data
+        state['merged_payroll_fingerprints'] = fingerprints
         state['payroll_merge_stats'] = merge_stats
         
         st.success(f"🎉 Merged payroll data cached: {len(merged_data):,} records ready for processing")
@@ -226,7 +264,7 @@ def apply_payroll_transformation(value, transformation, mapping_config=None, sou
     else:
         return value
 
-def create_payroll_output_dataframe_optimized(merged_data, mappings, max_rows=None):
+def create_payroll_output_dataframe_optimized(merged_data, mappings, max_rows=None, reuse=None):
     """Create payroll output DataFrame - OPTIMIZED with row limiting"""
     
     if not is_dataframe_available(mappings) or not is_dataframe_available(merged_data):
@@ -239,66 +277,11 @@ def create_payroll_output_dataframe_optimized(merged_data, mappings, max_rows=No
     else:
         process_data = merged_data
     
-    # Create output data structure
-    output_data = []
-    
-    # Standard payroll fields
-    target_columns = [
-        'EMPLOYEE_ID', 'WAGE_TYPE', 'AMOUNT', 'CURRENCY', 'PAY_PERIOD', 
-        'PAYMENT_DATE', 'RECURRING_AMOUNT', 'DEDUCTION_TYPE', 'STATUS', 'COST_CENTER'
-    ]
+    # Resolve each target column's mapping once, then build whole columns at a time
+    plan = build_payroll_column_plan(mappings, PAYROLL_TARGET_COLUMNS)
     
-    # Process each payroll record
-    for _, source_row in process_data.iterrows():
-        payroll_record = {}
-        
-        # Apply mappings for each target column
-        for target_col in target_columns:
-            mapping = mappings[mappings['target_column'] == target_col]
-            
-            if not mapping.empty:
-                mapping_row = mapping.iloc[0]
-                source_column = mapping_row.get('source_column')
-                transformation = mapping_row.get('transformation', 'None')
-                default_value = mapping_row.get('default_value')
-                
-                # Get value from source
-                value = None
-                if source_column and source_column in source_row.index:
-                    value = source_row[source_column]
-                elif default_value:
-                    value = default_value
-                
-                # Apply transformation
-                if transformation and transformation != 'None':
-                    mapping_dict = mapping_row.to_dict()
-                    value = apply_payroll_transformation(value, transformation, mapping_dict, source_row, process_data)
-                
-                # Handle default values
-                if (pd.isna(value) or value is None or value == '') and default_value:
-                    value = default_value
-                
-                # Clean data
-                if pd.isna(value) or value is None:
-                    value = ""
-                else:
-                    value = str(value)
-                
-                payroll_record[target_col] = value
-            else:
-                payroll_record[target_col] = ""
-        
-        output_data.append(payroll_record)
-    
-    # Create DataFrame
-    output_df = pd.DataFrame(output_data)
-    
-    # Ensure all target columns exist
-    for col in target_columns:
-        if col not in output_df.columns:
-            output_df[col] = ""
-    
-    return output_df[target_columns]
+    # Multi-million-row extracts are evaluated chunk by chunk to cap the intermediate copies
+    return build_payroll_output(process_data, plan, PAYROLL_TARGET_COLUMNS, reuse=reuse, chunk_size=PAYROLL_CHUNK_ROWS)
 
 def generate_fast_payroll_preview(state, preview_rows=10):
     """Generate fast preview by processing only first N payroll records"""
@@ -343,16 +326,40 @@ def process_payroll_files_full(state):
         # Load mapping configuration
         mapping_config = load_payroll_mapping_configuration(state)
         
+        # Target columns whose mapping and merged data are unchanged are reused from the last generation;
+        # for a new extract only its inserted and changed rows are mapped again
+        column_cache = state.get('generated_payroll_column_cache')
+        fingerprint = get_frame_fingerprint(merged_data)
+        row_hashes = hash_rows(merged_data, 'PA0008')
+        plan = build_payroll_column_plan(mapping_config, PAYROLL_TARGET_COLUMNS) if is_dataframe_available(mapping_config) else {}
+        reuse = get_cached_columns(column_cache, fingerprint, plan, PAYROLL_TARGET_COLUMNS)
+        row_reuse, delta = get_cached_rows(column_cache, fingerprint, merged_data, row_hashes, plan, PAYROLL_TARGET_COLUMNS)
+        reuse.update(row_reuse)
+        
         # Process ALL payroll records for final output
-        output_df = create_payroll_output_dataframe_optimized(merged_data, mapping_config)
+        output_df = create_payroll_output_dataframe_optimized(merged_data, mapping_config, reuse=reuse)
         
         if not is_dataframe_available(output_df):
             return None, "Failed to create payroll output"
         
+        # Kept in session state, so store it compacted (categoricals / Arrow-backed strings)
+        output_df = compact_output_frame(output_df)
+        state['generated_payroll_column_cache'] = build_column_cache(fingerprint, plan, output_df, PAYROLL_TARGET_COLUMNS, row_hashes)
+        
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"payroll_{timestamp}.csv"
         
+        # Delta mode: only the inserted and changed records since the last generation
+        if state.get('delta_mode') and delta is not None:
+            state['generated_payroll_delta'] = {
+                'data': compact_output_frame(build_delta_frame(output_df, column_cache['data'], delta)),
+                'counts': get_delta_counts(delta),
+                'filename': f"payroll_delta_{timestamp}.csv"
+            }
+        elif 'generated_payroll_delta' in state:
+            del state['generated_payroll_delta']
+        
         return output_df, filename
         
     except Exception as e:
@@ -361,7 +368,7 @@ def process_payroll_files_full(state):
 
 def clear_cached_payroll_data(state):
     """Clear cached payroll data to free memory"""
-    keys_to_clear = ['merged_payroll_data', 'payroll_merge_stats']
+    keys_to_clear = ['merged_payroll_data', 'payroll_merge_stats', 'merged_payroll_fingerprints', 'merged_payroll_prefix', 'merged_payroll_unique']
     cleared_count = 0
     
     for key in keys_to_clear:
@@ -404,6 +411,29 @@ def show_enhanced_payroll_preview(df, max_rows=10):
         completion_df = pd.DataFrame(completion_data)
         st.dataframe(completion_df, use_container_width=True)
 
+def show_payroll_delta_download(state, key):
+    """Download button for the delta-only file built in delta mode"""
+    delta_file = state.get('generated_payroll_delta')
+    if not delta_file:
+        return
+    
+    counts = delta_file['counts']
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        st.info(f"**{delta_file['filename']}** - {counts['inserted']:,} inserted and {counts['changed']:,} changed payroll records since the last generation")
+        if counts['deleted']:
+            st.caption(f"{counts['deleted']:,} payroll records of the last generation are no longer in the extract and are marked DELETE in the [OPERATOR] column")
+    
+    with col2:
+        st.download_button(
+            label="📥 Download Delta CSV",
+            data=delta_file['data'].to_csv(index=False),
+            file_name=delta_file['filename'],
+            mime="text/csv",
+            key=key
+        )
+
 def show_payroll_panel(state):
     """OPTIMIZED payroll panel with fast preview, caching, and complete upload functionality"""
     
@@ -512,10 +542,7 @@ def show_payroll_panel(state):
                                     continue
                                 
                                 # Read file
-                                if file.name.endswith('.csv'):
-                                    df = pd.read_csv(file)
-                                else:
-                                    df = pd.read_excel(file)
+                                df = read_uploaded_file(file)
                                 
                                 # Basic validation
                                 if 'Pers.No.' not in df.columns:
@@ -543,8 +570,9 @@ def show_payroll_panel(state):
                 for file_key in ['PA0008', 'PA0014']:
                     if f'source_{file_key.lower()}' in state:
                         del state[f'source_{file_key.lower()}']
-                if 'generated_payroll_files' in state:
-                    del state['generated_payroll_files']
+                for key in ['generated_payroll_files', 'generated_payroll_delta']:
+                    if key in state:
+                        del state[key]
                 # Clear cached data too
                 clear_cached_payroll_data(state)
                 st.success("All payroll data cleared!")
@@ -636,14 +664,25 @@ def show_payroll_panel(state):
                 type="primary"
             )
         
+        show_payroll_delta_download(state, key="download_payroll_file_delta")
+        
         if st.button("🔄 Generate New Payroll File", help="Create fresh payroll file"):
             if 'generated_payroll_files' in state:
                 del state['generated_payroll_files']
+            if 'generated_payroll_delta' in state:
+                del state['generated_payroll_delta']
             st.rerun()
     
     else:
         st.info("**Generate your complete payroll.csv file with all payroll records**")
         
+        state['delta_mode'] = st.checkbox(
+            "Delta mode",
+            value=state.get('delta_mode', False),
+            key="payroll_delta_mode",
+            help="When a new extract of the payroll PA files is uploaded, also build a file with only the inserted and changed payroll records"
+        )
+        
         if st.button("🚀 Generate Full Payroll File", type="primary", key="generate_full_payroll"):
             start_time = datetime.now()
             
@@ -678,6 +717,8 @@ def show_payroll_panel(state):
                         key="download_new_payroll",
                         type="primary"
                     )
+                
+                show_payroll_delta_download(state, key="download_new_payroll_delta")
             else:
                 st.error(f"Payroll generation failed: {filename}")
     
@@ -0,0 +1,203 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.0
+    guess_datetime_format = None
+
+from sap_common import column_engine
+from sap_common.column_engine import get_row_dtype, get_column_values, has_column, to_text
+
+# Columnar builder for the payroll (PA0008/PA0014) output file.
+# Each target column's mapping is resolved once and applied to whole columns:
+# pd.to_numeric for amounts, pd.to_datetime with the format pandas would infer
+# for each distinct date string, and one map for status codes. Large extracts
+# are evaluated in row chunks written into one preallocated object array per
+# target column, so intermediate copies only ever cover one chunk. Output
+# matches the old per-row builder cell for cell. Columns whose
+# mapping and merged data are unchanged can be reused from a cached output;
+# for a new extract, only its inserted and changed rows are evaluated again.
+
+PAYROLL_TARGET_COLUMNS = [
+    'EMPLOYEE_ID', 'WAGE_TYPE', 'AMOUNT', 'CURRENCY', 'PAY_PERIOD',
+    'PAYMENT_DATE', 'RECURRING_AMOUNT', 'DEDUCTION_TYPE', 'STATUS', 'COST_CENTER'
+]
+
+PAYROLL_STATUS_MAP = {'1': 'Processed', '2': 'Pending', '3': 'Cancelled', '0': 'Draft'}
+
+# Rows per chunk when building output for very large extracts
+PAYROLL_CHUNK_ROWS = 250000
+
+
+def build_payroll_column_plan(mappings, target_columns=None):
+    """Resolve the first mapping for every target column once"""
+    return column_engine.build_column_plan(mappings, target_columns or PAYROLL_TARGET_COLUMNS)
+
+
+def format_amounts(text):
+    """Strip thousands separators and format as 2-decimal amounts; unparseable -> 0.00"""
+    cleaned = text.str.replace(',', '', regex=False)
+    numbers = pd.to_numeric(cleaned, errors='coerce')
+    result = numbers.map(lambda number: f"{number:.2f}").astype(object)
+
+    # Python's float() accepts a few spellings to_numeric does not (and literal 'nan')
+    unparsed = numbers.isna()
+    if unparsed.any():
+        def parse_float(value_str):
+            try:
+                return f"{float(value_str):.2f}"
+            except (TypeError, ValueError):
+                return "0.00"
+        result[unparsed] = cleaned[unparsed].map(parse_float).astype(object)
+
+    return result
+
+
+def parse_dates_by_format(text, date_format):
+    """Reformat date strings, parsing distinct values grouped by their inferred format.
+
+    Every distinct string is parsed the way pd.to_datetime(value) would: with
+    the format pandas guesses for it, or by the generic parser when no format
+    can be guessed. Unparseable values are returned unchanged.
+    """
+    distinct = pd.unique(text.to_numpy(dtype=object))
+    formatted = {}
+
+    groups = {}
+    with warnings.catch_warnings():
+        # guess_datetime_format warns on ambiguous day/month order; the row builder never surfaced it
+        warnings.simplefilter('ignore')
+        for value in distinct:
+            guessed = guess_datetime_format(value) if guess_datetime_format else None
+            groups.setdefault(guessed, []).append(value)
+
+    for explicit_format, values in groups.items():
+        if explicit_format is None:
+            parsed = [pd.to_datetime(value, errors='coerce') for value in values]
+        else:
+            parsed = pd.to_datetime(pd.Series(values, dtype=object), format=explicit_format, errors='coerce').tolist()
+        for value, date_obj in zip(values, parsed):
+            formatted[value] = date_obj.strftime(date_format) if not pd.isna(date_obj) else value
+
+    return text.map(formatted).astype(object)
+
+
+def reformat_german_and_us_dates(text):
+    """dd.mm.yyyy -> yyyy-mm-dd, mm/dd/yyyy via pd.to_datetime; everything else untouched"""
+    return column_engine.reformat_german_and_us_dates(text, parse_dates_by_format)
+
+
+def transform_payroll_column(values, step):
+    """Apply one mapping's transformation to a whole column"""
+    transformation = step['transformation']
+
+    null_mask = values.isna()
+    present = values[~null_mask]
+    if present.empty:
+        return values
+
+    if transformation == 'Title Case':
+        transformed = to_text(present).str.title()
+    elif transformation == 'UPPERCASE':
+        transformed = to_text(present).str.upper()
+    elif transformation == 'lowercase':
+        transformed = to_text(present).str.lower()
+    elif transformation == 'Trim Whitespace':
+        transformed = to_text(present).str.strip()
+    elif transformation == 'Number Format':
+        transformed = format_amounts(to_text(present))
+    elif transformation == 'Date Format (YYYY-MM-DD)':
+        transformed = reformat_german_and_us_dates(to_text(present))
+    elif transformation == 'Date Format (YYYY-MM)':
+        transformed = parse_dates_by_format(to_text(present), '%Y-%m')
+    elif transformation == 'Status Mapping':
+        fallback = step['mapping'].get('default_value', 'Pending')
+        transformed = to_text(present).map(lambda code: PAYROLL_STATUS_MAP.get(code, fallback))
+    else:
+        return values
+
+    result = values.copy()
+    result[~null_mask] = transformed.astype(object)
+    return result
+
+
+def evaluate_payroll_column(data, step, row_dtype):
+    """Evaluate one target column into an object array of output strings"""
+    if step is None:
+        return np.full(len(data), "", dtype=object)
+
+    source_column = step['source_column']
+    transformation = step['transformation']
+    default_value = step['default_value']
+    has_default = bool(default_value)
+
+    if has_column(data, source_column):
+        values = get_column_values(data, source_column, row_dtype)
+    elif has_default:
+        values = pd.Series([default_value] * len(data), index=data.index, dtype=object)
+    else:
+        values = pd.Series([None] * len(data), index=data.index, dtype=object)
+
+    if transformation and transformation != 'None':
+        values = transform_payroll_column(values, step)
+
+    # Handle default values for null/empty results
+    null_mask = values.isna()
+    if has_default:
+        empty_mask = null_mask | (values == '')
+        if empty_mask.any():
+            values = values.copy()
+            values[empty_mask] = default_value
+            null_mask = values.isna()
+
+    return values.where(~null_mask, '').map(str).to_numpy(dtype=object)
+
+
+def build_payroll_output(data, plan, target_columns=None, reuse=None, chunk_size=None):
+    """Build the payroll output frame (columns in reuse are taken as given).
+
+    With chunk_size, rows are evaluated chunk_size at a time and written into
+    one preallocated object array per target column, so no chunk frames are
+    kept or concatenated.
+    """
+    target_columns = target_columns or PAYROLL_TARGET_COLUMNS
+    row_dtype = get_row_dtype(data)
+    reuse = reuse or {}
+
+    if not chunk_size or len(data) <= chunk_size:
+        output = {
+            target_col: reuse[target_col] if target_col in reuse
+            else evaluate_payroll_column(data, plan.get(target_col), row_dtype)
+            for target_col in target_columns
+        }
+        return pd.DataFrame(output, columns=target_columns)
+
+    output = {
+        target_col: reuse[target_col] if target_col in reuse else np.empty(len(data), dtype=object)
+        for target_col in target_columns
+    }
+    for start in range(0, len(data), chunk_size):
+        chunk = data.iloc[start:start + chunk_size]
+        for target_col in target_columns:
+            if target_col not in reuse:
+                output[target_col][start:start + len(chunk)] = evaluate_payroll_column(chunk, plan.get(target_col), row_dtype)
+    return pd.DataFrame(output, columns=target_columns)
+
+
+def get_cached_columns(column_cache, fingerprint, plan, target_columns=None):
+    """Target columns of the cached output whose mapping and source data are unchanged"""
+    return column_engine.get_cached_columns(column_cache, fingerprint, plan, target_columns or PAYROLL_TARGET_COLUMNS)
+
+
+def get_cached_rows(column_cache, fingerprint, data, row_hashes, plan, target_columns=None):
+    """Row delta of a new extract against the cached output, plus the columns rebuilt from it (see column_engine)"""
+    return column_engine.get_cached_rows(
+        column_cache, fingerprint, data, row_hashes, plan, target_columns or PAYROLL_TARGET_COLUMNS, build_payroll_output
+    )
+
+
+def build_column_cache(fingerprint, plan, output_df, target_columns=None, row_hashes=None):
+    """Column cache of a generated output: source fingerprint and row hashes, step key per target column and the data"""
+    return column_engine.build_column_cache(fingerprint, plan, output_df, target_columns or PAYROLL_TARGET_COLUMNS, row_hashes)
@@ -2,6 +2,8 @@ import streamlit as st
 import sys
 import os
 
+from sap_common.session_memory import SessionMemoryManager
+
 def render_payroll_data_management():
     """Render the Payroll Data Management System with full feature preservation"""
     try:
@@ -46,7 +48,7 @@ def render_payroll_data_management():
             
             # Initialize session state for payroll system with admin_mode (exact from app.py)
             if 'payroll_state' not in st.session_state:
-                st.session_state.payroll_state = {'admin_mode': False}
+                st.session_state.payroll_state = SessionMemoryManager({'admin_mode': False})
             
             # Ensure admin_mode key exists
             if 'admin_mode' not in st.session_state.payroll_state:
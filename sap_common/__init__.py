@@ -0,0 +1,3 @@
+# Code shared by the foundation, employee and payroll apps.
+# Modules are imported as sap_common.<module>; the standalone app entry
+# points put the repository root on sys.path so this package resolves.
@@ -0,0 +1,161 @@
+import hashlib
+import pandas as pd
+
+from sap_common.delta_engine import compute_row_delta, can_reuse_rows, get_reprocess_positions, get_unchanged_values, splice_rows
+
+# Column-at-a-time helpers shared by the foundation, employee and payroll
+# mapping engines. Source columns are read as the scalars a row would yield
+# (what the old iterrows builders saw) and stringified through Python's str,
+# so vectorized .str methods give the same text the row builders produced.
+# The employee and payroll engines also share their column plans and the
+# column cache that lets unchanged output columns be reused.
+
+
+def get_row_dtype(df):
+    """Dtype each value takes when read through a row (what iterrows would yield)"""
+    return df.iloc[:0].to_numpy().dtype
+
+
+def get_column_values(df, column, row_dtype):
+    """Return a column as an object Series holding the row-level scalars"""
+    return pd.Series(df[column].to_numpy(dtype=row_dtype), index=df.index, dtype=object)
+
+
+def has_column(df, column):
+    """Check whether a mapping column exists in the frame"""
+    try:
+        return bool(column) and column in df.columns
+    except TypeError:
+        return False
+
+
+def to_text(values):
+    """Stringify values as object dtype so .str methods keep Python semantics"""
+    return values.map(str).astype(object)
+
+
+def reformat_dotted_dates(text):
+    """Reorder dd.mm.yyyy strings to yyyy-mm-dd, leaving anything else untouched"""
+    has_dot = text.str.contains('.', regex=False)
+    if not has_dot.any():
+        return text
+
+    parts = text[has_dot].str.split('.', regex=False)
+    dotted = parts[parts.str.len() == 3]
+    if dotted.empty:
+        return text
+
+    result = text.copy()
+    result[dotted.index] = (
+        dotted.str[2].str.zfill(4) + '-' +
+        dotted.str[1].str.zfill(2) + '-' +
+        dotted.str[0].str.zfill(2)
+    ).astype(object)
+    return result
+
+
+def reformat_german_and_us_dates(text, parse_dates):
+    """dd.mm.yyyy -> yyyy-mm-dd, other strings with a '/' through parse_dates(text, format); everything else untouched"""
+    result = reformat_dotted_dates(text)
+
+    has_slash = ~text.str.contains('.', regex=False) & text.str.contains('/', regex=False)
+    if has_slash.any():
+        if result is text:
+            result = text.copy()
+        result[has_slash] = parse_dates(text[has_slash], '%Y-%m-%d')
+
+    return result
+
+
+def build_column_plan(mappings, target_columns):
+    """Resolve the first mapping for every target column once"""
+    plan = {}
+
+    for target_col in target_columns:
+        mapping = mappings[mappings['target_column'] == target_col]
+        if mapping.empty:
+            plan[target_col] = None
+            continue
+
+        mapping_row = mapping.iloc[0]
+        plan[target_col] = {
+            'source_column': mapping_row.get('source_column'),
+            'transformation': mapping_row.get('transformation', 'None'),
+            'default_value': mapping_row.get('default_value'),
+            'mapping': mapping_row.to_dict()
+        }
+
+    return plan
+
+
+def get_step_key(step):
+    """Hash of the mapping fields that decide a target column (None for unmapped columns)"""
+    if step is None:
+        return None
+    mapping = step.get('mapping') or {}
+    fields = (step['source_column'], step['transformation'], step['default_value'], mapping.get('secondary_column'))
+    return hashlib.sha256(repr(fields).encode('utf-8')).hexdigest()
+
+
+def get_unchanged_columns(column_cache, plan, target_columns):
+    """Target columns of the cached output whose mapping is unchanged"""
+    cached_df = column_cache['data']
+    columns = []
+    for target_col in target_columns:
+        step_key = get_step_key(plan.get(target_col))
+        if step_key is not None and column_cache['step_keys'].get(target_col) == step_key and target_col in cached_df.columns:
+            columns.append(target_col)
+    return columns
+
+
+def get_cached_columns(column_cache, fingerprint, plan, target_columns):
+    """Target columns of the cached output whose mapping and source data are unchanged"""
+    if not column_cache or column_cache.get('fingerprint') != fingerprint:
+        return {}
+
+    cached_df = column_cache['data']
+    return {
+        target_col: cached_df[target_col].to_numpy(dtype=object)
+        for target_col in get_unchanged_columns(column_cache, plan, target_columns)
+    }
+
+
+def get_cached_rows(column_cache, fingerprint, data, row_hashes, plan, target_columns, build_output):
+    """Row delta of a new extract against the cached output, plus the columns rebuilt from it.
+
+    Returns (reuse, delta). delta is None without comparable row hashes.
+    For merged data other than the cached output's, reuse holds full target
+    columns with an unchanged mapping: the cached values of unchanged rows
+    spliced with the inserted/changed rows evaluated by
+    build_output(rows, plan, columns) (empty when too many rows changed for
+    that to pay off).
+    """
+    if not column_cache or column_cache.get('row_hashes') is None or row_hashes is None:
+        return {}, None
+
+    previous = column_cache['row_hashes']
+    delta = compute_row_delta(previous, row_hashes)
+    if column_cache.get('fingerprint') == fingerprint or not can_reuse_rows(previous, row_hashes, delta):
+        return {}, delta
+
+    columns = get_unchanged_columns(column_cache, plan, target_columns)
+    if not columns:
+        return {}, delta
+
+    cached_df = column_cache['data']
+    reprocessed = build_output(data.iloc[get_reprocess_positions(delta)], plan, columns)
+    reuse = {}
+    for target_col in columns:
+        unchanged_values = get_unchanged_values(delta, cached_df[target_col].to_numpy(dtype=object))
+        reuse[target_col] = splice_rows(delta, unchanged_values, reprocessed[target_col].to_numpy(dtype=object))
+    return reuse, delta
+
+
+def build_column_cache(fingerprint, plan, output_df, target_columns, row_hashes=None):
+    """Column cache of a generated output: source fingerprint and row hashes, step key per target column and the data"""
+    return {
+        'fingerprint': fingerprint,
+        'row_hashes': row_hashes,
+        'step_keys': {target_col: get_step_key(plan.get(target_col)) for target_col in target_columns},
+        'data': output_df
+    }
@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+# Row deltas between two extracts of the same SAP table.
+# Rows are matched on their business key (Object ID / Pers.No. plus the
+# validity dates; repeated keys are paired in order of appearance) and
+# compared on a hash of the whole row. That splits the new extract into
+# inserted, changed and unchanged rows and the previous one into deleted
+# rows, so only inserted and changed rows go through the mapping engines
+# again and a delta-only file can be written next to the full one.
+
+# Business key per SAP table; the columns an extract has are used, as long as it has the first
+DELTA_KEY_COLUMNS = {
+    'HRP1000': ['Object ID', 'Start date', 'End Date'],
+    'HRP1001': ['Source ID', 'Relationship', 'Target object ID', 'Start date', 'End Date'],
+    'PA': ['Pers.No.', 'Start date', 'End Date'],
+    'PA0008': ['Pers.No.', 'Wage Type', 'Start date', 'End Date']
+}
+
+# Above this share of inserted/changed rows, splicing costs about as much as a full rebuild
+DELTA_MAX_CHANGED_RATIO = 0.5
+
+# [OPERATOR] values of delta rows: blank inserts or updates a record, DELETE removes it
+DELTA_OPERATOR_COLUMN = '[OPERATOR]'
+DELTA_OPERATOR_UPSERT = ''
+DELTA_OPERATOR_DELETE = 'DELETE'
+
+
+def get_key_columns(df, table):
+    """The business key columns of a table present in an extract (empty if its ID column is missing)"""
+    candidates = DELTA_KEY_COLUMNS[table]
+    if df is None or candidates[0] not in df.columns:
+        return []
+    return [col for col in candidates if col in df.columns]
+
+
+def hash_rows(df, table):
+    """Key and content hash of every row of an extract, or None if it has no business key.
+
+    Returns {'keys', 'content', 'layout'}: keys hashes the key columns plus
+    the occurrence number of repeated keys, content hashes the whole row and
+    layout records the columns and dtypes the hashes were taken over.
+    """
+    key_columns = get_key_columns(df, table)
+    if not key_columns:
+        return None
+
+    key_hashes = pd.util.hash_pandas_object(df[key_columns], index=False).to_numpy()
+    occurrence = pd.Series(key_hashes).groupby(key_hashes, sort=False).cumcount().to_numpy()
+    if occurrence.any():
+        key_hashes = pd.util.hash_pandas_object(
+            pd.DataFrame({'key': key_hashes, 'occurrence': occurrence}), index=False
+        ).to_numpy()
+
+    return {
+        'keys': key_hashes,
+        'content': pd.util.hash_pandas_object(df, index=False).to_numpy(),
+        'layout': repr((list(df.columns), [str(dtype) for dtype in df.dtypes]))
+    }
+
+
+def slice_row_hashes(row_hashes, positions):
+    """Row hashes of the rows at the given positions (all rows for None)"""
+    if row_hashes is None or positions is None:
+        return row_hashes
+    return {
+        'keys': row_hashes['keys'][positions],
+        'content': row_hashes['content'][positions],
+        'layout': row_hashes['layout']
+    }
+
+
+def compute_row_delta(previous, current):
+    """Match the rows of two extracts by key.
+
+    Returns positions (sorted) into the current extract for 'inserted',
+    'changed' and 'unchanged' rows, 'unchanged_previous' with the matching
+    previous positions and 'deleted' positions into the previous extract;
+    None when either side has no row hashes or the keys are ambiguous.
+    """
+    if previous is None or current is None:
+        return None
+
+    previous_keys = pd.Index(previous['keys'])
+    if not previous_keys.is_unique or not pd.Index(current['keys']).is_unique:
+        return None
+
+    matches = previous_keys.get_indexer(current['keys'])
+    matched = matches >= 0
+    same = matched.copy()
+    same[matched] = previous['content'][matches[matched]] == current['content'][matched]
+
+    seen = np.zeros(len(previous_keys), dtype=bool)
+    seen[matches[matched]] = True
+
+    unchanged = np.flatnonzero(same)
+    return {
+        'inserted': np.flatnonzero(~matched),
+        'changed': np.flatnonzero(matched & ~same),
+        'unchanged': unchanged,
+        'unchanged_previous': matches[unchanged],
+        'deleted': np.flatnonzero(~seen)
+    }
+
+
+def get_insert_delta(rows):
+    """Delta of an extract without a previous one to compare with: every row is inserted"""
+    empty = np.array([], dtype=np.intp)
+    return {
+        'inserted': np.arange(rows, dtype=np.intp),
+        'changed': empty,
+        'unchanged': empty,
+        'unchanged_previous': empty,
+        'deleted': empty
+    }
+
+
+def get_reprocess_positions(delta):
+    """Positions of the inserted and changed rows, in extract order"""
+    return np.union1d(delta['inserted'], delta['changed']).astype(np.intp)
+
+
+def get_delta_counts(delta):
+    """Number of inserted, changed, unchanged and deleted rows"""
+    return {kind: len(delta[kind]) for kind in ('inserted', 'changed', 'unchanged', 'deleted')}
+
+
+def can_reuse_rows(previous, current, delta):
+    """Check whether unchanged rows can keep their previous output.
+
+    The extracts need the same columns and dtypes (which decide how values
+    are read) and few enough rows to reprocess for splicing to pay off.
+    """
+    if delta is None or previous['layout'] != current['layout']:
+        return False
+    rows = len(current['keys'])
+    return rows > 0 and len(get_reprocess_positions(delta)) <= DELTA_MAX_CHANGED_RATIO * rows
+
+
+def get_unchanged_values(delta, previous_values):
+    """The previous output values of the unchanged rows, in the order of the new extract"""
+    return np.asarray(previous_values, dtype=object)[delta['unchanged_previous']]
+
+
+def splice_rows(delta, unchanged_values, evaluated_values):
+    """A full output column from the unchanged rows' previous values and the reprocessed rows' new ones.
+
+    unchanged_values comes from get_unchanged_values, evaluated_values is the
+    column evaluated over the reprocessed rows only.
+    """
+    rows = len(delta['inserted']) + len(delta['changed']) + len(delta['unchanged'])
+    data = np.empty(rows, dtype=object)
+    data[delta['unchanged']] = unchanged_values
+    data[get_reprocess_positions(delta)] = np.asarray(evaluated_values, dtype=object)
+    return data
+
+
+def build_delta_frame(output_df, previous_df, delta, header_rows=0, operator_column=None, operator_header=None):
+    """Delta-only output: the header rows, inserted/changed rows of the new output and deleted rows.
+
+    Deleted rows are taken from the previous output. Every data row gets an
+    operator, DELETE for deleted rows and blank for the others: in the file's
+    own operator column (a position) if it has one, else in an [OPERATOR]
+    column added at the end, with operator_header as its header rows. Data
+    columns are never overwritten.
+    """
+    parts = [output_df.iloc[:header_rows], output_df.iloc[header_rows + get_reprocess_positions(delta)]]
+    upsert_end = header_rows + len(parts[1])
+    if len(delta['deleted']):
+        if previous_df is None:
+            raise ValueError("Deleted rows can only be written with the previous output")
+        deleted = previous_df.iloc[header_rows + delta['deleted']]
+        parts.append(deleted.reindex(columns=output_df.columns))
+
+    frame = pd.concat([part.astype(object) for part in parts], ignore_index=True)
+    if operator_column is None:
+        operator_column = len(frame.columns)
+        frame.insert(operator_column, DELTA_OPERATOR_COLUMN, None, allow_duplicates=True)
+        if header_rows:
+            frame.iloc[:header_rows, operator_column] = list(operator_header or [''] * header_rows)
+    frame.iloc[header_rows:upsert_end, operator_column] = DELTA_OPERATOR_UPSERT
+    frame.iloc[upsert_end:, operator_column] = DELTA_OPERATOR_DELETE
+    return frame
@@ -0,0 +1,48 @@
+import hashlib
+import weakref
+import pandas as pd
+
+# Content fingerprints of DataFrames, shared by the merge memos, the column
+# caches and the transformation log. A fingerprint hashes every value plus the
+# column names and dtypes. Source frames in session state are replaced rather
+# than edited in place, so their fingerprint is computed once per frame object
+# and a rerun does not hash unchanged extracts again.
+
+# Per-process fingerprints of source frames: id(df) -> (weakref to df, fingerprint)
+_frame_fingerprints = {}
+
+
+def hash_frame(df, index=False):
+    """SHA-256 of a frame's values (and index labels if index is set), column names and dtypes"""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=index).to_numpy().tobytes())
+    digest.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_frame_fingerprint(df):
+    """Content fingerprint of a source DataFrame, computed once per frame object (None without a frame)"""
+    if df is None:
+        return None
+
+    entry = _frame_fingerprints.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    # Drop entries whose frames have been garbage collected
+    for frame_id in [frame_id for frame_id, (ref, _) in _frame_fingerprints.items() if ref() is None]:
+        del _frame_fingerprints[frame_id]
+
+    fingerprint = hash_frame(df)
+    _frame_fingerprints[id(df)] = (weakref.ref(df), fingerprint)
+    return fingerprint
+
+
+def get_unique_rows(cache, name, df, fingerprint, key_column):
+    """First row per key_column value of a frame, kept in cache under name while its fingerprint is unchanged"""
+    entry = cache.get(name)
+    if entry is not None and entry['fingerprint'] == fingerprint:
+        return entry['data']
+
+    unique_df = df.drop_duplicates(subset=[key_column], keep='first')
+    cache[name] = {'fingerprint': fingerprint, 'data': unique_df}
+    return unique_df
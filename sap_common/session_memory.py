@@ -0,0 +1,429 @@
+import os
+import uuid
+import shutil
+import tempfile
+import weakref
+import itertools
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Per-session memory budget for the DataFrames kept in session state.
+# Source extracts, merged data and generated outputs are measured (deep size)
+# whenever they are stored. Once a session's frames exceed its budget, the
+# least recently used keys are written to Parquet and replaced in the state by
+# small handles; reading the key again loads them back, so panels keep using
+# state[key] / state.get(key) as before. Frames Parquet cannot restore exactly
+# (mixed-type object columns, non-string headers) stay in memory.
+# Frames are counted and spilled by identity, so a frame shared by several
+# keys is written once and released from all of them; frames an unmanaged key
+# also refers to are left alone, because spilling them would free nothing.
+
+SESSION_MEMORY_BUDGET_MB = int(os.environ.get('SESSION_MEMORY_BUDGET_MB', '512'))
+SESSION_SPILL_DIR = os.environ.get('SESSION_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'sap_session_spill'))
+
+# State keys whose DataFrames are measured and may be spilled
+MANAGED_KEY_PREFIXES = ('source_', 'merged_', 'generated_')
+
+
+class SpilledFrame:
+    """Handle of a DataFrame written to a Parquet spill file"""
+
+    def __init__(self, path, df):
+        self.path = path
+        self.nbytes = get_frame_bytes(df)
+        self.rows = len(df)
+        self.columns = len(df.columns)
+        self.object_columns = [col for col in df.columns if df[col].dtype == object]
+        self.object_category_columns = [
+            col for col in df.columns
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and df[col].cat.categories.dtype == object
+        ]
+
+    def load(self):
+        """Read the frame back, with object text columns / categories restored (NaN for missing values)"""
+        df = pd.read_parquet(self.path)
+        for col in self.object_columns:
+            column = df[col].astype(object)
+            df[col] = column.where(column.notna(), np.nan)
+        for col in self.object_category_columns:
+            column = df[col]
+            df[col] = pd.Categorical.from_codes(column.cat.codes, categories=pd.Index(column.cat.categories, dtype=object))
+        remove_spill_file(self.path)
+        return df
+
+
+def remove_spill_file(path):
+    """Delete a spill file, ignoring files that are already gone"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def map_frames(value, func, kind=pd.DataFrame):
+    """Copy of a state value with func applied to every item of the given kind in it.
+
+    Dicts, lists and tuples are walked; other values are returned as they are.
+    """
+    if isinstance(value, kind):
+        return func(value)
+    if isinstance(value, dict):
+        return {key: map_frames(item, func, kind) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(map_frames(item, func, kind) for item in value)
+    return value
+
+
+def iter_frames(value, kind=pd.DataFrame):
+    """Every item of the given kind inside a state value"""
+    if isinstance(value, kind):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_frames(item, kind)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from iter_frames(item, kind)
+
+
+def get_frame_bytes(df):
+    """Deep in-memory size of a DataFrame in bytes"""
+    try:
+        return int(df.memory_usage(deep=True, index=True).sum())
+    except Exception:
+        return 0
+
+
+def get_value_bytes(value):
+    """Deep size of the DataFrames inside a state value"""
+    return sum(get_frame_bytes(df) for df in iter_frames(value))
+
+
+def is_spillable(df):
+    """Check whether a frame comes back from Parquet unchanged (see SpilledFrame.load)"""
+    if not all(isinstance(col, str) for col in df.columns) or not df.columns.is_unique:
+        return False
+    for col in df.columns:
+        column = df[col]
+        if column.dtype != object:
+            continue
+        if pd.api.types.infer_dtype(column, skipna=True) not in ('string', 'empty'):
+            return False
+        # None would come back as NaN
+        if (column.to_numpy() == None).any():  # noqa: E711
+            return False
+    return True
+
+
+def is_managed_key(key):
+    """State keys holding frames that count against the budget"""
+    return isinstance(key, str) and key.startswith(MANAGED_KEY_PREFIXES)
+
+
+def get_frame_ids(value):
+    """Ids of the distinct in-memory frames inside a state value"""
+    return {id(df) for df in iter_frames(value)}
+
+
+class SessionMemoryManager(dict):
+    """Session state dict that keeps its DataFrames within a memory budget.
+
+    Behaves like the plain state dict; values under managed keys are measured
+    on assignment and spilled least-recently-used first when the budget is
+    exceeded. Frames are tracked by identity: a frame stored under several
+    managed keys is counted once and spilled from all of them together, and
+    frames also referenced from an unmanaged key are never spilled, since
+    writing them out would free nothing. The key just stored or read is never
+    spilled, so a single value larger than the budget stays in memory.
+
+    Only reading a key (state[key], get, pop) loads its spilled frames back;
+    items() and values() return the stored values, handles included.
+    """
+
+    def __init__(self, *args, budget_mb=None, spill_dir=None, **kwargs):
+        super().__init__()
+        self.budget_bytes = int((SESSION_MEMORY_BUDGET_MB if budget_mb is None else budget_mb) * 1024 * 1024)
+        self.spill_dir = os.path.join(spill_dir or SESSION_SPILL_DIR, uuid.uuid4().hex)
+        self.key_frames = {}
+        self.frame_bytes = {}
+        self.tokens = {}
+        self.last_used = OrderedDict()
+        self.spill_count = 0
+        self.reload_count = 0
+        self._file_numbers = itertools.count()
+        # Spill files go away with the session
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if not is_managed_key(key):
+            return value
+
+        if next(iter_frames(value, SpilledFrame), None) is not None:
+            value = self.reload(key)
+            self.touch(key)
+            self.enforce_budget(keep=key)
+        else:
+            self.touch(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self:
+            self.release(key)
+        super().__setitem__(key, value)
+        self.tokens[key] = object()
+        if is_managed_key(key):
+            self.track(key)
+            self.touch(key)
+            self.enforce_budget(keep=key)
+
+    def __delitem__(self, key):
+        self.release(key)
+        super().__delitem__(key)
+        self.tokens.pop(key, None)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in list(self):
+            self.release(key)
+        super().clear()
+        self.tokens.clear()
+
+    def get_token(self, key):
+        """Token replaced on every assignment of a key (not on reloads), compared with `is`"""
+        return self.tokens.get(key)
+
+    def touch(self, key):
+        """Mark a managed key as most recently used"""
+        self.last_used[key] = True
+        self.last_used.move_to_end(key)
+
+    def track(self, key):
+        """Record the in-memory frames of a managed key and measure the ones not seen yet"""
+        frames = {id(df): df for df in iter_frames(super().get(key))}
+        self.key_frames[key] = set(frames)
+        for frame_id, df in frames.items():
+            if frame_id not in self.frame_bytes:
+                self.frame_bytes[frame_id] = get_frame_bytes(df)
+
+    def forget_untracked_frames(self):
+        """Drop the sizes of frames no managed key holds any more"""
+        tracked = set().union(*self.key_frames.values())
+        for frame_id in [frame_id for frame_id in self.frame_bytes if frame_id not in tracked]:
+            del self.frame_bytes[frame_id]
+
+    def release(self, key):
+        """Forget a key's bookkeeping and delete the spill files no other key refers to"""
+        handles = list(iter_frames(super().get(key), SpilledFrame))
+        if handles:
+            shared = {
+                id(handle) for other in self if other != key
+                for handle in iter_frames(super().get(other), SpilledFrame)
+            }
+            for handle in handles:
+                if id(handle) not in shared:
+                    remove_spill_file(handle.path)
+        self.key_frames.pop(key, None)
+        self.last_used.pop(key, None)
+        self.forget_untracked_frames()
+
+    def get_memory_bytes(self):
+        """Bytes of the distinct managed frames currently held in memory"""
+        tracked = set().union(*self.key_frames.values()) if self.key_frames else set()
+        return sum(self.frame_bytes.get(frame_id, 0) for frame_id in tracked)
+
+    def get_pinned_frame_ids(self):
+        """Frames referenced from unmanaged keys, which spilling could not free"""
+        pinned = set()
+        for key in self:
+            if not is_managed_key(key):
+                pinned |= get_frame_ids(super().get(key))
+        return pinned
+
+    def replace_frames(self, replacements, kind):
+        """Swap frames or handles (by id) for their replacements in every managed key holding them"""
+        for key in list(self):
+            if not is_managed_key(key):
+                continue
+            value = super().get(key)
+            if not any(id(item) in replacements for item in iter_frames(value, kind)):
+                continue
+            super().__setitem__(key, map_frames(value, lambda item: replacements.get(id(item), item), kind))
+            self.track(key)
+
+    def spill(self, key, pinned=None):
+        """Write a key's frames to Parquet; returns the bytes freed (0 if it cannot be spilled).
+
+        The frames are replaced by their handles in every managed key holding
+        them, so the memory is actually released.
+        """
+        value = super().get(key)
+        frames = {id(df): df for df in iter_frames(value)}
+        if not frames or not all(is_spillable(df) for df in frames.values()):
+            return 0
+        if pinned is None:
+            pinned = self.get_pinned_frame_ids()
+        if not pinned.isdisjoint(frames):
+            return 0
+
+        os.makedirs(self.spill_dir, exist_ok=True)
+        handles = {}
+        try:
+            for frame_id, df in frames.items():
+                path = os.path.join(self.spill_dir, f"{next(self._file_numbers)}.parquet")
+                df.to_parquet(path)
+                handles[frame_id] = SpilledFrame(path, df)
+        except Exception:
+            # e.g. pyarrow missing or a column type Parquet cannot store
+            for handle in handles.values():
+                remove_spill_file(handle.path)
+            return 0
+
+        freed = sum(self.frame_bytes.get(frame_id, 0) for frame_id in frames)
+        # Drop the local references so the frames can be freed
+        del frames, value, df
+        self.replace_frames(handles, pd.DataFrame)
+        self.forget_untracked_frames()
+        self.spill_count += 1
+        return freed
+
+    def reload(self, key):
+        """Load a key's spilled frames back, sharing them with every managed key that holds the same handles"""
+        loaded = {id(handle): handle.load() for handle in iter_frames(super().get(key), SpilledFrame)}
+        self.replace_frames(loaded, SpilledFrame)
+        self.reload_count += 1
+        return super().__getitem__(key)
+
+    def enforce_budget(self, keep=None):
+        """Spill least recently used keys until the frames in memory fit the budget"""
+        memory_bytes = self.get_memory_bytes()
+        if memory_bytes <= self.budget_bytes:
+            return memory_bytes
+
+        kept = self.key_frames.get(keep, set())
+        pinned = self.get_pinned_frame_ids()
+        for key in list(self.last_used):
+            if memory_bytes <= self.budget_bytes:
+                break
+            frames = self.key_frames.get(key)
+            if key == keep or not frames or not kept.isdisjoint(frames):
+                continue
+            if self.spill(key, pinned):
+                memory_bytes = self.get_memory_bytes()
+        return memory_bytes
+
+
+def get_state_token(state, key):
+    """Token that changes whenever a state key is assigned, to be compared with `is`.
+
+    A SessionMemoryManager hands out a token per assignment that holds no
+    reference to the value, so caches keyed on it do not keep spilled frames
+    alive; for a plain dict the value itself serves as the token.
+    """
+    if isinstance(state, SessionMemoryManager):
+        return state.get_token(key)
+    return state.get(key)
+
+
+def summarize_state_value(value):
+    """Frames, rows, columns and in-memory / spilled bytes of a state value, without reloading it"""
+    frames = list(iter_frames(value))
+    handles = list(iter_frames(value, SpilledFrame))
+    return {
+        'frames': len(frames) + len(handles),
+        'rows': sum(len(df) for df in frames) + sum(handle.rows for handle in handles),
+        'columns': max([len(df.columns) for df in frames] + [handle.columns for handle in handles] + [0]),
+        'memory_bytes': get_value_bytes(value),
+        'spilled_bytes': sum(handle.nbytes for handle in handles)
+    }
+
+
+def get_frame_summary(state, key):
+    """Size (MB), rows and columns of the frames under a state key, or None if it holds none.
+
+    Spilled frames are reported with their in-memory size and are not reloaded.
+    """
+    if state is None or key not in state:
+        return None
+    summary = summarize_state_value(dict.get(state, key))
+    if not summary['frames']:
+        return None
+    return {
+        'size_mb': (summary['memory_bytes'] + summary['spilled_bytes']) / 1024 / 1024,
+        'rows': summary['rows'],
+        'columns': summary['columns']
+    }
+
+
+def get_session_memory_report(state):
+    """Per-key memory of the DataFrames in a session state, largest first.
+
+    Works for a SessionMemoryManager or a plain state dict; spilled frames
+    are not reloaded.
+    """
+    managed = isinstance(state, SessionMemoryManager)
+    rows = []
+    for key in list(state or {}):
+        summary = summarize_state_value(dict.get(state, key))
+        if not summary['frames']:
+            continue
+        if summary['spilled_bytes'] and not summary['memory_bytes']:
+            location = 'Spilled to disk'
+        elif managed and is_managed_key(key):
+            location = 'In memory'
+        else:
+            location = 'In memory (not managed)'
+        rows.append({
+            'Key': key,
+            'Frames': summary['frames'],
+            'Rows': summary['rows'],
+            'Memory (MB)': round(summary['memory_bytes'] / 1024 / 1024, 2),
+            'Spilled (MB)': round(summary['spilled_bytes'] / 1024 / 1024, 2),
+            'Location': location
+        })
+
+    report = pd.DataFrame(rows, columns=['Key', 'Frames', 'Rows', 'Memory (MB)', 'Spilled (MB)', 'Location'])
+    return report.sort_values(['Memory (MB)', 'Spilled (MB)'], ascending=False, ignore_index=True)
+
+
+def get_session_memory_totals(state):
+    """Budget, in-memory and spilled totals (MB) of a session state.
+
+    Frames shared between keys are counted once, unlike in the per-key report.
+    """
+    frames = {}
+    handles = {}
+    for key in list(state or {}):
+        value = dict.get(state, key)
+        frames.update((id(df), df) for df in iter_frames(value))
+        handles.update((id(handle), handle) for handle in iter_frames(value, SpilledFrame))
+    managed = isinstance(state, SessionMemoryManager)
+    return {
+        'budget_mb': state.budget_bytes / 1024 / 1024 if managed else None,
+        'memory_mb': sum(get_frame_bytes(df) for df in frames.values()) / 1024 / 1024,
+        'spilled_mb': sum(handle.nbytes for handle in handles.values()) / 1024 / 1024,
+        'spill_count': state.spill_count if managed else 0,
+        'reload_count': state.reload_count if managed else 0
+    }
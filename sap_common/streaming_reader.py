@@ -0,0 +1,490 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+# Streaming reader for large SAP CSV/XLSX extracts.
+# CSVs are parsed in row chunks and XLSX sheets are walked row by row through
+# openpyxl's read-only mode, so the whole file never exists as Python objects
+# at once. Each chunk's text columns are compacted (Arrow-backed strings where
+# pandas supports them with NaN for missing values) and its columns are moved
+# into per-column buffers as soon as it is parsed, so no list of chunk frames
+# is kept and the frame is never concatenated as a whole; each column is
+# joined on its own at the end. Columns whose type inference differs between
+# chunks (e.g. '0012' in one chunk, 'A12' in another) are dropped from the
+# buffers and re-read on their own, so the result matches what pd.read_csv /
+# pd.read_excel would infer for the whole file. Source frames keep plain
+# dtypes so panels can write any value into them; only generated output is
+# stored with categoricals (see compact_output_frame).
+
+DEFAULT_CHUNK_ROWS = 100000
+
+# Generated output columns with at most this share of distinct values are kept
+# in session state as categoricals (e.g. object types, plan versions, dates)
+OUTPUT_CATEGORY_MAX_UNIQUE_RATIO = 0.2
+
+# Parsed uploads are cached as Parquet files keyed by the upload's content hash,
+# so re-uploading (or re-running with) the same extract skips parsing entirely.
+# The least recently used entries are evicted once the directory exceeds its size budget.
+UPLOAD_CACHE_DIR = os.environ.get('UPLOAD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'sap_upload_cache'))
+UPLOAD_CACHE_MAX_BYTES = int(os.environ.get('UPLOAD_CACHE_MAX_MB', '2048')) * 1024 * 1024
+
+# Bump when parsing changes so stale cache entries are no longer matched
+UPLOAD_CACHE_VERSION = 2
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+_upload_hashes = {}
+
+
+def get_text_dtype():
+    """Arrow-backed string dtype that keeps NaN as the missing value, or None if unavailable"""
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except (TypeError, ImportError):
+        # Older pandas only has pd.NA-based string dtypes, which would change how
+        # missing cells read downstream, so text stays in object columns there
+        return None
+
+
+def get_file_size(file):
+    """Size of an uploaded file or path in bytes (None when unknown)"""
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.getsize(file)
+    size = getattr(file, 'size', None)
+    if size is None and hasattr(file, 'getbuffer'):
+        size = file.getbuffer().nbytes
+    return size
+
+
+def get_file_name(file):
+    """File name of an upload or path"""
+    if isinstance(file, (str, os.PathLike)):
+        return os.fspath(file)
+    return getattr(file, 'name', '')
+
+
+def rewind(file):
+    """Move an uploaded file back to its start so it can be read again"""
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def report_progress(progress, fraction, message):
+    """Forward progress to the caller's callback, if any"""
+    if progress is not None:
+        progress(min(max(fraction, 0.0), 1.0), message)
+
+
+def is_text_column(column):
+    """Check whether a column holds only strings (and missing values)"""
+    return pd.api.types.infer_dtype(column, skipna=True) in ('string', 'empty')
+
+
+def compact_text_columns(df, text_dtype):
+    """Store string-only object columns with the Arrow-backed text dtype"""
+    if text_dtype is None:
+        return df
+
+    for col in df.columns:
+        column = df[col]
+        if column.dtype == object and column.notna().any() and is_text_column(column):
+            df[col] = column.astype(text_dtype)
+    return df
+
+
+def compact_output_frame(df, text_dtype=None):
+    """Store a generated output frame compactly for session state.
+
+    Repetitive text columns become categoricals (in first-appearance order),
+    the remaining text columns use the Arrow-backed text dtype. Values and
+    their order are unchanged, so exports of the compacted frame are identical.
+    """
+    if df is None or df.empty:
+        return df
+    if text_dtype is None:
+        text_dtype = get_text_dtype()
+
+    max_unique = max(1, int(len(df) * OUTPUT_CATEGORY_MAX_UNIQUE_RATIO))
+    for col in df.columns:
+        column = df[col]
+        if not (pd.api.types.is_string_dtype(column.dtype) and is_text_column(column)):
+            continue
+        codes, uniques = pd.factorize(column)
+        if len(uniques) <= max_unique:
+            df[col] = pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=object))
+        elif text_dtype is not None and column.dtype != text_dtype:
+            df[col] = column.astype(text_dtype)
+    return df
+
+def get_value_kind(column):
+    """'number' or 'other' for a chunk column, None when it is entirely missing"""
+    if column.isna().all():
+        return None
+    return 'number' if pd.api.types.is_numeric_dtype(column.dtype) else 'other'
+
+
+def buffer_chunks(chunks):
+    """Move each chunk's columns into per-column buffers as the chunk arrives.
+
+    Returns (columns, buffers, mixed): the header of the first chunk, a list
+    of column pieces per position and the positions inferred as numbers in
+    some chunks and as text/objects in others. Mixed columns are not buffered,
+    since they are re-read on their own. Every piece is copied out of its
+    chunk so the chunk itself is released before the next one is parsed.
+    """
+    columns = None
+    buffers = []
+    kinds = []
+    mixed = set()
+    for chunk in chunks:
+        if columns is None:
+            columns = chunk.columns
+            buffers = [[] for _ in columns]
+            kinds = [None] * len(columns)
+        for position in range(len(columns)):
+            if position in mixed:
+                continue
+            column = chunk.iloc[:, position]
+            kind = get_value_kind(column)
+            if kind is not None and kinds[position] not in (None, kind):
+                mixed.add(position)
+                buffers[position] = []
+                continue
+            kinds[position] = kind or kinds[position]
+            buffers[position].append(column.copy())
+    return columns, buffers, sorted(mixed)
+
+
+def join_column(pieces):
+    """One column from its chunk pieces, emptying the buffer as it goes"""
+    column = pieces[0] if len(pieces) == 1 else pd.concat(pieces, ignore_index=True)
+    pieces.clear()
+    return column.reset_index(drop=True)
+
+
+def combine_buffers(columns, buffers, text_dtype, replacements=None):
+    """Build the frame column by column from the buffers, swapping in whole-file re-reads of mixed columns"""
+    if columns is None:
+        return pd.DataFrame()
+
+    replacements = replacements or {}
+    data = []
+    for position, pieces in enumerate(buffers):
+        if position in replacements:
+            data.append(replacements.pop(position).reset_index(drop=True))
+        else:
+            data.append(join_column(pieces))
+
+    # Side by side, each column keeps its own block instead of being copied into a consolidated one
+    df = pd.concat(data, axis=1, ignore_index=True) if data else pd.DataFrame()
+    df.columns = columns
+    # e.g. a text column that was entirely empty in one chunk comes back as object
+    return compact_text_columns(df, text_dtype)
+
+
+def iter_csv_chunks(file, dtype=None, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, usecols=None):
+    """Yield compacted DataFrame chunks of a CSV, reporting bytes consumed"""
+    text_dtype = get_text_dtype()
+    total_bytes = get_file_size(file)
+    rows_read = 0
+
+    reader = pd.read_csv(file, dtype=dtype, chunksize=chunk_rows, usecols=usecols)
+    with reader:
+        for chunk in reader:
+            rows_read += len(chunk)
+            yield compact_text_columns(chunk, text_dtype)
+
+            if total_bytes and hasattr(file, 'tell'):
+                fraction = file.tell() / total_bytes
+            else:
+                fraction = 0.0
+            report_progress(progress, fraction, f"Read {rows_read:,} rows")
+
+
+def reread_csv_columns(file, positions, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Re-read mixed columns as text, as pd.read_csv infers a column that is not all numeric"""
+    text_dtype = get_text_dtype()
+    rewind(file)
+    _, buffers, _ = buffer_chunks(iter_csv_chunks(file, str, chunk_rows, usecols=positions))
+    return {position: compact_text_columns(join_column(pieces).to_frame(), text_dtype).iloc[:, 0]
+            for position, pieces in zip(sorted(positions), buffers)}
+
+
+def convert_sheet_cell(value):
+    """Mirror pandas' openpyxl cell conversion: blanks to '', integral floats to int"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def iter_sheet_rows(sheet):
+    """Yield the header row and then the data rows of a read-only sheet as pd.read_excel sees them"""
+    header = None
+    pending_blank = []
+
+    for values in sheet.iter_rows(values_only=True):
+        row = [convert_sheet_cell(value) for value in values]
+        while row and row[-1] == "":
+            row.pop()
+
+        if header is None:
+            if row:
+                header = row
+                yield row
+            continue
+
+        # Blank rows only count once real data follows them (trailing ones are dropped)
+        if not row:
+            pending_blank.append(row)
+            continue
+        for blank in pending_blank:
+            yield blank
+        pending_blank = []
+        yield row
+
+
+def parse_sheet_rows(header, rows):
+    """Parse raw sheet rows the way pd.read_excel does (type inference, header mangling)"""
+    width = max([len(header)] + [len(row) for row in rows])
+    data = [list(header) + [""] * (width - len(header))]
+    data.extend(row + [""] * (width - len(row)) for row in rows)
+    parser = TextParser(data, header=0)
+    try:
+        return parser.read()
+    finally:
+        parser.close()
+
+
+def open_first_sheet(file):
+    """Open an XLSX upload in openpyxl read-only mode and return (workbook, first sheet)"""
+    from openpyxl import load_workbook
+
+    rewind(file)
+    workbook = load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    return workbook, workbook.worksheets[0]
+
+
+def iter_xlsx_chunks(file, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None):
+    """Yield compacted DataFrame chunks of the first worksheet using openpyxl read-only mode"""
+    text_dtype = get_text_dtype()
+    workbook, sheet = open_first_sheet(file)
+    try:
+        # Declared dimensions are only used for progress; they can be stale, so
+        # rows are iterated without them
+        total_rows = sheet.max_row
+        sheet.reset_dimensions()
+
+        rows_iter = iter_sheet_rows(sheet)
+        header = next(rows_iter, None)
+        if header is None:
+            raise pd.errors.EmptyDataError("No columns to parse from file")
+
+        rows = []
+        rows_read = 0
+        for row in rows_iter:
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                rows_read += len(rows)
+                yield compact_text_columns(parse_sheet_rows(header, rows), text_dtype)
+                rows = []
+                report_progress(progress, rows_read / total_rows if total_rows else 0.0,
+                                f"Read {rows_read:,} rows")
+
+        if rows or rows_read == 0:
+            rows_read += len(rows)
+            yield compact_text_columns(parse_sheet_rows(header, rows), text_dtype)
+            report_progress(progress, 1.0, f"Read {rows_read:,} rows")
+    finally:
+        workbook.close()
+
+
+def reread_xlsx_columns(file, positions):
+    """Re-read mixed sheet columns on their own so each is inferred over the whole sheet"""
+    text_dtype = get_text_dtype()
+    workbook, sheet = open_first_sheet(file)
+    try:
+        sheet.reset_dimensions()
+        rows_iter = iter_sheet_rows(sheet)
+        next(rows_iter)
+        values = {position: [] for position in positions}
+        for row in rows_iter:
+            for position in positions:
+                values[position].append(row[position] if position < len(row) else "")
+    finally:
+        workbook.close()
+
+    replacements = {}
+    for position in positions:
+        # A constant companion column keeps blank cells from being dropped as blank lines
+        rows = [[0, value] for value in values.pop(position)]
+        column = parse_sheet_rows(['_row', 'value'], rows).iloc[:, 1]
+        replacements[position] = compact_text_columns(column.to_frame(), text_dtype).iloc[:, 0]
+    return replacements
+
+
+def read_upload(file, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None):
+    """Read an uploaded CSV/XLSX extract in chunks into a compact DataFrame.
+
+    Column types are inferred as pd.read_csv / pd.read_excel would.
+    progress(fraction, message) is called after every chunk. Legacy .xls files
+    are read by pd.read_excel since openpyxl cannot stream them.
+    """
+    file_name = get_file_name(file).lower()
+    text_dtype = get_text_dtype()
+
+    rewind(file)
+    replacements = None
+    if file_name.endswith('.csv'):
+        columns, buffers, mixed = buffer_chunks(iter_csv_chunks(file, None, chunk_rows, progress))
+        if mixed:
+            replacements = reread_csv_columns(file, mixed, chunk_rows)
+    elif file_name.endswith('.xlsx'):
+        columns, buffers, mixed = buffer_chunks(iter_xlsx_chunks(file, chunk_rows, progress))
+        if mixed:
+            replacements = reread_xlsx_columns(file, mixed)
+    elif file_name.endswith('.xls'):
+        columns, buffers, _ = buffer_chunks([compact_text_columns(pd.read_excel(file), text_dtype)])
+    else:
+        raise ValueError("Unsupported file format. Please upload CSV or Excel files.")
+
+    df = combine_buffers(columns, buffers, text_dtype, replacements)
+    report_progress(progress, 1.0, f"Loaded {len(df):,} rows")
+    return df
+
+
+def get_content_hash(file):
+    """SHA-256 of an upload's bytes, remembered per Streamlit upload id"""
+    upload_id = getattr(file, 'file_id', None)
+    if upload_id is not None and upload_id in _upload_hashes:
+        return _upload_hashes[upload_id]
+
+    digest = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as handle:
+            for block in iter(lambda: handle.read(HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+    else:
+        rewind(file)
+        for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+        rewind(file)
+
+    content_hash = digest.hexdigest()
+    if upload_id is not None:
+        _upload_hashes[upload_id] = content_hash
+    return content_hash
+
+
+def get_cache_path(file):
+    """Cache file for an upload parsed by this version of the reader"""
+    options = repr((UPLOAD_CACHE_VERSION, pd.__version__, os.path.splitext(get_file_name(file).lower())[1]))
+    key = hashlib.sha256((get_content_hash(file) + options).encode('utf-8')).hexdigest()
+    return os.path.join(UPLOAD_CACHE_DIR, f"{key}.parquet")
+
+
+def load_cached_upload(cache_path):
+    """Read a cached frame and mark it as recently used, or None if it is missing or unreadable"""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        df = pd.read_parquet(cache_path)
+        os.utime(cache_path)
+        return df
+    except Exception:
+        remove_cache_file(cache_path)
+        return None
+
+
+def store_cached_upload(cache_path, df):
+    """Write a parsed frame to the cache; frames Parquet cannot hold exactly are skipped"""
+    try:
+        os.makedirs(UPLOAD_CACHE_DIR, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, cache_path)
+    except Exception:
+        # e.g. pyarrow missing, mixed-type object columns or non-string headers
+        remove_cache_file(f"{cache_path}.{os.getpid()}.tmp")
+        return False
+
+    evict_upload_cache()
+    return True
+
+
+def remove_cache_file(path):
+    """Delete a cache file, ignoring files that are already gone"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def get_upload_cache_entries():
+    """Cached uploads as (path, size, last used), oldest first"""
+    if not os.path.isdir(UPLOAD_CACHE_DIR):
+        return []
+
+    entries = []
+    for name in os.listdir(UPLOAD_CACHE_DIR):
+        if not name.endswith('.parquet'):
+            continue
+        path = os.path.join(UPLOAD_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((path, stat.st_size, stat.st_mtime))
+    return sorted(entries, key=lambda entry: entry[2])
+
+
+def evict_upload_cache(max_bytes=None):
+    """Drop least recently used cache files until the cache fits its size budget"""
+    max_bytes = UPLOAD_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = get_upload_cache_entries()
+    total_bytes = sum(size for _, size, _ in entries)
+
+    for path, size, _ in entries:
+        if total_bytes <= max_bytes:
+            break
+        remove_cache_file(path)
+        total_bytes -= size
+    return total_bytes
+
+
+def clear_upload_cache():
+    """Delete every cached upload"""
+    for path, _, _ in get_upload_cache_entries():
+        remove_cache_file(path)
+
+
+def read_upload_cached(file, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None):
+    """read_upload, served from the content-hash keyed Parquet cache when this file was parsed before"""
+    cache_path = get_cache_path(file)
+
+    df = load_cached_upload(cache_path)
+    if df is not None:
+        report_progress(progress, 1.0, f"Loaded {len(df):,} rows from cache")
+        return df
+
+    df = read_upload(file, chunk_rows, progress)
+    store_cached_upload(cache_path, df)
+    return df
+
+
+def read_uploaded_file(uploaded_file):
+    """read_upload_cached for a Streamlit upload, showing read progress in a progress bar"""
+    import streamlit as st
+
+    progress_bar = st.progress(0.0, text=f"Reading {uploaded_file.name}...")
+    try:
+        return read_upload_cached(
+            uploaded_file,
+            progress=lambda fraction, message: progress_bar.progress(fraction, text=f"{uploaded_file.name}: {message}")
+        )
+    finally:
+        progress_bar.empty()